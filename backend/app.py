@@ -1,18 +1,25 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import Optional
+import asyncio
 import httpx
+import math
 import os
+import time
 from dotenv import load_dotenv
 import json
-import requests
-from bs4 import BeautifulSoup
+import importlib.util
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
 
 # Cargar variables de entorno
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # Configurar CORS
@@ -31,103 +38,190 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Parser: lxml si está instalado (más rápido), html.parser si no
+HTML_FEATURES = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+def _has_class(name):
+    # Durante el parseo SoupStrainer recibe el atributo class crudo ("product card")
+    return lambda value: value is not None and name in value.split()
+
+# Sólo construir los nodos que se usan, no el árbol completo de la página
+PRODUCT_STRAINER = SoupStrainer('div', class_=_has_class('product'))
+CATEGORY_STRAINER = SoupStrainer('li', class_=_has_class('category'))
+
+# URLs base para cada marca
+BRAND_URLS = {
+    'esika': 'https://www.esika.com/pe/',
+    'lbel': 'https://www.lbel.com/pe/',
+    'cyzone': 'https://www.cyzone.com/pe/'
+}
+
+# Tiempo máximo por marca; si una tarda más se responde con las demás
+BRAND_TIMEOUT = float(os.getenv('BRAND_TIMEOUT', '5'))
+# Las portadas se reutilizan entre /products y /categories durante este tiempo
+BRAND_PAGE_TTL = float(os.getenv('BRAND_PAGE_TTL', '300'))
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+class BrandPage:
+    """Portada descargada de una marca; productos y categorías se parsean una sola vez"""
+
+    def __init__(self, brand, html):
+        self.brand = brand
+        self.html = html
+        self.fetched_at = time.monotonic()
+        self._products = None
+        self._categories = None
+
+    def is_fresh(self):
+        return time.monotonic() - self.fetched_at < BRAND_PAGE_TTL
+
+    @property
+    def products(self):
+        if self._products is None:
+            soup = BeautifulSoup(self.html, HTML_FEATURES, parse_only=PRODUCT_STRAINER)
+            products = []
+            for product in soup.find_all('div', class_='product'):
+                name = product.find('h2', class_='product-name')
+                price = product.find('span', class_='price')
+                if name and price:
+                    products.append({
+                        'name': name.text.strip(),
+                        'price': price.text.strip(),
+                        'brand': self.brand,
+                        'category': product.get('data-category')
+                    })
+            self._products = products
+        return self._products
+
+    @property
+    def categories(self):
+        if self._categories is None:
+            soup = BeautifulSoup(self.html, HTML_FEATURES, parse_only=CATEGORY_STRAINER)
+            categories = []
+            for category in soup.find_all('li', class_='category'):
+                name = category.find('a')
+                if name:
+                    categories.append({
+                        'name': name.text.strip(),
+                        'brand': self.brand
+                    })
+            self._categories = categories
+        return self._categories
+
 class BelcorpService:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.client = httpx.AsyncClient(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            follow_redirects=True
+        )
+        self._pages = {}
+        self._inflight = {}
+
+    async def aclose(self):
+        await self.client.aclose()
 
     def login(self):
         # Implementar si es necesario
         pass
 
-    def get_products(self, category=None, page=1):
-        # URLs base para cada marca
-        brand_urls = {
-            'esika': 'https://www.esika.com/pe/',
-            'lbel': 'https://www.lbel.com/pe/',
-            'cyzone': 'https://www.cyzone.com/pe/'
-        }
+    async def _download(self, brand):
+        try:
+            response = await self.client.get(BRAND_URLS[brand])
+            if response.status_code == 200:
+                page = BrandPage(brand, response.text)
+                self._pages[brand] = page
+                return page
+            logger.error(f"Error fetching {brand}: status {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error fetching {brand}: {str(e)}")
+        return None
         
-        all_products = []
-        for brand, url in brand_urls.items():
-            try:
-                response = self.session.get(url)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    products = soup.find_all('div', class_='product')
-                    
-                    for product in products:
-                        name = product.find('h2', class_='product-name')
-                        price = product.find('span', class_='price')
-                        if name and price:
-                            all_products.append({
-                                'name': name.text.strip(),
-                                'price': price.text.strip(),
-                                'brand': brand
-                            })
-            except Exception as e:
-                print(f"Error fetching products for {brand}: {str(e)}")
-                
-        return all_products
-
-    def get_categories(self):
-        # URLs base para cada marca
-        brand_urls = {
-            'esika': 'https://www.esika.com/pe/',
-            'lbel': 'https://www.lbel.com/pe/',
-            'cyzone': 'https://www.cyzone.com/pe/'
+    async def _fetch_brand(self, brand):
+        page = self._pages.get(brand)
+        if page is not None and page.is_fresh():
+            return page
+        # Una sola descarga en vuelo por marca, compartida por products y categories
+        task = self._inflight.get(brand)
+        if task is None:
+            task = asyncio.ensure_future(self._download(brand))
+            self._inflight[brand] = task
+            task.add_done_callback(lambda _: self._inflight.pop(brand, None))
+        try:
+            # shield: si vence el timeout la descarga sigue y deja la página para el próximo request
+            fetched = await asyncio.wait_for(asyncio.shield(task), BRAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout fetching {brand} after {BRAND_TIMEOUT}s")
+            fetched = None
+        # Si falló, mejor la copia vencida que nada
+        return fetched or page
+
+    async def fetch_brands(self):
+        """Portadas de todas las marcas en paralelo: (páginas obtenidas, marcas que faltaron)"""
+        results = await asyncio.gather(*(self._fetch_brand(brand) for brand in BRAND_URLS))
+        pages = [page for page in results if page is not None]
+        missing = [brand for brand, page in zip(BRAND_URLS, results) if page is None]
+        return pages, missing
+
+    async def get_products(self, category=None, page=1, page_size=PAGE_SIZE):
+        pages, missing = await self.fetch_brands()
+        all_products = [product for brand_page in pages for product in brand_page.products]
+        if category:
+            wanted = category.lower()
+            all_products = [
+                product for product in all_products
+                if wanted == product['brand'] or wanted == (product['category'] or '').lower()
+            ]
+
+        total_items = len(all_products)
+        start = (page - 1) * page_size
+        return {
+            'products': all_products[start:start + page_size],
+            'pagination': {
+                'current_page': page,
+                'page_size': page_size,
+                'total_pages': max(1, math.ceil(total_items / page_size)),
+                'total_items': total_items
+            },
+            'partial': bool(missing),
+            'missing_brands': missing
+        }
+
+    async def get_categories(self):
+        pages, missing = await self.fetch_brands()
+        return {
+            'categories': [category for brand_page in pages for category in brand_page.categories],
+            'partial': bool(missing),
+            'missing_brands': missing
         }
-        
-        all_categories = []
-        for brand, url in brand_urls.items():
-            try:
-                response = self.session.get(url)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    categories = soup.find_all('li', class_='category')
-                    
-                    for category in categories:
-                        name = category.find('a')
-                        if name:
-                            all_categories.append({
-                                'name': name.text.strip(),
-                                'brand': brand
-                            })
-            except Exception as e:
-                print(f"Error fetching categories for {brand}: {str(e)}")
-                
-        return all_categories
 
 belcorp_service = BelcorpService()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await belcorp_service.aclose()
+
 # Rutas de la API
 @app.get("/")
 async def root():
     return {"message": "Bienvenido a la API de Belcorp Shop"}
 
 @app.get("/api/products")
-async def get_products(request: Request):
+async def get_products(
+    category: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     try:
-        # Obtener parámetros de consulta
-        params = dict(request.query_params)
-        category = params.get('category')
-        page = int(params.get('page', 1))
-        
-        # Obtener productos
-        products = belcorp_service.get_products(category, page)
+        # Obtener productos (paginados sobre la lista combinada de todas las marcas)
+        result = await belcorp_service.get_products(category, page, page_size)
         
         return {
             "status": "success",
-            "data": {
-                "products": products,
-                "pagination": {
-                    "current_page": page,
-                    "total_pages": 1,  # Esto debería calcularse basado en el total de productos
-                    "total_items": len(products)
-                }
-            }
+            "data": result
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -136,13 +230,11 @@ async def get_products(request: Request):
 async def get_categories(request: Request):
     try:
         # Obtener categorías
-        categories = belcorp_service.get_categories()
+        result = await belcorp_service.get_categories()
         
         return {
             "status": "success",
-            "data": {
-                "categories": categories
-            }
+            "data": result
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -156,18 +248,22 @@ async def login():
     return {"message": "Login successful"}
 
 @app.get("/belcorp/products")
-async def get_belcorp_products(category: str = None, page: int = 1):
-    products = belcorp_service.get_products(category, page)
-    return {"products": products}
+async def get_belcorp_products(
+    category: str = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    result = await belcorp_service.get_products(category, page, page_size)
+    return {"products": result['products'], "pagination": result['pagination']}
 
 @app.get("/belcorp/categories")
 async def get_belcorp_categories():
-    categories = belcorp_service.get_categories()
-    return {"categories": categories}
+    result = await belcorp_service.get_categories()
+    return {"categories": result['categories']}
 
 # Middleware para logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f"Request path: {request.url.path}")
+    logger.debug("Request path: %s", request.url.path)
     response = await call_next(request)
     return response
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # API Configuration
@@ -14,14 +14,136 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"  # Change in production
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    JWT_BACKEND: str = "auto"  # auto | pyjwt | jose
+    TOKEN_CACHE_SIZE: int = 1024  # verified tokens kept in memory (0 disables)
     
     # Belcorp Configuration
     BELCORP_USERNAME: Optional[str] = None
     BELCORP_PASSWORD: Optional[str] = None
+    BELCORP_BASE_URL: str = "https://www.somosbelcorp.com"
+    BELCORP_SESSION_IDLE_TIMEOUT: int = 20 * 60  # ASP.NET forms auth sliding expiration (seconds)
+    # Extra upstream accounts, JSON list of {"username": ..., "password": ...}
+    BELCORP_ACCOUNTS: List[Dict[str, str]] = []
+    SESSION_POOL_STRATEGY: str = "least_busy"  # least_busy | round_robin
+    SESSION_POOL_KEEPALIVE_INTERVAL: int = 5 * 60  # seconds between keep-warm passes (0 disables)
+    SESSION_POOL_QUARANTINE_SECONDS: int = 10 * 60  # how long an account is skipped after a failed login
+    # Per-consultant upstream sessions (keyed by the JWT subject)
+    USER_SESSIONS_MAX: int = 1000
+    USER_SESSION_IDLE_TTL: int = 20 * 60
+    USER_SESSION_STORE_PATH: str = "data/user_sessions.sqlite3"
+
+    # Upstream HTTP client (pool compartido)
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0  # seconds
+    UPSTREAM_READ_TIMEOUT: float = 20.0  # seconds
+    UPSTREAM_POOL_TIMEOUT: float = 5  # max wait for a free pooled connection
+    # Resilience (per upstream host): circuit breaker + adaptive rate limit
+    BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures (network errors, 5xx) that open the circuit
+    BREAKER_RECOVERY_TIMEOUT: float = 30  # seconds the circuit stays open before a probe
+    BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    UPSTREAM_RATE_LIMIT: float = 20  # requests/s per host when healthy
+    UPSTREAM_RATE_LIMIT_MIN: float = 1
+    UPSTREAM_RATE_BACKOFF: float = 0.5  # rate multiplier on 429/5xx
+    UPSTREAM_RATE_INCREASE: float = 0.5  # requests/s regained per successful call
+    UPSTREAM_HTTP2: bool = True  # Only used when the h2 package is installed
+
+    # HTML parsing backend: auto | selectolax | lxml | bs4
+    HTML_PARSER: str = "auto"
+
+    # Catalog cache
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_TTL_CATALOG: int = 15 * 60  # seconds
+    CACHE_TTL_PRODUCT: int = 30 * 60  # seconds
+    CACHE_TTL_CATEGORIES: int = 60 * 60  # seconds
+    CACHE_STALE_TTL: int = 24 * 60 * 60  # Serve stale data this long while revalidating
+    CACHE_OUTAGE_TTL: int = 7 * 24 * 60 * 60  # Keep entries this much longer to serve when upstream is down
+    CACHE_DISK_PATH: Optional[str] = None  # e.g. "data/catalog_cache.sqlite3"
+    CACHE_DISK_MAX_ENTRIES: int = 50000
+    PAGE_VALIDATORS_MAX_ENTRIES: int = 4096  # upstream URLs remembered for conditional requests
+
+    # Bulk product lookups
+    BULK_FETCH_CONCURRENCY: int = 8  # Max product pages fetched in parallel per bulk call
+    BULK_MAX_IDS: int = 100
+
+    # Catalog export (GET /api/products/export)
+    EXPORT_CONCURRENCY: int = 4  # catalog pages fetched ahead of the client
+    EXPORT_MAX_PAGES: int = 200
+
+    # Local product store and background crawler
+    PRODUCT_STORE_PATH: str = "data/products.sqlite3"
+    CRAWLER_ENABLED: bool = True
+    CRAWLER_INTERVAL: int = 6 * 60 * 60  # seconds between full crawls
+    CRAWLER_CONCURRENCY: int = 2
+    CRAWLER_DELAY: float = 1.0  # politeness delay after each upstream request (seconds)
+    CRAWLER_MAX_PAGES: int = 50  # per category
+    CRAWLER_FETCH_DETAILS: bool = True
+
+    # Order repository
+    ORDER_REPOSITORY_BACKEND: str = "sqlite"  # sqlite | memory
+    ORDER_STORE_PATH: str = "data/orders.sqlite3"
+    ORDER_WRITE_BATCH_SIZE: int = 100
+    ORDER_WRITE_FLUSH_INTERVAL: float = 0.005  # seconds to gather a write batch
+    ORDER_PAGE_MAX_LIMIT: int = 100
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+    IDEMPOTENCY_TTL: int = 24 * 60 * 60  # seconds
+
+    # HTTP caching / compression of API responses
+    # Catalog endpoints require a bearer token: use "public, ..." to let the CDN store them
+    CACHE_CONTROL_PRODUCTS: str = "private, max-age=300, stale-while-revalidate=600"
+    CACHE_CONTROL_PRODUCT: str = "private, max-age=900, stale-while-revalidate=1800"
+    CACHE_CONTROL_CATEGORIES: str = "private, max-age=3600, stale-while-revalidate=3600"
+    RENDERED_RESPONSE_CACHE_SIZE: int = 512  # serialized bodies kept for up to their max-age
+    RESPONSE_COMPRESSION: bool = True  # brotli when brotli-asgi is installed, gzip otherwise
+    COMPRESSION_MINIMUM_SIZE: int = 1000  # bytes
+
+    # Product image proxy (GET /api/images/{key}); thumbnails need Pillow
+    IMAGE_PROXY_ENABLED: bool = True
+    IMAGE_PROXY_BASE_URL: str = ""  # public origin of this API, e.g. "https://api.example.com" ("" = each request's origin)
+    IMAGE_CACHE_DIR: str = "data/images"
+    IMAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    IMAGE_THUMBNAIL_WIDTHS: List[int] = [160, 320, 640]
+    IMAGE_LIST_WIDTH: int = 320  # width linked from catalog pages
+    IMAGE_DETAIL_WIDTH: int = 640  # width linked from product details
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024  # largest upstream image accepted
+    IMAGE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+
+    # Prometheus metrics (GET /metrics)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""  # scrapers send "Authorization: Bearer <token>"; "" = localhost only
+
+    # Startup warm-up: log in and prefetch categories and the first catalog pages (GET /readyz waits for it)
+    WARMUP_ENABLED: bool = False
+    WARMUP_CATALOG_PAGES: int = 2
+    WARMUP_TIMEOUT: float = 30  # seconds; after this the app reports ready anyway
+
+    # Multi-worker mode: upstream cookies, catalog cache and rate limits shared between processes
+    WEB_CONCURRENCY: int = 1  # worker processes started by start.py (uvicorn reads it too)
+    SHARED_STATE_URL: str = ""  # sqlite:///data/shared_state.sqlite3 | redis://host:6379/0 ("" = per process)
+    SHARED_LOGIN_WAIT: float = 30  # seconds a worker waits for another one's upstream login
+    CRAWLER_LEASE_TTL: int = 5 * 60  # only the worker holding this lease runs the crawler
+
+    # Product search index (sqlite FTS5)
+    SEARCH_INDEX_PATH: str = "data/search.sqlite3"
+    SEARCH_MAX_LIMIT: int = 100
     
     # WhatsApp Configuration
     WHATSAPP_API_KEY: Optional[str] = None
     WHATSAPP_PHONE_NUMBER: Optional[str] = None
+    WHATSAPP_API_BASE_URL: str = "https://graph.facebook.com/v17.0"
+    WHATSAPP_CONNECT_TIMEOUT: float = 5.0
+    WHATSAPP_READ_TIMEOUT: float = 10.0
+
+    # Notification outbox
+    OUTBOX_PATH: str = "data/outbox.sqlite3"
+    OUTBOX_RATE_PER_SECOND: float = 10.0
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_BACKOFF_BASE: float = 2.0  # seconds, doubled on each attempt
+    OUTBOX_BACKOFF_MAX: float = 300.0  # seconds
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_SEND_TIMEOUT: float = 30.0  # hard cap per send; the worker's claim lease is sized from it
 
     class Config:
         env_file = ".env"
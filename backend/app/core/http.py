@@ -0,0 +1,72 @@
+import importlib.util
+import logging
+from typing import Optional, Dict
+
+import httpx
+
+from .config import get_settings, Settings
+from .resilience import ResilientTransport
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """Indicar si el paquete h2 está instalado (requerido por httpx para HTTP/2)"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_timeout(
+    settings: Optional[Settings] = None,
+    connect: Optional[float] = None,
+    read: Optional[float] = None,
+) -> httpx.Timeout:
+    """Construir los timeouts de conexión/lectura/espera del pool a partir de la configuración"""
+    settings = settings or get_settings()
+    read = read if read is not None else settings.UPSTREAM_READ_TIMEOUT
+    return httpx.Timeout(
+        read,
+        connect=connect if connect is not None else settings.UPSTREAM_CONNECT_TIMEOUT,
+        pool=settings.UPSTREAM_POOL_TIMEOUT,
+    )
+
+
+def build_limits(settings: Optional[Settings] = None) -> httpx.Limits:
+    """Construir los límites del pool de conexiones"""
+    settings = settings or get_settings()
+    return httpx.Limits(
+        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+
+def create_async_client(
+    headers: Optional[Dict[str, str]] = None,
+    settings: Optional[Settings] = None,
+    **kwargs,
+) -> httpx.AsyncClient:
+    """Crear un httpx.AsyncClient con keep-alive, pool, timeouts y la capa de resiliencia"""
+    settings = settings or get_settings()
+    if settings.UPSTREAM_HTTP2 and not http2_available():
+        logger.debug("h2 not installed, upstream client will use HTTP/1.1")
+    if "transport" not in kwargs:
+        kwargs["transport"] = create_async_transport(settings)
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=kwargs.pop("timeout", build_timeout(settings)),
+        **kwargs,
+    )
+
+
+def create_async_transport(settings: Optional[Settings] = None) -> httpx.AsyncBaseTransport:
+    """Crear un transporte (pool de conexiones) para compartir entre varios clientes.
+
+    Cada cliente mantiene sus propias cookies; las conexiones keep-alive
+    son del transporte. Todo pasa por el circuit breaker y el rate limit
+    por host de ``core.resilience``.
+    """
+    settings = settings or get_settings()
+    return ResilientTransport(httpx.AsyncHTTPTransport(
+        limits=build_limits(settings),
+        http2=settings.UPSTREAM_HTTP2 and http2_available(),
+    ))
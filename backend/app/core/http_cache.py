@@ -0,0 +1,101 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+
+def compute_etag(body: bytes) -> str:
+    """ETag fuerte a partir del cuerpo serializado"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Comparar If-None-Match con el ETag actual (comparación débil, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip() for tag in header.split(",")}
+    return etag in {tag[2:] if tag.startswith("W/") else tag for tag in candidates}
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    cache_control: str,
+    etag: Optional[str] = None,
+    media_type: str = "application/json",
+) -> Response:
+    """Responder con ETag y Cache-Control, o 304 si el cliente ya tiene esta versión"""
+    etag = etag or compute_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def max_age(cache_control: str) -> int:
+    """Extraer max-age (segundos) de una directiva Cache-Control"""
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class RenderedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class RenderedResponseCache:
+    """Cuerpos ya serializados (y su ETag) por clave de endpoint.
+
+    Se guardan como mucho ``max-age`` segundos, el mismo margen que ya le
+    damos al navegador, así las vistas repetidas no vuelven a serializar.
+    Una clave puede tener variantes (p.ej. el origen de las URLs de
+    imágenes); ``discard`` las descarta todas.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], RenderedResponse]" = OrderedDict()
+        self._variants: Dict[str, Set[str]] = {}
+
+    def get(self, key: str, variant: str = "") -> Optional[RenderedResponse]:
+        entry = self._entries.get((key, variant))
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self._remove((key, variant))
+            return None
+        self._entries.move_to_end((key, variant))
+        return entry
+
+    def put(self, key: str, body: bytes, ttl: float, variant: str = "") -> RenderedResponse:
+        entry = RenderedResponse(body, compute_etag(body), time.time() + ttl)
+        if ttl > 0:
+            self._entries[(key, variant)] = entry
+            self._entries.move_to_end((key, variant))
+            self._variants.setdefault(key, set()).add(variant)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, entry_key: Tuple[str, str]):
+        del self._entries[entry_key]
+        key, variant = entry_key
+        variants = self._variants[key]
+        variants.discard(variant)
+        if not variants:
+            del self._variants[key]
+
+    def discard(self, key: str):
+        for variant in self._variants.pop(key, ()):
+            self._entries.pop((key, variant), None)
+
+    def clear(self):
+        self._entries.clear()
+        self._variants.clear()
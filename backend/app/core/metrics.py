@@ -0,0 +1,280 @@
+import bisect
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Buckets por defecto (segundos): de 1 ms a 30 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Starlette agrega "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values, **kwargs):
+        """Hijo para una combinación de labels (se crea la primera vez)"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Contador monotónico con labels"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for key, child in self._children.items():
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    """Histograma de latencias con buckets fijos"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def time(self, *values, **kwargs) -> _Timer:
+        """Context manager que observa la duración del bloque"""
+        return self.labels(*values, **kwargs).time()
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class CallbackMetric:
+    """Métrica leída al momento del scrape (p.ej. contadores que ya lleva otro objeto).
+
+    ``callback`` devuelve ``{(valor_label, ...): valor}``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        registry=None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def collect(self) -> List[str]:
+        values = self.callback()
+        if not values:
+            return []
+        suffix = "_total" if self.kind == "counter" else ""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in values.items():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        # Re-registrar con el mismo nombre reemplaza (recarga de módulos en desarrollo)
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str):
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Formato de exposición de texto de Prometheus"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# Métricas del camino caliente
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de los requests HTTP por ruta",
+    ("method", "route", "status"),
+)
+UPSTREAM_PHASE_DURATION = Histogram(
+    "belcorp_phase_duration_seconds",
+    "Tiempo por fase al servir datos de somosbelcorp.com (fetch, parse, validate)",
+    ("kind", "phase"),
+)
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses",
+    "Respuestas de hosts upstream por código de estado",
+    ("host", "status"),
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors",
+    "Errores de red, timeouts y rechazos del circuit breaker por host",
+    ("host", "error"),
+)
+BELCORP_PAGE_FETCHES = Counter(
+    "belcorp_page_fetches",
+    "Páginas de somosbelcorp.com descargadas: 304, sin cambios, cambiadas o nuevas",
+    ("kind", "outcome"),
+)
+BELCORP_LOGINS = Counter(
+    "belcorp_logins",
+    "Logins a somosbelcorp.com por resultado",
+    ("result",),
+)
+BELCORP_CHECK_AUTH = Counter(
+    "belcorp_check_auth",
+    "Sondas explícitas de autenticación (/Inicio) por resultado",
+    ("result",),
+)
+
+
+def _route_name(scope, root_path: str) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "<unknown>")
+    # Los mounts (p.ej. /static) no fijan "route" pero sí amplían root_path
+    if scope.get("root_path", "") != root_path:
+        return scope["root_path"][len(root_path):]
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra la latencia de cada request por ruta.
+
+    Usa la plantilla de la ruta (``/api/products/{product_id}``) y no la URL,
+    así la cardinalidad queda acotada.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route_name(scope, root_path), status_holder[0]).observe(
+                time.perf_counter() - started
+            )
+
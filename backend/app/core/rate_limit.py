@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Limitador token-bucket para corrutinas: ``rate`` tokens/s con ráfagas de ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Tomar tokens sin esperar; False si no hay suficientes"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1.0):
+        """Esperar hasta poder tomar ``tokens``"""
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket AIMD: baja el ritmo a la mitad ante 429/5xx y lo recupera de a poco.
+
+    ``pause`` detiene todo hasta un instante dado (p.ej. el ``Retry-After``
+    de un 429).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        backoff_factor: float = 0.5,
+        increase_step: float = 0.1,
+        capacity: float = None,
+    ):
+        super().__init__(rate, capacity)
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.backoff_factor = backoff_factor
+        self.increase_step = increase_step
+        self.throttled = 0
+        self._paused_until = 0.0
+
+    def on_success(self):
+        """Aumento aditivo hasta el ritmo configurado"""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: float = None):
+        """Reducción multiplicativa (y pausa si upstream dijo cuánto esperar)"""
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self.throttled += 1
+        if retry_after:
+            self.pause(retry_after)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await super().acquire(tokens)
+
+
+class SharedAdaptiveTokenBucket(AdaptiveTokenBucket):
+    """AdaptiveTokenBucket cuyo estado vive en el store compartido (interfaz Redis).
+
+    Todos los workers comparten el ritmo actual, la pausa y un contador por
+    ventana de un segundo (INCR + EXPIRE, el limitador clásico sobre Redis),
+    así el upstream ve ``rate`` requests/s en total y no ``rate`` por proceso.
+    El store es bloqueante: ``acquire`` lo consulta en un hilo (una sola
+    vuelta por intento) y los ajustes de ritmo y pausa se escriben en segundo
+    plano, así un store lento o bloqueado no frena el event loop.
+    """
+
+    def __init__(self, shared, key: str, rate: float, min_rate: float, backoff_factor: float = 0.5,
+                 increase_step: float = 0.1):
+        super().__init__(rate, min_rate, backoff_factor=backoff_factor, increase_step=increase_step)
+        self.shared = shared
+        self.key = f"ratelimit:{key}"
+        self._background: Set[asyncio.Future] = set()
+
+    def _shared_rate(self) -> float:
+        value = self.shared.get(f"{self.key}:rate")
+        self.rate = float(value) if value is not None else self.max_rate
+        return self.rate
+
+    def _reserve(self, tokens: float) -> Optional[float]:
+        """Bloqueante: tomar lugar en la ventana actual; None si se pudo, si no los segundos a esperar"""
+        now = time.time()
+        paused_until = self.shared.get(f"{self.key}:paused_until")
+        if paused_until is not None and float(paused_until) > now:
+            return float(paused_until) - now
+        window = int(now)
+        key = f"{self.key}:{window}"
+        used = self.shared.incr(key, int(tokens))
+        if used == int(tokens):
+            self.shared.expire(key, 2)
+        if used <= max(1, round(self._shared_rate())):
+            return None
+        # Ventana agotada: probar en la siguiente
+        return max(0.0, window + 1 - time.time())
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        return self._reserve(tokens) is None
+
+    async def acquire(self, tokens: float = 1.0):
+        while True:
+            # Una pausa de este mismo worker rige ya, aunque su escritura no haya llegado al store
+            wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                wait = await asyncio.to_thread(self._reserve, tokens)
+                if wait is None:
+                    return
+            await asyncio.sleep(wait)
+
+    def _in_background(self, fn, *args):
+        """Escribir en el store desde un hilo sin esperar el resultado (directo si no hay event loop)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            fn(*args)
+            return
+        future = loop.run_in_executor(None, fn, *args)
+        self._background.add(future)
+        future.add_done_callback(self._background_done)
+
+    def _background_done(self, future: asyncio.Future):
+        self._background.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Shared rate limit update failed for {self.key}: {str(future.exception())}")
+
+    async def flush(self):
+        """Esperar las escrituras pendientes en el store"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def on_success(self):
+        # self.rate es el ritmo compartido que trajo el último acquire
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self._in_background(self.shared.set, f"{self.key}:rate", self.rate)
+
+    def on_throttle(self, retry_after: float = None):
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self._in_background(self.shared.set, f"{self.key}:rate", self.rate)
+        self.throttled += 1
+        if retry_after:
+            self.pause(retry_after)
+
+    def _extend_pause(self, until: float, seconds: float):
+        current = self.shared.get(f"{self.key}:paused_until")
+        if current is None or float(current) < until:
+            self.shared.set(f"{self.key}:paused_until", until, ex=int(seconds) + 1)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._in_background(self._extend_pause, time.time() + seconds, seconds)
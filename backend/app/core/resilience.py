@@ -0,0 +1,209 @@
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+from .config import get_settings, Settings
+from .metrics import UPSTREAM_ERRORS, UPSTREAM_RESPONSES
+from .rate_limit import AdaptiveTokenBucket, SharedAdaptiveTokenBucket
+from .shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """El circuito del host está abierto: se falla en el acto sin ir a la red"""
+
+
+class CircuitBreaker:
+    """Circuit breaker clásico (cerrado / abierto / semiabierto) de un host upstream.
+
+    Tras ``failure_threshold`` fallos seguidos se abre durante
+    ``recovery_timeout`` segundos; después deja pasar hasta
+    ``half_open_max_calls`` llamadas de prueba y se cierra con el primer
+    éxito o se vuelve a abrir con el primer fallo.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """Indicar si una llamada puede salir ahora"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def release(self):
+        """Devolver el cupo de una llamada de prueba que no llegó a completarse"""
+        if self.state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected,
+        }
+
+
+class HostGuard:
+    """Breaker + limitador adaptativo de un host.
+
+    Con un store compartido el rate limit es común a todos los workers; el
+    breaker sigue siendo de cada proceso.
+    """
+
+    def __init__(self, host: str, settings: Settings, shared=None):
+        self.host = host
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.BREAKER_HALF_OPEN_MAX_CALLS,
+        )
+        limiter_options = dict(
+            min_rate=settings.UPSTREAM_RATE_LIMIT_MIN,
+            backoff_factor=settings.UPSTREAM_RATE_BACKOFF,
+            increase_step=settings.UPSTREAM_RATE_INCREASE,
+        )
+        if shared is not None:
+            self.limiter = SharedAdaptiveTokenBucket(shared, host, settings.UPSTREAM_RATE_LIMIT, **limiter_options)
+        else:
+            self.limiter = AdaptiveTokenBucket(settings.UPSTREAM_RATE_LIMIT, **limiter_options)
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.breaker.snapshot(),
+            'rate_limit': round(self.limiter.rate, 2),
+            'throttled': self.limiter.throttled,
+        }
+
+
+class Resilience:
+    """Guardas por host compartidas por todos los clientes del proceso"""
+
+    def __init__(self, settings: Optional[Settings] = None, shared=None):
+        self.settings = settings or get_settings()
+        self.shared = shared if shared is not None else get_shared_state(self.settings)
+        self._hosts: Dict[str, HostGuard] = {}
+
+    def for_host(self, host: str) -> HostGuard:
+        guard = self._hosts.get(host)
+        if guard is None:
+            guard = self._hosts[host] = HostGuard(host, self.settings, self.shared)
+        return guard
+
+    def is_open(self, host: str) -> bool:
+        guard = self._hosts.get(host)
+        return guard is not None and guard.breaker.state == CircuitBreaker.OPEN
+
+    def snapshot(self) -> Dict:
+        return {host: guard.snapshot() for host, guard in self._hosts.items()}
+
+
+_resilience: Optional[Resilience] = None
+
+
+def get_resilience() -> Resilience:
+    global _resilience
+    if _resilience is None:
+        _resilience = Resilience()
+    return _resilience
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """Transporte httpx que aplica breaker y rate limit adaptativo por host.
+
+    Cuenta como fallo del host los errores de red/timeouts y los 5xx; un 429
+    sólo baja el ritmo (respetando ``Retry-After``).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, resilience: Optional[Resilience] = None):
+        self._transport = transport
+        self.resilience = resilience or get_resilience()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        guard = self.resilience.for_host(request.url.host)
+        if not guard.breaker.allow():
+            UPSTREAM_ERRORS.labels(request.url.host, 'circuit_open').inc()
+            raise CircuitOpenError(f"Circuit open for {request.url.host}", request=request)
+        try:
+            # Dentro del try: si se cancela esperando turno, el cupo de prueba se devuelve
+            await guard.limiter.acquire()
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            UPSTREAM_ERRORS.labels(request.url.host, 'timeout' if isinstance(e, httpx.TimeoutException) else 'network').inc()
+            guard.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelado u otro error nuestro: no dice nada de la salud del host
+            guard.breaker.release()
+            raise
+
+        UPSTREAM_RESPONSES.labels(request.url.host, response.status_code).inc()
+        if response.status_code == 429 or response.status_code >= 500:
+            # Como mucho se pausa lo que dura un circuito abierto
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                retry_after = min(retry_after, guard.breaker.recovery_timeout)
+            guard.limiter.on_throttle(retry_after)
+            if response.status_code == 429:
+                guard.breaker.record_success()
+            else:
+                guard.breaker.record_failure()
+        else:
+            guard.limiter.on_success()
+            guard.breaker.record_success()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -1,15 +1,193 @@
+import hashlib
+import importlib.util
+import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import OAuth2PasswordBearer
 from ..core.config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+
+class TokenError(Exception):
+    """Token inválido, vencido o con firma incorrecta"""
+
+
+class JWTBackend:
+    """Interfaz común de las librerías JWT"""
+
+    name = "base"
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str, key: str, algorithms: List[str]) -> dict:
+        raise NotImplementedError
+
+
+class JoseBackend(JWTBackend):
+    """python-jose (el backend original)"""
+
+    name = "jose"
+
+    def __init__(self):
+        from jose import JWTError, jwt
+
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithms: List[str]) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=algorithms)
+        except self._error as e:
+            raise TokenError(str(e))
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT: misma semántica; el preferido en 'auto'"""
+
+    name = "pyjwt"
+
+    def __init__(self):
+        import jwt
+
+        self._jwt = jwt
+        self._error = jwt.PyJWTError
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithms: List[str]) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=algorithms)
+        except self._error as e:
+            raise TokenError(str(e))
+
+
+# En 'auto' gana el primero instalado: PyJWT, que está mantenido y verifica HS256
+# a la par de jose según bench_auth.py; jose queda de respaldo
+JWT_BACKENDS = {
+    'pyjwt': ('jwt', PyJWTBackend),
+    'jose': ('jose', JoseBackend),
+}
+
+
+def get_jwt_backend(backend: str = 'auto') -> JWTBackend:
+    """Instanciar el backend pedido; 'auto' elige el primero disponible"""
+    available = [name for name, (module, _) in JWT_BACKENDS.items() if importlib.util.find_spec(module)]
+    if backend != 'auto':
+        if backend not in available:
+            logger.warning(f"JWT backend {backend!r} not available, using auto")
+        else:
+            return JWT_BACKENDS[backend][1]()
+    return JWT_BACKENDS[available[0]][1]()
+
+
+class LazyJWTBackend(JWTBackend):
+    """Elige e importa la librería JWT en el primer uso (jose o PyJWT tardan ~80-100 ms en importarse)"""
+
+    def __init__(self, backend: str = 'auto'):
+        self.backend = backend
+        self._loaded: Optional[JWTBackend] = None
+
+    def load(self) -> JWTBackend:
+        if self._loaded is None:
+            self._loaded = get_jwt_backend(self.backend)
+        return self._loaded
+
+    @property
+    def name(self) -> str:
+        return self.load().name
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return self.load().encode(claims, key, algorithm)
+
+    def decode(self, token: str, key: str, algorithms: List[str]) -> dict:
+        return self.load().decode(token, key, algorithms)
+
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """CryptContext de passlib (bcrypt), importado recién cuando alguien lo necesita"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def __getattr__(name: str):
+    # ``security.pwd_context`` sigue existiendo, pero se crea al primer acceso
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class VerifiedTokenCache:
+    """LRU de tokens ya verificados, indexado por el sha256 del token.
+
+    Una entrada sólo vale hasta el ``exp`` del propio token, así que un
+    acierto de caché nunca acepta algo que la verificación rechazaría.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[dict, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, payload: dict):
+        if self.max_entries <= 0:
+            return
+        exp = payload.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else None
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+jwt_backend = LazyJWTBackend(settings.JWT_BACKEND)
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crear un token JWT de acceso"""
     to_encode = data.copy()
@@ -18,7 +196,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt_backend.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str = Depends(oauth2_scheme)) -> dict:
@@ -28,16 +206,21 @@ def verify_token(token: str = Depends(oauth2_scheme)) -> dict:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+    payload = token_cache.get(token)
+    if payload is not None:
         return payload
-    except JWTError:
+    try:
+        payload = jwt_backend.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except TokenError:
+        raise credentials_exception
+    username: str = payload.get("sub")
+    if username is None:
         raise credentials_exception
+    token_cache.set(token, payload)
+    return payload
 
-def get_current_user(token: str = Security(oauth2_scheme)) -> str:
+async def get_current_user(token: str = Security(oauth2_scheme)) -> str:
     """Obtener el usuario actual del token JWT"""
+    # async: con el token en caché no vale la pena saltar al threadpool
     payload = verify_token(token)
     return payload.get("sub")
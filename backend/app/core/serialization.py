@@ -0,0 +1,106 @@
+import importlib.util
+import json
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from ..models.models import Product
+from .metrics import UPSTREAM_PHASE_DURATION
+
+# orjson es opcional: si no está instalado se usa json de la stdlib
+orjson = None
+if importlib.util.find_spec("orjson"):
+    import orjson
+
+PRODUCT_FIELDS = tuple(Product.model_fields)
+
+product_list_adapter = TypeAdapter(List[Product])
+
+
+def _default(value: Any):
+    # Igual que pydantic: los Decimal viajan como string ("25.90")
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializar a JSON compacto en UTF-8, con orjson cuando está disponible"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class DecimalORJSONResponse(JSONResponse):
+    """Respuesta por defecto de la API: orjson + Decimal como string"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _price(value) -> str:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # pydantic pasa los float a Decimal vía str(): 10.1 -> "10.1", 1e-07 -> "1E-7"
+        return str(Decimal(str(value)))
+    raise TypeError("unexpected price type")
+
+
+# Reescribe image_url (p.ej. a la URL del proxy de imágenes)
+ImageURL = Optional[Callable[[Optional[str]], Optional[str]]]
+
+
+def with_image_url(product: Dict, image_url: ImageURL) -> Dict:
+    """Copia del producto con la imagen reescrita"""
+    if image_url is None:
+        return product
+    return {**product, 'image_url': image_url(product.get('image_url'))}
+
+
+def _product_payload(product: Dict, image_url: ImageURL = None) -> Dict:
+    payload = {field: product.get(field) for field in PRODUCT_FIELDS}
+    if image_url is not None:
+        payload['image_url'] = image_url(payload['image_url'])
+    if not (isinstance(payload['id'], str) and isinstance(payload['name'], str)
+            and isinstance(payload['category'], str)):
+        raise TypeError("unexpected product field type")
+    payload['price'] = _price(payload['price'])
+    payload['stock'] = int(product.get('stock', 0))
+    return payload
+
+
+def product_record(product: Dict, image_url: ImageURL = None) -> Dict:
+    """Dict listo para serializar, con los mismos valores que ``Product`` en JSON"""
+    try:
+        return _product_payload(product, image_url)
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return Product.model_validate(with_image_url(product, image_url)).model_dump(mode='json')
+
+
+def dump_products(products: List[Dict], image_url: ImageURL = None) -> bytes:
+    """JSON de una lista de productos, idéntico al de ``List[Product]``.
+
+    Los dicts que arma el parser o el ProductStore ya tienen los tipos
+    correctos, así que nos saltamos la validación de pydantic; si algo no
+    encaja se vuelve al camino validado (que además reporta el error).
+    """
+    with UPSTREAM_PHASE_DURATION.time('catalog', 'validate'):
+        try:
+            return dumps([_product_payload(product, image_url) for product in products])
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            products = [with_image_url(product, image_url) for product in products]
+            return product_list_adapter.dump_json(product_list_adapter.validate_python(products))
+
+
+def dump_product(product: Dict, image_url: ImageURL = None) -> bytes:
+    """JSON de un producto, idéntico al de ``Product``"""
+    with UPSTREAM_PHASE_DURATION.time('product', 'validate'):
+        try:
+            return dumps(_product_payload(product, image_url))
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return Product.model_validate(with_image_url(product, image_url)).model_dump_json().encode()
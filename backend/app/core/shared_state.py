@@ -0,0 +1,261 @@
+import fnmatch
+import importlib.util
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Iterator, Optional, Union
+
+from .config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+# Con varios workers y sin SHARED_STATE_URL explícita se usa este fichero
+DEFAULT_SQLITE_PATH = "data/shared_state.sqlite3"
+
+Value = Union[bytes, str, int, float]
+
+
+def _encode(value: Value) -> bytes:
+    """Mismo criterio que redis-py: todo se guarda como bytes"""
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class SqliteRedis:
+    """Sustituto local de Redis sobre sqlite (WAL), compartido por los workers de una máquina.
+
+    Implementa el subconjunto de la API de ``redis.Redis`` que usa la app
+    (get/set con ``ex``/``px``/``nx``, delete, incr, incrbyfloat, expire,
+    scan_iter), así con ``SHARED_STATE_URL=redis://...`` el mismo código
+    corre sobre un Redis de verdad. Las operaciones de lectura-escritura van
+    en una transacción ``BEGIN IMMEDIATE``, que es atómica entre procesos.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL)"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def ping(self) -> bool:
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+        return True
+
+    @staticmethod
+    def _expires_at(ex: Optional[float], px: Optional[float]) -> Optional[float]:
+        if ex is not None:
+            return time.time() + ex
+        if px is not None:
+            return time.time() + px / 1000
+        return None
+
+    def _read(self, key: str, now: float):
+        return self._conn.execute(
+            "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, now),
+        ).fetchone()
+
+    def _wrote(self):
+        """Borrar de vez en cuando las claves vencidas (las lecturas ya las ignoran)"""
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._read(name, time.time())
+        return row[0] if row is not None else None
+
+    def set(
+        self,
+        name: str,
+        value: Value,
+        ex: Optional[float] = None,
+        px: Optional[float] = None,
+        nx: bool = False,
+    ) -> Optional[bool]:
+        """SET; con ``nx`` sólo si la clave no existe (o venció). None si no se escribió"""
+        now = time.time()
+        expires_at = self._expires_at(ex, px)
+        with self._lock:
+            if nx:
+                cursor = self._conn.execute(
+                    "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                    " WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+                    (name, _encode(value), expires_at, now),
+                )
+                if cursor.rowcount == 0:
+                    return None
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (name, _encode(value), expires_at),
+                )
+            self._wrote()
+        return True
+
+    def delete(self, *names: str) -> int:
+        if not names:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM kv WHERE key IN ({', '.join('?' * len(names))})"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (*names, time.time()),
+            )
+        return cursor.rowcount
+
+    def _increment(self, name: str, amount, cast):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._read(name, now)
+                # Como en Redis, INCR conserva el TTL de la clave
+                value = cast(row[0]) + amount if row is not None else amount
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (name, _encode(value), row[1] if row is not None else None),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._wrote()
+        return value
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        return self._increment(name, amount, int)
+
+    def incrbyfloat(self, name: str, amount: float = 1.0) -> float:
+        return self._increment(name, amount, float)
+
+    def expire(self, name: str, time_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (now + time_seconds, name, now),
+            )
+        return cursor.rowcount > 0
+
+    def expire_if_value(self, name: str, value: Value, time_seconds: float) -> bool:
+        """EXPIRE sólo si la clave vale ``value`` (una sola sentencia: atómico)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE kv SET expires_at = ? WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (now + time_seconds, name, _encode(value), now),
+            )
+        return cursor.rowcount > 0
+
+    def delete_if_value(self, name: str, value: Value) -> bool:
+        """DEL sólo si la clave vale ``value`` (una sola sentencia: atómico)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM kv WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (name, _encode(value), time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def scan_iter(self, match: Optional[str] = None) -> Iterator[bytes]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM kv WHERE expires_at IS NULL OR expires_at > ?", (time.time(),)
+            ).fetchall()
+        for (key,) in rows:
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+
+@lru_cache()
+def open_shared_state(url: str):
+    """``sqlite:///ruta`` (sustituto local) o ``redis://...`` (necesita el paquete redis)"""
+    if url.startswith("sqlite:///"):
+        return SqliteRedis(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if not importlib.util.find_spec("redis"):
+            raise RuntimeError("SHARED_STATE_URL points to Redis but the redis package is not installed")
+        import redis
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+def get_shared_state(settings: Optional[Settings] = None):
+    """Store compartido entre workers, o None si cada proceso guarda su propio estado"""
+    settings = settings or get_settings()
+    url = settings.SHARED_STATE_URL
+    if not url and settings.WEB_CONCURRENCY > 1:
+        url = f"sqlite:///{DEFAULT_SQLITE_PATH}"
+    return open_shared_state(url) if url else None
+
+
+# En Redis la comparación y la escritura van juntas en un script Lua
+_EXPIRE_IF_VALUE = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+)
+_DELETE_IF_VALUE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def expire_if_value(shared, name: str, value: Value, time_seconds: int) -> bool:
+    """Renovar el TTL de una clave sólo si sigue valiendo ``value``, en un solo paso"""
+    if isinstance(shared, SqliteRedis):
+        return shared.expire_if_value(name, value, time_seconds)
+    return bool(shared.eval(_EXPIRE_IF_VALUE, 1, name, value, time_seconds))
+
+
+def delete_if_value(shared, name: str, value: Value) -> bool:
+    """Borrar una clave sólo si sigue valiendo ``value``, en un solo paso"""
+    if isinstance(shared, SqliteRedis):
+        return shared.delete_if_value(name, value)
+    return bool(shared.eval(_DELETE_IF_VALUE, 1, name, value))
+
+
+class Lease:
+    """Exclusividad entre workers para una tarea de fondo (SET NX con vencimiento).
+
+    El dueño la renueva llamando a ``acquire`` antes de que pasen ``ttl``
+    segundos; si el worker muere, otro la toma cuando vence. Renovar y
+    soltar comparan el dueño y escriben en un solo paso: un worker cuya
+    lease ya venció no le extiende ni le borra la suya a quien la tomó.
+    Las llamadas son bloqueantes (van al store); desde corrutinas, en un hilo.
+    """
+
+    def __init__(self, shared, name: str, ttl: float = 300):
+        self.shared = shared
+        self.key = f"lease:{name}"
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}".encode()
+
+    def acquire(self) -> bool:
+        """Tomar o renovar la lease; False si la tiene otro worker"""
+        if expire_if_value(self.shared, self.key, self.owner, int(self.ttl)):
+            return True
+        return bool(self.shared.set(self.key, self.owner, ex=int(self.ttl), nx=True))
+
+    def release(self):
+        delete_if_value(self.shared, self.key, self.owner)
@@ -1,23 +1,52 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta, datetime
 from .core.config import get_settings, Settings
+from .core import security
 from .core.security import create_access_token, get_current_user
+from .core.metrics import CallbackMetric, CONTENT_TYPE, MetricsMiddleware, REGISTRY
+from .core.resilience import get_resilience
+from .core.http_cache import cached_response, max_age, RenderedResponseCache
+from .core.serialization import DecimalORJSONResponse, dump_product, dump_products, dumps, with_image_url
 from .services.belcorp_service import BelcorpService
+from .services.cache import TieredCache
+from .services.catalog_export import FORMATS, ExportCursor, export_catalog
+from .services.crawler import CatalogCrawler
+from .services.image_cache import ImageFetchError, ImageNotFound, ImageProxy
+from .services.product_store import ProductStore
+from .services.search_index import SearchIndex
+from .services.session_pool import SessionPool
+from .services.user_sessions import UserSessionManager, current_upstream_session
+from .services.notification_outbox import NotificationOutbox, OutboxWorker
+from .services.order_repository import create_order_repository
+from .services.idempotency import IdempotencyStore, IdempotencyConflict
+from .services.singleflight import SingleFlight
 from .services.whatsapp_service import WhatsAppService
 from .models.models import (
     Product,
+    ProductBatchRequest,
+    ProductBatchResponse,
+    ProductSearchResponse,
     CartItem,
     Cart,
     OrderCreate,
     Order,
+    OrderPage,
     LoginRequest,
     LoginResponse
 )
-from typing import List
+from typing import List, Optional
+import asyncio
+import hashlib
+import hmac
+import importlib.util
 import logging
+import re
+import time
 import uuid
 
 # Configure logging
@@ -25,7 +54,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="Belcorp Shop API")
+app = FastAPI(title="Belcorp Shop API", default_response_class=DecimalORJSONResponse)
 settings = get_settings()
 
 # Configure CORS
@@ -37,37 +66,174 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses (brotli if available, gzip otherwise)
+if settings.RESPONSE_COMPRESSION:
+    if importlib.util.find_spec("brotli_asgi"):
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+# Latency per route (outermost, so it includes compression)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Initialize services
 belcorp_service = None
 whatsapp_service = None
+catalog_cache = None
+upstream_singleflight = SingleFlight()
+product_store = None
+catalog_crawler = None
+search_index = None
+notification_outbox = None
+outbox_worker = None
+order_repository = None
+user_sessions = None
+image_proxy = None
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_MAX_KEYS, settings.IDEMPOTENCY_TTL)
+# Readiness (GET /readyz): warm-up finished, or disabled
+warmup_task = None
+warmup_status = {"enabled": settings.WARMUP_ENABLED, "done": False, "ok": None, "seconds": None}
+
+# Counters the services already keep, read at scrape time
+CallbackMetric(
+    "catalog_cache_events", "Catalog cache hits, misses and refreshes", "counter", ("event",),
+    lambda: {(event,): value for event, value in catalog_cache.stats.as_dict().items()} if catalog_cache else {},
+)
+CallbackMetric(
+    "token_cache_events", "Verified JWT cache lookups", "counter", ("event",),
+    lambda: {("hits",): security.token_cache.hits, ("misses",): security.token_cache.misses},
+)
+CallbackMetric(
+    "upstream_singleflight_calls", "Upstream loads requested, executed and coalesced", "counter", ("event",),
+    lambda: {(event,): upstream_singleflight.snapshot()[event] for event in ("calls", "executions", "coalesced")},
+)
+CallbackMetric(
+    "upstream_circuit_open", "1 while the host circuit breaker is not closed", "gauge", ("host",),
+    lambda: {(host,): int(guard['state'] != 'closed') for host, guard in get_resilience().snapshot().items()},
+)
 
 @app.on_event("startup")
 async def startup_event():
-    global belcorp_service, whatsapp_service
-    if settings.BELCORP_USERNAME and settings.BELCORP_PASSWORD:
+    global belcorp_service, whatsapp_service, catalog_cache, product_store, catalog_crawler, search_index
+    global notification_outbox, outbox_worker, order_repository, user_sessions, image_proxy, warmup_task
+    catalog_cache = TieredCache.from_settings(settings)
+    product_store = ProductStore(settings.PRODUCT_STORE_PATH)
+    search_index = SearchIndex(settings.SEARCH_INDEX_PATH)
+    if len(search_index) == 0:
+        for batch in product_store.iter_products():
+            search_index.index_products(batch)
+    if SessionPool.accounts_from_settings(settings):
+        # Una sesión upstream por cuenta configurada; los requests se reparten entre ellas
+        session_pool = SessionPool.from_settings(settings)
         belcorp_service = BelcorpService(
-            username=settings.BELCORP_USERNAME,
-            password=settings.BELCORP_PASSWORD
+            pool=session_pool,
+            cache=catalog_cache,
+            singleflight=upstream_singleflight
         )
+        session_pool.start()
+        belcorp_service.product_listeners.append(search_index.index_products)
+        belcorp_service.change_listeners.append(drop_changed_products)
+        if settings.CRAWLER_ENABLED:
+            catalog_crawler = CatalogCrawler.from_settings(belcorp_service, product_store, settings)
+            catalog_crawler.start()
     else:
         logger.warning("Belcorp credentials not configured!")
+
+    user_sessions = UserSessionManager.from_settings(settings)
+    user_sessions.start()
+
+    if settings.IMAGE_PROXY_ENABLED:
+        image_proxy = ImageProxy.from_settings(settings)
     
+    order_repository = create_order_repository(settings)
+    await order_repository.start()
+
     whatsapp_service = WhatsAppService()
+    if not whatsapp_service.configured:
+        logger.warning("WhatsApp credentials not configured, order notifications are disabled")
+    notification_outbox = NotificationOutbox(settings.OUTBOX_PATH)
+    outbox_worker = OutboxWorker.from_settings(notification_outbox, whatsapp_service, settings)
+    outbox_worker.start()
+
+    # In the background: the server starts listening (and /healthz answers) right away
+    warmup_status.update(enabled=settings.WARMUP_ENABLED, done=False, ok=None, seconds=None)
+    if settings.WARMUP_ENABLED:
+        warmup_task = asyncio.ensure_future(warm_up())
+
+async def warm_up():
+    """Load what the first request would otherwise pay for: JWT library, upstream login, first pages"""
+    started = time.perf_counter()
+    ok = False
+    try:
+        await asyncio.to_thread(security.jwt_backend.load)
+        if belcorp_service:
+            # Past the timeout we report ready anyway; the prefetch keeps going
+            prefetch = asyncio.ensure_future(belcorp_service.warm_up(settings.WARMUP_CATALOG_PAGES))
+            done, _ = await asyncio.wait({prefetch}, timeout=settings.WARMUP_TIMEOUT)
+            if done:
+                ok = prefetch.result()
+            else:
+                logger.warning(f"Warm-up still running after {settings.WARMUP_TIMEOUT}s, reporting ready")
+        else:
+            ok = True
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}")
+    warmup_status.update(done=True, ok=ok, seconds=round(time.perf_counter() - started, 3))
+    logger.info(f"Warm-up finished in {warmup_status['seconds']}s (ok={ok})")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if catalog_crawler:
+        await catalog_crawler.stop()
+    if outbox_worker:
+        await outbox_worker.stop()
+    if whatsapp_service:
+        await whatsapp_service.aclose()
+    if notification_outbox:
+        notification_outbox.close()
+    if order_repository:
+        await order_repository.close()
+    if belcorp_service:
+        await belcorp_service.aclose()
+    if user_sessions:
+        await user_sessions.aclose()
+    if image_proxy:
+        await image_proxy.aclose()
+    if catalog_cache:
+        catalog_cache.close()
+    if product_store:
+        product_store.close()
+    if search_index:
+        search_index.close()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Belcorp Shop API"}
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the process answers; touches neither upstream nor disk
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz(response: Response):
+    ready = not settings.WARMUP_ENABLED or warmup_status["done"]
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "warming_up", "warm_up": warmup_status}
+
 @app.post("/api/token")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    if not belcorp_service:
-        raise HTTPException(status_code=500, detail="Belcorp service not configured")
-    
-    success = belcorp_service.login()
-    if not success:
+    # Login upstream con las credenciales del consultor; su sesión queda ligada al sub del JWT
+    session = await user_sessions.login(form_data.username, form_data.username, form_data.password)
+    if session is None:
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
@@ -80,50 +246,268 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+rendered_responses = RenderedResponseCache(settings.RENDERED_RESPONSE_CACHE_SIZE)
+
+def drop_changed_products(diff):
+    """Un producto que cambió upstream no debe seguir saliendo del caché de respuestas"""
+    for product in diff.changed_products:
+        rendered_responses.discard(f"product:{product['id']}")
+
+def image_origin(request: Request) -> str:
+    """Origen de las URLs del proxy de imágenes: IMAGE_PROXY_BASE_URL o, si está vacío, el del request.
+
+    Las URLs tienen que ser absolutas: el frontend vive en otro origen.
+    """
+    if not image_proxy:
+        return ""
+    return (settings.IMAGE_PROXY_BASE_URL or str(request.base_url)).rstrip("/")
+
+def proxied_image_url(width: int, origin: str):
+    """Reescritura de image_url a la miniatura del proxy (None si el proxy está apagado)"""
+    if not image_proxy:
+        return None
+    return lambda url: image_proxy.url_for(url, width, origin)
+
+async def get_upstream_user(current_user: str = Depends(get_current_user)) -> str:
+    """Usuario actual; sus requests al upstream salen por su propia sesión si la tiene"""
+    session = await user_sessions.get(current_user) if user_sessions else None
+    current_upstream_session.set(session)
+    return current_user
+
 @app.get("/api/products", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: str = None,
     page: int = 1,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_upstream_user)
 ):
     if not belcorp_service:
         raise HTTPException(status_code=500, detail="Belcorp service not configured")
     
-    products = belcorp_service.get_catalog(category=category, page=page)
-    return products
+    key = f"products:{category or ''}:{page}"
+    origin = image_origin(request)
+    rendered = rendered_responses.get(key, origin)
+    if rendered is None:
+        # Primero el índice local del crawler, si no el scraping en vivo
+        products = product_store.get_page(category, page)
+        if products is None:
+            products = await belcorp_service.get_catalog(category=category, page=page)
+        body = dump_products(products, proxied_image_url(settings.IMAGE_LIST_WIDTH, origin))
+        ttl = max_age(settings.CACHE_CONTROL_PRODUCTS) if products else 0
+        rendered = rendered_responses.put(key, body, ttl, origin)
+    return cached_response(request, rendered.body, settings.CACHE_CONTROL_PRODUCTS, etag=rendered.etag)
+
+@app.get("/api/products/search", response_model=ProductSearchResponse)
+async def search_products(
+    request: Request,
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(20, ge=1),
+    offset: int = Query(0, ge=0),
+    current_user: str = Depends(get_current_user)
+):
+    result = search_index.search(
+        query=q,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        limit=min(limit, settings.SEARCH_MAX_LIMIT),
+        offset=offset
+    )
+    image_url = proxied_image_url(settings.IMAGE_LIST_WIDTH, image_origin(request))
+    result['items'] = [with_image_url(item, image_url) for item in result['items']]
+    return result
+
+@app.get("/api/products/export")
+async def export_products(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: str = Depends(get_upstream_user)
+):
+    if not belcorp_service:
+        raise HTTPException(status_code=500, detail="Belcorp service not configured")
+    try:
+        start = ExportCursor.parse(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def fetch_page(page: int):
+        # Igual que /api/products: primero el índice local, si no el scraping en vivo
+        products = product_store.get_page(category, page)
+        if products is None:
+            products = await belcorp_service.get_catalog(category=category, page=page)
+        return products
+
+    body = export_catalog(
+        fetch_page,
+        format,
+        start,
+        concurrency=settings.EXPORT_CONCURRENCY,
+        max_pages=settings.EXPORT_MAX_PAGES,
+        image_url=proxied_image_url(settings.IMAGE_LIST_WIDTH, image_origin(request)),
+    )
+    filename = f"catalog-{re.sub(r'[^A-Za-z0-9_-]+', '_', category or 'all')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
 
 @app.get("/api/products/{product_id}", response_model=Product)
 async def get_product(
+    request: Request,
     product_id: str,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_upstream_user)
 ):
     if not belcorp_service:
         raise HTTPException(status_code=500, detail="Belcorp service not configured")
     
-    product = belcorp_service.get_product_details(product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    key = f"product:{product_id}"
+    origin = image_origin(request)
+    rendered = rendered_responses.get(key, origin)
+    if rendered is None:
+        product = product_store.get_product(product_id)
+        if product is None:
+            product = await belcorp_service.get_product_details(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = dump_product(product, proxied_image_url(settings.IMAGE_DETAIL_WIDTH, origin))
+        rendered = rendered_responses.put(key, body, max_age(settings.CACHE_CONTROL_PRODUCT), origin)
+    return cached_response(request, rendered.body, settings.CACHE_CONTROL_PRODUCT, etag=rendered.etag)
 
-@app.get("/api/categories")
-async def get_categories(current_user: str = Depends(get_current_user)):
+@app.post("/api/products/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    request: Request,
+    batch: ProductBatchRequest,
+    current_user: str = Depends(get_upstream_user)
+):
+    if not belcorp_service:
+        raise HTTPException(status_code=500, detail="Belcorp service not configured")
+    if len(batch.ids) > settings.BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_MAX_IDS} product ids per batch"
+        )
+
+    results = await belcorp_service.get_products_bulk(batch.ids)
+    image_url = proxied_image_url(settings.IMAGE_LIST_WIDTH, image_origin(request))
+    return ProductBatchResponse(
+        products=[with_image_url(product, image_url) for product in results.values() if product],
+        missing=[product_id for product_id, product in results.items() if not product]
+    )
+
+@app.get("/api/images/{key}")
+async def get_image(request: Request, key: str, w: Optional[int] = Query(None, ge=1)):
+    # Sin auth: lo piden los <img> del frontend; la clave firmada impide usarlo como proxy abierto
+    if not image_proxy:
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        image = await image_proxy.get(key, w)
+    except ImageNotFound:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except ImageFetchError as e:
+        logger.error(f"Error fetching image: {str(e)}")
+        raise HTTPException(status_code=502, detail="Image unavailable")
+    return cached_response(
+        request, image.body, settings.IMAGE_CACHE_CONTROL, etag=image.etag, media_type=image.content_type
+    )
+
+@app.get("/api/categories", response_model=List[str])
+async def get_categories(request: Request, current_user: str = Depends(get_upstream_user)):
     if not belcorp_service:
         raise HTTPException(status_code=500, detail="Belcorp service not configured")
     
-    categories = belcorp_service.get_categories()
-    return categories
+    rendered = rendered_responses.get("categories")
+    if rendered is None:
+        categories = product_store.get_categories()
+        if not categories:
+            categories = await belcorp_service.get_categories()
+        body = dumps(categories)
+        ttl = max_age(settings.CACHE_CONTROL_CATEGORIES) if categories else 0
+        rendered = rendered_responses.put("categories", body, ttl)
+    return cached_response(request, rendered.body, settings.CACHE_CONTROL_CATEGORIES, etag=rendered.etag)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats(current_user: str = Depends(get_current_user)):
+    if not catalog_cache:
+        raise HTTPException(status_code=500, detail="Cache not configured")
+    return catalog_cache.snapshot()
+
+@app.get("/api/upstream/stats")
+async def get_upstream_stats(current_user: str = Depends(get_current_user)):
+    stats = {"singleflight": upstream_singleflight.snapshot(), "hosts": get_resilience().snapshot()}
+    if belcorp_service:
+        stats["session_pool"] = belcorp_service.pool.snapshot()
+    if user_sessions:
+        stats["user_sessions"] = user_sessions.snapshot()
+    if image_proxy:
+        stats["images"] = image_proxy.snapshot()
+    return stats
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def metrics_allowed(request: Request) -> bool:
+    """Con METRICS_TOKEN hace falta "Authorization: Bearer <token>"; sin él sólo se sirve a localhost"""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+    return request.client is not None and request.client.host in LOOPBACK_HOSTS
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not metrics_allowed(request):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/notifications/stats")
+async def get_notification_stats(current_user: str = Depends(get_current_user)):
+    return await outbox_worker.snapshot()
 
 @app.post("/api/orders", response_model=Order)
 async def create_order(
     order_create: OrderCreate,
-    current_user: str = Depends(get_current_user)
+    response: Response,
+    current_user: str = Depends(get_upstream_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
+    if not idempotency_key:
+        return await _create_order(order_create)
+
+    # Los reintentos con la misma clave devuelven la orden original sin volver al upstream
+    fingerprint = hashlib.sha256(order_create.model_dump_json().encode()).hexdigest()
     try:
-        # Validar productos y calcular total
+        order, replayed = await idempotency_store.run(
+            f"{current_user}:{idempotency_key}",
+            fingerprint,
+            lambda: _create_order(order_create)
+        )
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key already used with a different request body"
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return order
+
+async def _create_order(order_create: OrderCreate) -> Order:
+    if not belcorp_service:
+        raise HTTPException(status_code=500, detail="Belcorp service not configured")
+
+    try:
+        # Validar productos en paralelo y calcular total
+        products = await belcorp_service.get_products_bulk(
+            [item.product_id for item in order_create.items]
+        )
         total = 0
         for item in order_create.items:
-            product = belcorp_service.get_product_details(item.product_id)
-            if not product:
+            if not products.get(item.product_id):
                 raise HTTPException(
                     status_code=404,
                     detail=f"Product {item.product_id} not found"
@@ -135,21 +519,60 @@ async def create_order(
             id=str(uuid.uuid4()),
             created_at=datetime.utcnow(),
             total=total,
-            **order_create.dict()
+            **order_create.model_dump()
         )
+        await order_repository.save(order)
 
-        # Enviar notificación por WhatsApp
-        if whatsapp_service:
-            success = whatsapp_service.send_order_notification(order)
-            if not success:
-                logger.warning("Failed to send WhatsApp notification")
-
-        return order
-
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
         raise HTTPException(status_code=500, detail="Error creating order")
 
+    # The order is committed: from here on no 500, or a retry (even with the same Idempotency-Key) would duplicate it
+    if not whatsapp_service.configured:
+        # Without a sender the row would only end up failed
+        return order
+    try:
+        # Encolar la notificación por WhatsApp (la envía el worker del outbox)
+        await notification_outbox.enqueue(
+            order.customer_phone,
+            whatsapp_service.format_order_message(order)
+        )
+    except Exception as e:
+        logger.error(f"Order {order.id} saved but its WhatsApp notification could not be queued: {str(e)}")
+
+    return order
+
+@app.get("/api/orders", response_model=OrderPage)
+async def list_orders(
+    customer_phone: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        orders, next_cursor = await order_repository.list_orders(
+            customer_phone=customer_phone,
+            status=status,
+            limit=min(limit, settings.ORDER_PAGE_MAX_LIMIT),
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return OrderPage(items=orders, next_cursor=next_cursor)
+
+@app.get("/api/orders/{order_id}", response_model=Order)
+async def get_order(
+    order_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    order = await order_repository.get(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
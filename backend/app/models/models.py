@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -13,6 +13,26 @@ class Product(BaseModel):
     stock: int = 0
     sku: Optional[str] = None
 
+class ProductBatchRequest(BaseModel):
+    ids: List[str] = Field(min_length=1)
+
+class ProductBatchResponse(BaseModel):
+    products: List[Product]
+    missing: List[str] = []
+
+class PriceFacet(BaseModel):
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+
+class SearchFacets(BaseModel):
+    categories: Dict[str, int] = {}
+    price: PriceFacet = PriceFacet()
+
+class ProductSearchResponse(BaseModel):
+    items: List[Product]
+    total: int
+    facets: SearchFacets
+
 class CartItem(BaseModel):
     product_id: str
     quantity: int = Field(gt=0)
@@ -35,6 +55,10 @@ class Order(OrderCreate):
     total: Decimal
     status: str = "pending"
 
+class OrderPage(BaseModel):
+    items: List[Order]
+    next_cursor: Optional[str] = None
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -1,230 +1,350 @@
-import requests
-import json
+import asyncio
+import functools
+import httpx
 import logging
-from typing import Optional, Dict, List
-from datetime import datetime
-from bs4 import BeautifulSoup
-import re
+from typing import Any, Callable, Optional, Dict, List, NamedTuple
+
+from ..core.config import get_settings
+from ..core.http import create_async_client
+from ..core.metrics import BELCORP_PAGE_FETCHES, UPSTREAM_PHASE_DURATION
+from .cache import TieredCache
+from .change_detection import PageDiff, PageValidators, content_hash, diff_products
+from .html_parser import HTMLParser, get_parser
+from .session_pool import SessionPool, UpstreamSession
+from .singleflight import SingleFlight, normalize_url
+from .user_sessions import current_upstream_session
 
 logger = logging.getLogger(__name__)
 
+
+class UpstreamFetchError(Exception):
+    """El upstream no devolvió la página (error HTTP, red, timeout o circuito abierto)"""
+
+
+class FetchedPage(NamedTuple):
+    result: Any
+    previous: Any  # resultado de la versión anterior (None si es la primera vez)
+    changed: bool
+
+
 class BelcorpService:
-    def __init__(self, username: str, password: str):
-        self.base_url = "https://www.somosbelcorp.com"
-        self.session = requests.Session()
-        self.username = username
-        self.password = password
-        self._setup_session()
-
-    def _setup_session(self):
-        """Configurar la sesión con headers básicos"""
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9,es-US;q=0.8,es;q=0.7',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        })
-
-    def _check_auth(self) -> bool:
-        """Verificar si la sesión está autenticada"""
-        try:
-            response = self.session.get(f"{self.base_url}/Inicio")
-            return '.ASPXAUTH' in self.session.cookies and response.status_code == 200
-        except Exception as e:
-            logger.error(f"Error checking authentication: {str(e)}")
-            return False
+    """Cliente asíncrono de somosbelcorp.com sobre un pool de sesiones upstream.
 
-    def login(self) -> bool:
-        """Login to Belcorp website"""
-        try:
-            # Get initial page to obtain session cookie
-            initial_response = self.session.get(f"{self.base_url}/Login")
-            if initial_response.status_code != 200:
-                logger.error(f"Failed to get login page: {initial_response.status_code}")
-                return False
-
-            # Extract CSRF token if needed
-            soup = BeautifulSoup(initial_response.text, 'html.parser')
-            csrf_token = soup.find('input', {'name': '__RequestVerificationToken'})
-            csrf_value = csrf_token['value'] if csrf_token else ''
-
-            # Prepare login data
-            login_data = {
-                'returnUrl': '',
-                'UsuarioExterno.Proveedor': '',
-                'UsuarioExterno.IdAplicacion': '',
-                'UsuarioExterno.Login': '',
-                'UsuarioExterno.Nombres': '',
-                'UsuarioExterno.Apellidos': '',
-                'UsuarioExterno.FechaNacimiento': '',
-                'UsuarioExterno.Correo': '',
-                'UsuarioExterno.Genero': '',
-                'UsuarioExterno.Ubicacion': '',
-                'UsuarioExterno.LinkPerfil': '',
-                'UsuarioExterno.FotoPerfil': '',
-                'UsuarioExterno.Redireccionar': 'true',
-                'hdeCodigoISO': 'CO',
-                'PaisID': '4',
-                'Salt': '2SXccYWpFDxepFgE+1kkQA==',
-                'ClaveSecreta': 'nYHNy0VEf28pU1Pn62ifyg==',
-                'Key': '8IBfm92u6Bq5Aevxcpykukuc7JPaZVyutWWmUqeZNsE=',
-                'Iv': 'xLTp8isMN5WKWjLcqvmLrQ==',
-                'CodigoISO': 'CO',
-                'CodigoUsuario': self.username,
-                '__RequestVerificationToken': csrf_value
-            }
-
-            # Perform login
-            login_response = self.session.post(
-                f"{self.base_url}/Login/Login",
-                data=login_data,
-                allow_redirects=True
-            )
+    Con ``username``/``password`` arma un pool de una sola cuenta (el
+    comportamiento de siempre); con ``pool`` reparte los requests entre
+    varias cuentas autenticadas.
+    """
 
-            # Check if login was successful
-            return self._check_auth()
+    def __init__(
+        self,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TieredCache] = None,
+        singleflight: Optional[SingleFlight] = None,
+        parser: Optional[HTMLParser] = None,
+        pool: Optional[SessionPool] = None,
+        validators: Optional[PageValidators] = None,
+    ):
+        settings = get_settings()
+        self.base_url = base_url or (pool.base_url if pool else settings.BELCORP_BASE_URL)
+        self.parser = parser or get_parser(settings.HTML_PARSER, lazy=True)
+        if pool is None:
+            pool = SessionPool([UpstreamSession(
+                username,
+                password,
+                self.base_url,
+                self.parser,
+                client=client or create_async_client(follow_redirects=True),
+                idle_timeout=settings.BELCORP_SESSION_IDLE_TIMEOUT,
+            )], keepalive_interval=settings.SESSION_POOL_KEEPALIVE_INTERVAL)
+        # Un pool recibido pasa a ser nuestro; un client recibido no
+        self._owns_client = client is None
+        self.pool = pool
+        self.cache = cache
+        self.singleflight = singleflight or SingleFlight()
+        # Se llaman con cada lote de productos recién scrapeados (p.ej. el índice de búsqueda)
+        self.product_listeners: List[Callable[[List[Dict]], None]] = []
+        # Se llaman con el diff de cada página que cambió respecto de la versión anterior
+        self.change_listeners: List[Callable[[PageDiff], None]] = []
+        self.validators = validators or PageValidators(settings.PAGE_VALIDATORS_MAX_ENTRIES)
+        self._settings = settings
 
-        except Exception as e:
-            logger.error(f"Login failed: {str(e)}")
-            return False
+    async def aclose(self):
+        """Cerrar el pool de sesiones (sólo si los clientes son propios)"""
+        if self._owns_client:
+            await self.pool.aclose()
+        else:
+            await self.pool.stop()
 
-    def get_catalog(self, category: Optional[str] = None, page: int = 1) -> List[Dict]:
-        """Obtener catálogo de productos"""
-        try:
-            if not self._check_auth():
-                if not self.login():
-                    logger.error("Failed to authenticate")
-                    return []
-
-            # Construir URL del catálogo
-            catalog_url = f"{self.base_url}/Catalogo"
-            if category:
-                catalog_url += f"/Categoria/{category}"
-            catalog_url += f"?pagina={page}"
-
-            # Obtener página del catálogo
-            response = self.session.get(catalog_url)
-            if response.status_code != 200:
-                logger.error(f"Failed to get catalog: {response.status_code}")
-                return []
+    async def _check_auth(self) -> bool:
+        """Verificar contra /Inicio que todas las sesiones del pool siguen autenticadas"""
+        results = await asyncio.gather(*(session.check_auth() for session in self.pool.sessions))
+        return all(results)
+
+    async def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[httpx.Response]:
+        """GET autenticado: con la sesión del consultor si el request trae una, si no con el pool"""
+        session = current_upstream_session.get()
+        if session is not None:
+            response = await session.get(url, headers)
+            if response is not None:
+                return response
+            logger.warning(f"Upstream session of {session.username} unusable, falling back to the pool")
+        return await self.pool.get(url, headers)
+
+    async def _fetch_page(self, kind: str, url: str, parse: Callable[[str], Any], what: str) -> Optional[FetchedPage]:
+        """GET condicional; sólo se parsea si la página cambió desde la última descarga"""
+        validator = self.validators.get(url)
+        with UPSTREAM_PHASE_DURATION.time(kind, 'fetch'):
+            response = await self._get(url, self.validators.conditional_headers(validator))
+        if response is None:
+            return None
+        if response.status_code == 304 and validator is not None:
+            self.validators.not_modified += 1
+            BELCORP_PAGE_FETCHES.labels(kind, 'not_modified').inc()
+            return FetchedPage(validator.result, validator.result, False)
+        if response.status_code != 200:
+            logger.error(f"Failed to get {what}: {response.status_code}")
+            return None
+
+        digest = content_hash(response.content)
+        if validator is not None and validator.content_hash == digest:
+            # Idéntica byte a byte: upstream no manda validadores o no los respeta
+            self.validators.unchanged += 1
+            BELCORP_PAGE_FETCHES.labels(kind, 'unchanged').inc()
+            self.validators.put(url, response, digest, validator.result)
+            return FetchedPage(validator.result, validator.result, False)
+
+        with UPSTREAM_PHASE_DURATION.time(kind, 'parse'):
+            result = parse(response.text)
+        if validator is None:
+            self.validators.new += 1
+            BELCORP_PAGE_FETCHES.labels(kind, 'new').inc()
+        else:
+            self.validators.changed += 1
+            BELCORP_PAGE_FETCHES.labels(kind, 'changed').inc()
+        self.validators.put(url, response, digest, result)
+        return FetchedPage(result, validator.result if validator else None, True)
+
+    def _page_changed(self, kind: str, url: str, current: List[Dict], previous: Optional[List[Dict]]):
+        """Avisar sólo lo que cambió: productos nuevos/modificados y el diff de la página"""
+        if previous is None:
+            # Primera vez que vemos la página (p.ej. tras un reinicio): no hay con qué comparar
+            self._notify_products(current)
+            return
+        diff = diff_products(kind, url, previous, current)
+        if not diff:
+            return
+        if diff.changed_products:
+            self._notify_products(diff.changed_products)
+        for listener in self.change_listeners:
+            try:
+                listener(diff)
+            except Exception as e:
+                logger.error(f"Change listener failed: {str(e)}")
+
+    async def login(self) -> bool:
+        """Login en todas las cuentas del pool; True si alguna quedó autenticada"""
+        return await self.pool.login_all()
+
+    async def warm_up(self, catalog_pages: int = 1) -> bool:
+        """Login, categorías y primeras páginas del catálogo, todo en paralelo.
+
+        Las descargas esperan al login en vuelo de su sesión en vez de hacer
+        otro, así el primer request de un usuario no paga el arranque.
+        """
+        results = await asyncio.gather(
+            self.login(),
+            self.get_categories(),
+            *(self.get_catalog(page=page) for page in range(1, catalog_pages + 1)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Warm-up request failed: {str(result)}")
+        return all(result and not isinstance(result, Exception) for result in results)
+
+    def _notify_products(self, products: List[Dict]):
+        """Avisar a los listeners de productos recién scrapeados"""
+        for listener in self.product_listeners:
+            try:
+                listener(products)
+            except Exception as e:
+                logger.error(f"Product listener failed: {str(e)}")
+
+    async def _cached(self, key: str, ttl: float, loader):
+        """Pasar por el caché compartido si está configurado"""
+        if self.cache is None:
+            return await loader()
+        return await self.cache.get_or_load(key, loader, ttl)
+
+    async def get_catalog(self, category: Optional[str] = None, page: int = 1, strict: bool = False) -> List[Dict]:
+        """Obtener catálogo de productos.
+
+        Si la descarga falla devuelve ``[]``, igual que una página vacía; con
+        ``strict`` lanza ``UpstreamFetchError``, para quien necesita
+        distinguirlas (p.ej. el crawler, que poda el catálogo en la última página).
+        """
+        return await self._cached(
+            f"catalog:{category or ''}:{page}",
+            self._settings.CACHE_TTL_CATALOG,
+            lambda: self._fetch_catalog(category, page, strict),
+        )
+
+    async def get_product_details(self, product_id: str) -> Optional[Dict]:
+        """Obtener detalles de un producto específico"""
+        return await self._cached(
+            f"product:{product_id}",
+            self._settings.CACHE_TTL_PRODUCT,
+            lambda: self._fetch_product_details(product_id),
+        )
+
+    async def get_products_bulk(self, product_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """Obtener varios productos en paralelo (fan-out acotado, pasando por el caché)"""
+        semaphore = asyncio.Semaphore(self._settings.BULK_FETCH_CONCURRENCY)
+
+        async def fetch(product_id: str) -> Optional[Dict]:
+            async with semaphore:
+                return await self.get_product_details(product_id)
+
+        unique_ids = list(dict.fromkeys(product_ids))
+        results = await asyncio.gather(*(fetch(product_id) for product_id in unique_ids))
+        return dict(zip(unique_ids, results))
+
+    async def get_categories(self) -> List[str]:
+        """Obtener lista de categorías disponibles"""
+        return await self._cached(
+            "categories",
+            self._settings.CACHE_TTL_CATEGORIES,
+            self._fetch_categories,
+        )
+
+    async def _fetch_catalog(self, category: Optional[str] = None, page: int = 1, strict: bool = False) -> List[Dict]:
+        """Descargar y parsear una página del catálogo (una sola vez por URL en vuelo)"""
+        # Construir URL del catálogo
+        catalog_url = f"{self.base_url}/Catalogo"
+        if category:
+            catalog_url += f"/Categoria/{category}"
+        catalog_url += f"?pagina={page}"
 
-            # Parsear HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            products = []
-
-            # Encontrar todos los productos en la página
-            product_elements = soup.find_all('div', class_='producto')
-            for element in product_elements:
-                try:
-                    # Extraer información del producto
-                    product_id = element.get('data-id', '')
-                    name = element.find('h3', class_='nombre').text.strip()
-                    price_element = element.find('span', class_='precio')
-                    price = self._extract_price(price_element.text) if price_element else 0
-                    image = element.find('img')
-                    image_url = image.get('src', '') if image else None
-                    
-                    products.append({
-                        'id': product_id,
-                        'name': name,
-                        'price': price,
-                        'image_url': image_url,
-                        'category': category or 'general',
-                        'stock': 100  # Default stock value
-                    })
-                except Exception as e:
-                    logger.error(f"Error parsing product: {str(e)}")
-                    continue
-
-            return products
+        try:
+            return await self.singleflight.do(
+                f"catalog:{normalize_url(catalog_url)}",
+                lambda: self._load_catalog(catalog_url, category),
+            )
+        except UpstreamFetchError:
+            if strict:
+                raise
+            return []
 
+    async def _load_catalog(self, catalog_url: str, category: Optional[str]) -> List[Dict]:
+        try:
+            # Obtener página del catálogo (sin re-parsear si no cambió)
+            page = await self._fetch_page(
+                'catalog', catalog_url, lambda html: self._parse_catalog(html, category), "catalog"
+            )
         except Exception as e:
             logger.error(f"Error getting catalog: {str(e)}")
-            return []
+            raise UpstreamFetchError(f"{catalog_url}: {str(e)}") from e
+        if page is None:
+            raise UpstreamFetchError(f"{catalog_url}: no response")
+        try:
+            if page.changed:
+                self._page_changed('catalog', catalog_url, page.result, page.previous)
+        except Exception as e:
+            logger.error(f"Error getting catalog: {str(e)}")
+        return page.result
 
-    def get_product_details(self, product_id: str) -> Optional[Dict]:
-        """Obtener detalles de un producto específico"""
+    async def _fetch_product_details(self, product_id: str) -> Optional[Dict]:
+        """Descargar y parsear la página de un producto (una sola vez por URL en vuelo)"""
+        product_url = f"{self.base_url}/Producto/{product_id}"
+        return await self.singleflight.do(
+            f"product:{normalize_url(product_url)}",
+            lambda: self._load_product_details(product_url, product_id),
+        )
+
+    async def _load_product_details(self, product_url: str, product_id: str) -> Optional[Dict]:
         try:
-            if not self._check_auth():
-                if not self.login():
-                    logger.error("Failed to authenticate")
-                    return None
-
-            # Obtener página de detalles del producto
-            response = self.session.get(f"{self.base_url}/Producto/{product_id}")
-            if response.status_code != 200:
-                logger.error(f"Failed to get product details: {response.status_code}")
+            # Obtener página de detalles del producto (sin re-parsear si no cambió)
+            page = await self._fetch_page(
+                'product', product_url, lambda html: self._parse_product(html, product_id), "product details"
+            )
+            if page is None:
                 return None
-
-            # Parsear HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extraer información detallada del producto
-            name = soup.find('h1', class_='nombre-producto').text.strip()
-            description = soup.find('div', class_='descripcion-producto')
-            description_text = description.text.strip() if description else None
-            price_element = soup.find('span', class_='precio-producto')
-            price = self._extract_price(price_element.text) if price_element else 0
-            image = soup.find('img', class_='imagen-producto')
-            image_url = image.get('src', '') if image else None
-            sku = soup.find('span', class_='sku-producto')
-            sku_text = sku.text.strip() if sku else None
-
-            return {
-                'id': product_id,
-                'name': name,
-                'description': description_text,
-                'price': price,
-                'image_url': image_url,
-                'category': 'general',  # Se puede mejorar extrayendo la categoría real
-                'stock': 100,  # Default stock value
-                'sku': sku_text
-            }
+            if page.changed:
+                previous = [page.previous] if page.previous else None
+                self._page_changed('product', product_url, [page.result], previous)
+            return page.result
 
         except Exception as e:
             logger.error(f"Error getting product details: {str(e)}")
             return None
 
-    def get_categories(self) -> List[str]:
-        """Obtener lista de categorías disponibles"""
+    async def _fetch_categories(self) -> List[str]:
+        """Descargar y parsear el menú de categorías (una sola vez en vuelo)"""
+        categories_url = f"{self.base_url}/Catalogo"
+        return await self.singleflight.do(
+            f"categories:{normalize_url(categories_url)}",
+            lambda: self._load_categories(categories_url),
+        )
+
+    async def _load_categories(self, categories_url: str) -> List[str]:
         try:
-            if not self._check_auth():
-                if not self.login():
-                    logger.error("Failed to authenticate")
-                    return []
-
-            # Obtener página principal del catálogo
-            response = self.session.get(f"{self.base_url}/Catalogo")
-            if response.status_code != 200:
-                logger.error(f"Failed to get categories: {response.status_code}")
+            # Obtener página principal del catálogo (sin re-parsear si no cambió)
+            page = await self._fetch_page('categories', categories_url, self._parse_categories, "categories")
+            if page is None:
                 return []
-
-            # Parsear HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            categories = []
-
-            # Encontrar el menú de categorías
-            category_menu = soup.find('ul', class_='menu-categorias')
-            if category_menu:
-                category_items = category_menu.find_all('li')
-                for item in category_items:
-                    link = item.find('a')
-                    if link:
-                        category_name = link.text.strip()
-                        categories.append(category_name)
-
-            return categories
+            return page.result
 
         except Exception as e:
             logger.error(f"Error getting categories: {str(e)}")
             return []
 
-    def _extract_price(self, price_text: str) -> float:
-        """Extraer precio numérico de un texto"""
-        try:
-            # Eliminar símbolos de moneda y espacios
-            clean_price = re.sub(r'[^\d.,]', '', price_text)
-            # Convertir a formato numérico
-            return float(clean_price.replace(',', '.'))
-        except Exception:
-            return 0.0
+    def _parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        """Extraer los productos de una página del catálogo"""
+        return self.parser.parse_catalog(html, category)
+
+    def _parse_product(self, html: str, product_id: str) -> Dict:
+        """Extraer los detalles de la página de un producto"""
+        return self.parser.parse_product(html, product_id)
+
+    def _parse_categories(self, html: str) -> List[str]:
+        """Extraer los nombres del menú de categorías"""
+        return self.parser.parse_categories(html)
+
+
+class SyncBelcorpService:
+    """Fachada síncrona de BelcorpService para scripts y la consola.
+
+    Mantiene su propio event loop para que el pool de conexiones del
+    AsyncClient se reutilice entre llamadas.
+    """
+
+    def __init__(self, username: str, password: str, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._service = BelcorpService(username, password, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self._loop.run_until_complete(attr(*args, **kwargs))
+
+        return call
+
+    def close(self):
+        """Cerrar el cliente y el event loop propio"""
+        if self._loop.is_closed():
+            return
+        self._loop.run_until_complete(self._service.aclose())
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
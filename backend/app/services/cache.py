@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from ..core.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    expires_at: float  # Hasta aquí el valor es fresco
+    stale_until: float  # Hasta aquí se puede servir mientras se revalida
+
+
+class CacheStats:
+    """Contadores de uso del caché"""
+
+    FIELDS = (
+        "hits", "stale_hits", "disk_hits", "outage_hits", "misses",
+        "evictions", "expirations", "refreshes", "refresh_errors",
+    )
+
+    def __init__(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class LRUCache:
+    """Caché en memoria acotado por número de entradas (LRU).
+
+    Las entradas se conservan ``retain`` segundos más allá de ``stale_until``
+    por si hay que servirlas con el upstream caído.
+    """
+
+    def __init__(self, max_entries: int, stats: CacheStats, retain: float = 0):
+        self.max_entries = max_entries
+        self.stats = stats
+        self.retain = retain
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if now >= entry.stale_until + self.retain:
+            del self._data[key]
+            self.stats.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SqliteCacheTier:
+    """Segundo nivel en disco (sqlite) que sobrevive a reinicios"""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int, stats: CacheStats, retain: float = 0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = stats
+        self.retain = retain
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " stale_until REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_stale_until ON cache (stale_until)")
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if now >= row[2] + self.retain:
+            self.delete(key)
+            self.stats.expirations += 1
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
+
+    def set(self, key: str, entry: CacheEntry):
+        payload = json.dumps(entry.value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, payload, entry.expires_at, entry.stale_until),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        """Borrar vencidos y, si sobra, las entradas que vencen antes"""
+        self._conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time() - self.retain,))
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stale_until LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evictions += overflow
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SharedCacheTier:
+    """Segundo nivel común a todos los workers, en el store compartido (interfaz Redis).
+
+    Las entradas vencen solas en el store (TTL = ``stale_until`` + ``retain``).
+    """
+
+    def __init__(self, shared, stats: CacheStats, retain: float = 0, prefix: str = "catalog_cache:"):
+        self.shared = shared
+        self.stats = stats
+        self.retain = retain
+        self.prefix = prefix
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        payload = self.shared.get(self.prefix + key)
+        if payload is None:
+            return None
+        value, expires_at, stale_until = json.loads(payload)
+        if now >= stale_until + self.retain:
+            return None
+        return CacheEntry(value, expires_at, stale_until)
+
+    def set(self, key: str, entry: CacheEntry):
+        ttl = entry.stale_until + self.retain - time.time()
+        if ttl <= 0:
+            return
+        payload = json.dumps([entry.value, entry.expires_at, entry.stale_until], default=str)
+        self.shared.set(self.prefix + key, payload, px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.shared.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.shared.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.shared.delete(*keys)
+
+    def close(self):
+        pass  # el store es del proceso, no de este caché
+
+
+class TieredCache:
+    """Caché de dos niveles (memoria LRU + disco opcional) con stale-while-revalidate.
+
+    El segundo nivel es el store compartido entre workers si lo hay, si no
+    el sqlite local opcional. Un valor fresco se devuelve directamente. Un valor vencido pero dentro de
+    la ventana ``stale_ttl`` se devuelve igual y se revalida en segundo plano,
+    así el usuario nunca espera un scraping de datos que ya tenemos. Pasada
+    esa ventana el valor se guarda ``outage_ttl`` más y sólo se sirve si la
+    recarga falla (upstream caído o circuito abierto).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        stale_ttl: float = 0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 50000,
+        outage_ttl: float = 0,
+        shared=None,
+    ):
+        self.stats = CacheStats()
+        self.stale_ttl = stale_ttl
+        self.memory = LRUCache(max_entries, self.stats, retain=outage_ttl)
+        if shared is not None:
+            self.disk = SharedCacheTier(shared, self.stats, retain=outage_ttl)
+        elif disk_path:
+            self.disk = SqliteCacheTier(disk_path, disk_max_entries, self.stats, retain=outage_ttl)
+        else:
+            self.disk = None
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "TieredCache":
+        return cls(
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            stale_ttl=settings.CACHE_STALE_TTL,
+            disk_path=settings.CACHE_DISK_PATH,
+            disk_max_entries=settings.CACHE_DISK_MAX_ENTRIES,
+            outage_ttl=settings.CACHE_OUTAGE_TTL,
+            shared=get_shared_state(settings),
+        )
+
+    def _lookup(self, key: str, now: float) -> Optional[CacheEntry]:
+        entry = self.memory.get(key, now)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key, now)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self.memory.set(key, entry)
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """Leer un valor fresco sin cargar nada (None si no está o venció)"""
+        now = time.time()
+        entry = self._lookup(key, now)
+        if entry is None or now >= entry.expires_at:
+            return None
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        entry = CacheEntry(value, now + ttl, now + ttl + self.stale_ttl)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def invalidate(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        """Devolver el valor cacheado o cargarlo con ``loader``.
+
+        Los resultados vacíos (``None``, ``[]``) no se cachean: el servicio
+        los usa para señalar errores del upstream.
+        """
+        now = time.time()
+        entry = self._lookup(key, now)
+        if entry is not None and now < entry.stale_until:
+            if now < entry.expires_at:
+                self.stats.hits += 1
+            else:
+                self.stats.stale_hits += 1
+                self._schedule_refresh(key, loader, ttl)
+            return entry.value
+
+        self.stats.misses += 1
+        value = await loader()
+        if value:
+            self.set(key, value, ttl)
+        elif entry is not None:
+            # La recarga falló: mejor el último dato conocido que nada
+            self.stats.outage_hits += 1
+            return entry.value
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float):
+        if key in self._refreshing:
+            return
+        self._refreshing[key] = asyncio.ensure_future(self._refresh(key, loader, ttl))
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float):
+        try:
+            value = await loader()
+            if value:
+                self.set(key, value, ttl)
+                self.stats.refreshes += 1
+            else:
+                self.stats.refresh_errors += 1
+        except Exception as e:
+            self.stats.refresh_errors += 1
+            logger.error(f"Error refreshing cache entry {key}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores y tamaño actual, para dimensionar el caché"""
+        data = self.stats.as_dict()
+        data["memory_entries"] = len(self.memory)
+        data["memory_max_entries"] = self.memory.max_entries
+        data["disk_enabled"] = self.disk is not None
+        data["shared"] = isinstance(self.disk, SharedCacheTier)
+        data["refreshing"] = len(self._refreshing)
+        return data
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
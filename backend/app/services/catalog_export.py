@@ -0,0 +1,106 @@
+import asyncio
+import csv
+import io
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from ..core.serialization import ImageURL, PRODUCT_FIELDS, dumps, product_record
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class ExportCursor(NamedTuple):
+    """Posición de reanudación: página y cuántos productos de ella ya se enviaron"""
+
+    page: int
+    offset: int
+
+    def __str__(self) -> str:
+        return f"{self.page}.{self.offset}"
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "ExportCursor":
+        if not value:
+            return cls(1, 0)
+        page, _, offset = value.partition(".")
+        cursor = cls(int(page), int(offset or 0))
+        if cursor.page < 1 or cursor.offset < 0:
+            raise ValueError(value)
+        return cursor
+
+
+async def iter_pages(
+    fetch_page: Callable[[int], Awaitable[List[Dict]]],
+    start_page: int,
+    concurrency: int,
+    max_pages: int,
+) -> AsyncIterator[Tuple[int, List[Dict]]]:
+    """Páginas en orden, con a lo sumo ``concurrency`` descargas adelantadas.
+
+    La siguiente página sólo se pide cuando el consumidor retira una, así
+    que un cliente lento frena la descarga (backpressure) y en memoria nunca
+    hay más de ``concurrency`` páginas. Termina en la primera página vacía.
+    """
+    pending: "deque[Tuple[int, asyncio.Task]]" = deque()
+    next_page = start_page
+    try:
+        while True:
+            while len(pending) < concurrency and next_page <= max_pages:
+                pending.append((next_page, asyncio.ensure_future(fetch_page(next_page))))
+                next_page += 1
+            if not pending:
+                return
+            page, task = pending.popleft()
+            products = await task
+            if not products:
+                return
+            yield page, products
+    finally:
+        # Fin del catálogo o cliente desconectado: no dejar descargas colgando
+        for _, task in pending:
+            task.cancel()
+
+
+async def export_catalog(
+    fetch_page: Callable[[int], Awaitable[List[Dict]]],
+    export_format: str,
+    cursor: ExportCursor,
+    concurrency: int,
+    max_pages: int,
+    image_url: ImageURL = None,
+) -> AsyncIterator[bytes]:
+    """Cuerpo del export, un bloque por página.
+
+    Cada registro lleva el cursor que retoma justo después de él, así un
+    cliente que perdió la conexión sigue desde la última línea completa.
+    """
+    if export_format == 'csv':
+        columns = list(PRODUCT_FIELDS) + ['cursor']
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode('utf-8')
+
+    async for page, products in iter_pages(fetch_page, cursor.page, concurrency, max_pages):
+        skip = cursor.offset if page == cursor.page else 0
+        records = []
+        for index, product in enumerate(products[skip:], start=skip + 1):
+            record = product_record(product, image_url)
+            record['cursor'] = str(ExportCursor(page, index))
+            records.append(record)
+        if not records:
+            continue
+
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows([record.get(column) for column in columns] for record in records)
+            yield buffer.getvalue().encode('utf-8')
+        else:
+            yield b"".join(dumps(record) + b"\n" for record in records)
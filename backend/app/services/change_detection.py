@@ -0,0 +1,108 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+
+
+class PageValidator(NamedTuple):
+    """Lo necesario para saber si una página upstream cambió desde la última vez"""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    result: Any  # lo que devolvió el parser para esa versión
+
+
+class PageDiff(NamedTuple):
+    """Cambios de una página respecto de la versión anterior"""
+
+    kind: str  # 'catalog' | 'product'
+    url: str
+    added: List[Dict]
+    removed: List[str]
+    repriced: List[Dict]
+    updated: List[Dict]  # otros campos (nombre, imagen, stock...) con el mismo precio
+
+    @property
+    def changed_products(self) -> List[Dict]:
+        return self.added + self.repriced + self.updated
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.repriced or self.updated)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def diff_products(kind: str, url: str, previous: List[Dict], current: List[Dict]) -> PageDiff:
+    """Comparar dos versiones de los productos de una página por id"""
+    before = {product['id']: product for product in previous if product.get('id')}
+    after = {product['id']: product for product in current if product.get('id')}
+    added, repriced, updated = [], [], []
+    for product_id, product in after.items():
+        old = before.get(product_id)
+        if old is None:
+            added.append(product)
+        elif old.get('price') != product.get('price'):
+            repriced.append(product)
+        elif old != product:
+            updated.append(product)
+    removed = [product_id for product_id in before if product_id not in after]
+    return PageDiff(kind, url, added, removed, repriced, updated)
+
+
+class PageValidators:
+    """Validadores por URL (ETag/Last-Modified o hash del cuerpo) y el resultado parseado.
+
+    Con ellos los refrescos mandan requests condicionales y, si upstream
+    responde 304 o el cuerpo es idéntico, se reutiliza el resultado anterior
+    sin volver a parsear. LRU acotado a ``max_entries`` URLs.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PageValidator]" = OrderedDict()
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url: str) -> Optional[PageValidator]:
+        validator = self._entries.get(url)
+        if validator is not None:
+            self._entries.move_to_end(url)
+        return validator
+
+    def conditional_headers(self, validator: Optional[PageValidator]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since para revalidar la versión guardada"""
+        headers = {}
+        if validator is not None:
+            if validator.etag:
+                headers['If-None-Match'] = validator.etag
+            if validator.last_modified:
+                headers['If-Modified-Since'] = validator.last_modified
+        return headers
+
+    def put(self, url: str, response: httpx.Response, digest: str, result: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[url] = PageValidator(
+            response.headers.get('etag'), response.headers.get('last-modified'), digest, result
+        )
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'changed': self.changed,
+            'new': self.new,
+        }
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from ..core.shared_state import Lease, get_shared_state
+from .belcorp_service import BelcorpService, UpstreamFetchError
+from .product_store import ProductStore
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCrawler:
+    """Recorre el catálogo en segundo plano y lo guarda en el ProductStore.
+
+    Orden: categorías, todas las páginas de cada categoría (y del catálogo
+    general) y luego el detalle de cada producto. El progreso se persiste
+    página a página, así un reinicio retoma la pasada donde quedó. Si el
+    upstream falla a mitad de una categoría la pasada queda abierta y se
+    retoma desde esa página en el próximo intento. Con varios workers sólo
+    corre en el que tiene la ``lease``.
+    """
+
+    def __init__(
+        self,
+        service: BelcorpService,
+        store: ProductStore,
+        interval: float,
+        concurrency: int = 2,
+        delay: float = 1.0,
+        max_pages: int = 50,
+        fetch_details: bool = True,
+        lease: Optional[Lease] = None,
+    ):
+        self.service = service
+        self.store = store
+        self.interval = interval
+        self.concurrency = max(1, concurrency)
+        self.delay = delay
+        self.max_pages = max_pages
+        self.fetch_details = fetch_details
+        self.lease = lease
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, service: BelcorpService, store: ProductStore, settings) -> "CatalogCrawler":
+        shared = get_shared_state(settings)
+        return cls(
+            service,
+            store,
+            interval=settings.CRAWLER_INTERVAL,
+            concurrency=settings.CRAWLER_CONCURRENCY,
+            delay=settings.CRAWLER_DELAY,
+            max_pages=settings.CRAWLER_MAX_PAGES,
+            fetch_details=settings.CRAWLER_FETCH_DETAILS,
+            lease=Lease(shared, "crawler", settings.CRAWLER_LEASE_TTL) if shared is not None else None,
+        )
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.lease is not None:
+            await asyncio.to_thread(self.lease.release)
+
+    async def run_forever(self):
+        while True:
+            if self.lease is not None and not await asyncio.to_thread(self.lease.acquire):
+                # Otro worker tiene el crawler; tomarlo si deja de renovarlo
+                await asyncio.sleep(self.lease.ttl / 2)
+                continue
+            wait = self._seconds_until_next_run()
+            if wait > 0:
+                # Con lease hay que despertar a tiempo para renovarla
+                await asyncio.sleep(min(wait, self.lease.ttl / 2) if self.lease is not None else wait)
+                continue
+            try:
+                await self.crawl_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog crawl failed: {str(e)}")
+                await asyncio.sleep(min(self.interval, 300))
+
+    def _seconds_until_next_run(self) -> float:
+        run = self.store.get_state('run')
+        if not run or not run.get('finished_at'):
+            return 0
+        return run['finished_at'] + self.interval - time.time()
+
+    async def _throttled(self, fn, *args):
+        """Llamar al upstream respetando la concurrencia y la pausa de cortesía"""
+        if self.lease is not None:
+            await asyncio.to_thread(self.lease.acquire)
+        async with self._semaphore:
+            try:
+                return await fn(*args)
+            finally:
+                await asyncio.sleep(self.delay)
+
+    async def crawl_once(self):
+        """Hacer (o retomar) una pasada completa sobre el catálogo"""
+        run = self.store.get_state('run')
+        if run and not run.get('finished_at'):
+            logger.info("Resuming catalog crawl started at %s", run['started_at'])
+            progress = self.store.get_state('progress', {})
+        else:
+            run = {'started_at': time.time(), 'finished_at': None}
+            progress = {}
+            self.store.set_state('run', run)
+            self.store.set_state('progress', progress)
+
+        categories = await self._throttled(self.service.get_categories)
+        if categories:
+            self.store.save_categories(categories)
+        else:
+            categories = self.store.get_categories()
+
+        # '' representa el catálogo general (/Catalogo sin categoría)
+        queue: asyncio.Queue = asyncio.Queue()
+        for key in [''] + categories:
+            if not progress.get(key, {}).get('done'):
+                queue.put_nowait(key)
+
+        async def worker():
+            while True:
+                try:
+                    key = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._crawl_category(key, progress)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        pending = [key or '(general)' for key, state in progress.items() if not state.get('done')]
+        if pending:
+            # run_forever reintenta más tarde; el progreso guardado retoma cada categoría donde quedó
+            raise UpstreamFetchError(f"Catalog crawl incomplete, upstream failed for: {', '.join(pending)}")
+
+        if self.fetch_details:
+            await self._crawl_details(run['started_at'])
+
+        run['finished_at'] = time.time()
+        self.store.set_state('run', run)
+        logger.info(
+            "Catalog crawl finished in %.0fs (%d products)",
+            run['finished_at'] - run['started_at'],
+            self.store.count_products(),
+        )
+
+    async def _crawl_category(self, key: str, progress: Dict):
+        state = progress.setdefault(key, {'next_page': 1, 'done': False})
+        category = key or None
+        get_catalog = functools.partial(self.service.get_catalog, strict=True)
+        while state['next_page'] <= self.max_pages:
+            page = state['next_page']
+            try:
+                products = await self._throttled(get_catalog, category, page)
+            except UpstreamFetchError as e:
+                # Un fallo no es el fin del catálogo: no podar nada y no avanzar next_page
+                logger.warning(f"Crawl of {key or 'catalog'} paused at page {page}: {str(e)}")
+                return
+            if not products:
+                # Página vacía respondida por el upstream: el catálogo terminó antes
+                self.store.delete_pages_after(category, page - 1)
+                break
+            self.store.save_page(category, page, products)
+            state['next_page'] = page + 1
+            self.store.set_state('progress', progress)
+        state['done'] = True
+        self.store.set_state('progress', progress)
+
+    async def _crawl_details(self, started_at: float):
+        batch_size = self.concurrency * 10
+        while True:
+            product_ids = self.store.products_missing_details(started_at, batch_size)
+            if not product_ids:
+                return
+            details = await asyncio.gather(
+                *(self._throttled(self.service.get_product_details, product_id) for product_id in product_ids)
+            )
+            found: List[Dict] = [d for d in details if d]
+            if found:
+                self.store.upsert_products(found, with_details=True)
+            missing = [product_id for product_id, d in zip(product_ids, details) if not d]
+            if missing:
+                self.store.mark_details_fetched(missing)
@@ -0,0 +1,352 @@
+import importlib.util
+import logging
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Clases de los nodos de detalle de producto que nos interesan
+PRODUCT_DETAIL_CLASSES = [
+    'nombre-producto',
+    'descripcion-producto',
+    'precio-producto',
+    'imagen-producto',
+    'sku-producto',
+]
+
+
+def extract_price(price_text: str) -> float:
+    """Extraer precio numérico de un texto"""
+    try:
+        # Eliminar símbolos de moneda y espacios
+        clean_price = re.sub(r'[^\d.,]', '', price_text)
+        # Convertir a formato numérico
+        return float(clean_price.replace(',', '.'))
+    except Exception:
+        return 0.0
+
+
+def _catalog_item(product_id, name, price_text, image_url, category) -> Dict:
+    return {
+        'id': product_id,
+        'name': name,
+        'price': extract_price(price_text) if price_text is not None else 0,
+        'image_url': image_url,
+        'category': category or 'general',
+        'stock': 100  # Default stock value
+    }
+
+
+def _product_detail(product_id, name, description, price_text, image_url, sku) -> Dict:
+    return {
+        'id': product_id,
+        'name': name,
+        'description': description,
+        'price': extract_price(price_text) if price_text is not None else 0,
+        'image_url': image_url,
+        'category': 'general',  # Se puede mejorar extrayendo la categoría real
+        'stock': 100,  # Default stock value
+        'sku': sku
+    }
+
+
+class HTMLParser:
+    """Interfaz común de los backends de parseo de somosbelcorp.com.
+
+    ``parse_product`` lanza una excepción si la página no tiene nombre de
+    producto; el servicio lo trata como producto no encontrado.
+    """
+
+    name = "base"
+
+    def parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        raise NotImplementedError
+
+    def parse_product(self, html: str, product_id: str) -> Dict:
+        raise NotImplementedError
+
+    def parse_categories(self, html: str) -> List[str]:
+        raise NotImplementedError
+
+    def parse_login_token(self, html: str) -> str:
+        raise NotImplementedError
+
+
+def _class_matcher(*classes: str):
+    """Filtro de clase para SoupStrainer.
+
+    Al filtrar durante el parseo bs4 recibe el atributo class crudo
+    ("producto col-6"), así que ``class_='producto'`` no coincidiría.
+    """
+    wanted = set(classes)
+
+    def match(value) -> bool:
+        return value is not None and not wanted.isdisjoint(value.split())
+
+    return match
+
+
+class SoupParser(HTMLParser):
+    """BeautifulSoup con SoupStrainer: sólo construye los nodos que usamos"""
+
+    name = "bs4"
+
+    def __init__(self, features: str = 'html.parser'):
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        self.features = features
+        self._soup = BeautifulSoup
+        self._catalog_only = SoupStrainer('div', class_=_class_matcher('producto'))
+        self._categories_only = SoupStrainer('ul', class_=_class_matcher('menu-categorias'))
+        self._product_only = SoupStrainer(class_=_class_matcher(*PRODUCT_DETAIL_CLASSES))
+        self._token_only = SoupStrainer('input', attrs={'name': '__RequestVerificationToken'})
+
+    def parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        soup = self._soup(html, self.features, parse_only=self._catalog_only)
+        products = []
+        for element in soup.find_all('div', class_='producto'):
+            try:
+                name = element.find('h3', class_='nombre').text.strip()
+                price_element = element.find('span', class_='precio')
+                image = element.find('img')
+                products.append(_catalog_item(
+                    element.get('data-id', ''),
+                    name,
+                    price_element.text if price_element else None,
+                    image.get('src', '') if image else None,
+                    category,
+                ))
+            except Exception as e:
+                logger.error(f"Error parsing product: {str(e)}")
+                continue
+        return products
+
+    def parse_product(self, html: str, product_id: str) -> Dict:
+        soup = self._soup(html, self.features, parse_only=self._product_only)
+        name = soup.find('h1', class_='nombre-producto').text.strip()
+        description = soup.find('div', class_='descripcion-producto')
+        price_element = soup.find('span', class_='precio-producto')
+        image = soup.find('img', class_='imagen-producto')
+        sku = soup.find('span', class_='sku-producto')
+        return _product_detail(
+            product_id,
+            name,
+            description.text.strip() if description else None,
+            price_element.text if price_element else None,
+            image.get('src', '') if image else None,
+            sku.text.strip() if sku else None,
+        )
+
+    def parse_categories(self, html: str) -> List[str]:
+        soup = self._soup(html, self.features, parse_only=self._categories_only)
+        categories = []
+        category_menu = soup.find('ul', class_='menu-categorias')
+        if category_menu:
+            for item in category_menu.find_all('li'):
+                link = item.find('a')
+                if link:
+                    categories.append(link.text.strip())
+        return categories
+
+    def parse_login_token(self, html: str) -> str:
+        soup = self._soup(html, self.features, parse_only=self._token_only)
+        csrf_token = soup.find('input', {'name': '__RequestVerificationToken'})
+        return csrf_token.get('value', '') if csrf_token else ''
+
+
+def _has_class(cls: str) -> str:
+    return f'contains(concat(" ", normalize-space(@class), " "), " {cls} ")'
+
+
+class LxmlParser(HTMLParser):
+    """lxml.html con XPath precompilado"""
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+
+        self._fromstring = lxml_html.fromstring
+        self._products = etree.XPath(f'//div[{_has_class("producto")}]')
+        self._product_name = etree.XPath(f'.//h3[{_has_class("nombre")}]')
+        self._product_price = etree.XPath(f'.//span[{_has_class("precio")}]')
+        self._product_image = etree.XPath('.//img')
+        self._detail_name = etree.XPath(f'//h1[{_has_class("nombre-producto")}]')
+        self._detail_description = etree.XPath(f'//div[{_has_class("descripcion-producto")}]')
+        self._detail_price = etree.XPath(f'//span[{_has_class("precio-producto")}]')
+        self._detail_image = etree.XPath(f'//img[{_has_class("imagen-producto")}]')
+        self._detail_sku = etree.XPath(f'//span[{_has_class("sku-producto")}]')
+        self._category_links = etree.XPath(f'(//ul[{_has_class("menu-categorias")}])[1]//li')
+        self._token = etree.XPath('//input[@name="__RequestVerificationToken"]/@value')
+
+    @staticmethod
+    def _first(xpath, node):
+        found = xpath(node)
+        return found[0] if found else None
+
+    def parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        tree = self._fromstring(html)
+        products = []
+        for element in self._products(tree):
+            try:
+                name = self._first(self._product_name, element).text_content().strip()
+                price_element = self._first(self._product_price, element)
+                image = self._first(self._product_image, element)
+                products.append(_catalog_item(
+                    element.get('data-id', ''),
+                    name,
+                    price_element.text_content() if price_element is not None else None,
+                    image.get('src', '') if image is not None else None,
+                    category,
+                ))
+            except Exception as e:
+                logger.error(f"Error parsing product: {str(e)}")
+                continue
+        return products
+
+    def parse_product(self, html: str, product_id: str) -> Dict:
+        tree = self._fromstring(html)
+        name = self._first(self._detail_name, tree).text_content().strip()
+        description = self._first(self._detail_description, tree)
+        price_element = self._first(self._detail_price, tree)
+        image = self._first(self._detail_image, tree)
+        sku = self._first(self._detail_sku, tree)
+        return _product_detail(
+            product_id,
+            name,
+            description.text_content().strip() if description is not None else None,
+            price_element.text_content() if price_element is not None else None,
+            image.get('src', '') if image is not None else None,
+            sku.text_content().strip() if sku is not None else None,
+        )
+
+    def parse_categories(self, html: str) -> List[str]:
+        tree = self._fromstring(html)
+        categories = []
+        for item in self._category_links(tree):
+            links = item.xpath('.//a')
+            if links:
+                categories.append(links[0].text_content().strip())
+        return categories
+
+    def parse_login_token(self, html: str) -> str:
+        values = self._token(self._fromstring(html))
+        return values[0] if values else ''
+
+
+class SelectolaxParser(HTMLParser):
+    """selectolax (Lexbor): el backend más rápido cuando está instalado"""
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parse = LexborHTMLParser
+
+    def parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        tree = self._parse(html)
+        products = []
+        for element in tree.css('div.producto'):
+            try:
+                name = element.css_first('h3.nombre').text().strip()
+                price_element = element.css_first('span.precio')
+                image = element.css_first('img')
+                products.append(_catalog_item(
+                    element.attributes.get('data-id') or '',
+                    name,
+                    price_element.text() if price_element is not None else None,
+                    (image.attributes.get('src') or '') if image is not None else None,
+                    category,
+                ))
+            except Exception as e:
+                logger.error(f"Error parsing product: {str(e)}")
+                continue
+        return products
+
+    def parse_product(self, html: str, product_id: str) -> Dict:
+        tree = self._parse(html)
+        name = tree.css_first('h1.nombre-producto').text().strip()
+        description = tree.css_first('div.descripcion-producto')
+        price_element = tree.css_first('span.precio-producto')
+        image = tree.css_first('img.imagen-producto')
+        sku = tree.css_first('span.sku-producto')
+        return _product_detail(
+            product_id,
+            name,
+            description.text().strip() if description is not None else None,
+            price_element.text() if price_element is not None else None,
+            (image.attributes.get('src') or '') if image is not None else None,
+            sku.text().strip() if sku is not None else None,
+        )
+
+    def parse_categories(self, html: str) -> List[str]:
+        menu = self._parse(html).css_first('ul.menu-categorias')
+        categories = []
+        if menu is not None:
+            for item in menu.css('li'):
+                link = item.css_first('a')
+                if link is not None:
+                    categories.append(link.text().strip())
+        return categories
+
+    def parse_login_token(self, html: str) -> str:
+        token = self._parse(html).css_first('input[name="__RequestVerificationToken"]')
+        return (token.attributes.get('value') or '') if token is not None else ''
+
+
+BACKENDS = {
+    'selectolax': ('selectolax', SelectolaxParser),
+    'lxml': ('lxml', LxmlParser),
+    'bs4': ('bs4', SoupParser),
+}
+
+
+def available_backends() -> List[str]:
+    """Backends cuyo paquete está instalado, del más rápido al más lento"""
+    return [name for name, (module, _) in BACKENDS.items() if importlib.util.find_spec(module)]
+
+
+class LazyParser(HTMLParser):
+    """Instancia el backend (e importa su paquete, p.ej. bs4) recién en el primer parseo"""
+
+    def __init__(self, backend: str = 'auto'):
+        self.backend = backend
+        self._loaded: Optional[HTMLParser] = None
+
+    def load(self) -> HTMLParser:
+        if self._loaded is None:
+            self._loaded = get_parser(self.backend)
+        return self._loaded
+
+    @property
+    def name(self) -> str:
+        return self.load().name
+
+    def parse_catalog(self, html: str, category: Optional[str]) -> List[Dict]:
+        return self.load().parse_catalog(html, category)
+
+    def parse_product(self, html: str, product_id: str) -> Dict:
+        return self.load().parse_product(html, product_id)
+
+    def parse_categories(self, html: str) -> List[str]:
+        return self.load().parse_categories(html)
+
+    def parse_login_token(self, html: str) -> str:
+        return self.load().parse_login_token(html)
+
+
+def get_parser(backend: str = 'auto', lazy: bool = False) -> HTMLParser:
+    """Instanciar el backend pedido; 'auto' elige el más rápido disponible.
+
+    Con ``lazy`` la elección y el import se hacen en el primer parseo.
+    """
+    if lazy:
+        return LazyParser(backend)
+    available = available_backends()
+    if backend != 'auto':
+        if backend not in available:
+            logger.warning(f"HTML parser backend {backend!r} not available, using auto")
+        else:
+            return BACKENDS[backend][1]()
+    return BACKENDS[available[0]][1]()
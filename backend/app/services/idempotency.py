@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Tuple
+
+
+class IdempotencyConflict(Exception):
+    """La misma clave se reutilizó con un cuerpo de petición distinto"""
+
+
+class _Entry(NamedTuple):
+    fingerprint: str
+    task: asyncio.Task
+    expires_at: float
+
+
+class IdempotencyStore:
+    """Resultados por Idempotency-Key, acotados en tamaño (LRU) y en tiempo (TTL).
+
+    Un reintento con una clave ya completada devuelve el resultado original;
+    uno concurrente espera a la primera ejecución. Si la ejecución falla la
+    clave se libera, para que el cliente pueda reintentar.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.replays = 0
+        self.waits = 0
+        self.executions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        """Descartar las claves vencidas y, si sobran, las más antiguas.
+
+        El TTL es fijo, así que el orden de inserción es también el de vencimiento.
+        """
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """Ejecutar ``fn`` una sola vez por clave; devuelve (resultado, fue_replay)"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            if entry.task.done():
+                self.replays += 1
+            else:
+                self.waits += 1
+            return await asyncio.shield(entry.task), True
+
+        self.executions += 1
+        task = asyncio.ensure_future(fn())
+        self._entries[key] = _Entry(fingerprint, task, now + self.ttl)
+        self._evict(now)
+
+        def release_on_error(t: asyncio.Task):
+            if t.cancelled() or t.exception() is not None:
+                current = self._entries.get(key)
+                if current is not None and current.task is t:
+                    del self._entries[key]
+
+        task.add_done_callback(release_on_error)
+        return await asyncio.shield(task), False
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "keys": len(self._entries),
+            "executions": self.executions,
+            "replays": self.replays,
+            "concurrent_waits": self.waits,
+        }
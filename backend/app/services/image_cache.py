@@ -0,0 +1,344 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import importlib.util
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.http import create_async_client
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Pillow es opcional: sin él se sirve la imagen original, sin miniaturas.
+# Se importa en la primera miniatura, no al arrancar.
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+
+class ImageNotFound(Exception):
+    """Clave inválida (firma incorrecta) o imagen que upstream no tiene"""
+
+
+class ImageFetchError(Exception):
+    """Upstream no respondió con una imagen utilizable"""
+
+
+class StoredImage(NamedTuple):
+    body: bytes
+    content_type: str
+    etag: str
+
+
+class ImageStore:
+    """Caché de imágenes en disco direccionada por contenido, con LRU acotado en bytes.
+
+    Los ficheros se guardan por el sha256 de la imagen original
+    (``ab/abcdef...`` y ``ab/abcdef...-320.webp`` para las miniaturas);
+    sqlite lleva qué URL corresponde a qué contenido, el tamaño y el último
+    acceso de cada fichero para desalojar los menos usados.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                url_hash TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                content_type TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_files_last_access ON files (last_access);
+            """
+        )
+        # Los accesos se acumulan en memoria y se escriben junto con la próxima escritura
+        self._touched: Dict[str, float] = {}
+        self.evictions = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def lookup(self, url_hash: str) -> Optional[Tuple[str, str]]:
+        """(content_hash, content_type) de una URL ya descargada"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT content_hash, content_type FROM sources WHERE url_hash = ?", (url_hash,)
+            ).fetchone()
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Contenido de un fichero (None si no está o fue desalojado)"""
+        try:
+            with open(self._path(name), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._touched[name] = time.time()
+        return body
+
+    def write(self, name: str, body: bytes, source: Optional[Tuple[str, str]] = None):
+        """Guardar un fichero (y la URL de la que viene) y desalojar si nos pasamos del tope"""
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if source is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sources (url_hash, content_hash, content_type) VALUES (?, ?, ?)",
+                        (source[0], name, source[1]),
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (name, size, last_access) VALUES (?, ?, ?)",
+                    (name, len(body), time.time()),
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._flush_touched()
+            evicted = self._evict()
+        for evicted_name in evicted:
+            try:
+                os.remove(self._path(evicted_name))
+            except FileNotFoundError:
+                pass
+
+    def _flush_touched(self):
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.executemany(
+            "UPDATE files SET last_access = ? WHERE name = ?", [(at, name) for name, at in touched.items()]
+        )
+
+    def _evict(self) -> List[str]:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+        evicted = []
+        for name, size in self._conn.execute("SELECT name, size FROM files ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append(name)
+            total -= size
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in evicted])
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        self.evictions += len(evicted)
+        return evicted
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            files, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        return {'files': files, 'bytes': size, 'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class ImageProxy:
+    """Proxy de las imágenes de productos con miniaturas WebP en anchos fijos.
+
+    Las claves llevan la URL upstream firmada con HMAC, así que el proxy no
+    sirve URLs arbitrarias ni necesita un registro previo. Cada imagen se
+    descarga una sola vez (también con requests concurrentes) y cada
+    miniatura se genera una sola vez.
+    """
+
+    def __init__(
+        self,
+        store: ImageStore,
+        secret: str,
+        widths: Sequence[int] = (160, 320, 640),
+        client: Optional[httpx.AsyncClient] = None,
+        base_url: str = "",
+        webp_quality: int = 80,
+        max_image_bytes: int = 10 * 1024 * 1024,
+    ):
+        self.store = store
+        self._secret = secret.encode()
+        self.widths = tuple(sorted(widths))
+        self.client = client or create_async_client(follow_redirects=True)
+        self.base_url = base_url.rstrip("/")
+        self.webp_quality = webp_quality
+        self.max_image_bytes = max_image_bytes
+        self.singleflight = SingleFlight()
+        self.fetches = 0
+
+    @classmethod
+    def from_settings(cls, settings=None) -> "ImageProxy":
+        settings = settings or get_settings()
+        return cls(
+            ImageStore(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES),
+            settings.SECRET_KEY,
+            widths=settings.IMAGE_THUMBNAIL_WIDTHS,
+            base_url=settings.IMAGE_PROXY_BASE_URL,
+            webp_quality=settings.IMAGE_WEBP_QUALITY,
+            max_image_bytes=settings.IMAGE_MAX_BYTES,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+        self.store.close()
+
+    # Claves firmadas
+
+    def _signature(self, encoded_url: str) -> str:
+        digest = hmac.new(self._secret, encoded_url.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:12]).decode()
+
+    def key_for(self, url: str) -> str:
+        encoded = base64.urlsafe_b64encode(url.encode()).decode().rstrip("=")
+        return f"{encoded}.{self._signature(encoded)}"
+
+    def url_from_key(self, key: str) -> str:
+        encoded, _, signature = key.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._signature(encoded)):
+            raise ImageNotFound(key)
+        try:
+            return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+        except (ValueError, UnicodeDecodeError):
+            raise ImageNotFound(key)
+
+    def url_for(self, url: Optional[str], width: Optional[int] = None, base_url: Optional[str] = None) -> Optional[str]:
+        """URL del proxy para una imagen upstream (las que no son http(s) quedan igual).
+
+        ``base_url`` (el origen del request) reemplaza al configurado, para
+        que la URL sea absoluta aunque IMAGE_PROXY_BASE_URL esté vacío.
+        """
+        if not url or not url.startswith(("http://", "https://")):
+            return url
+        origin = self.base_url if base_url is None else base_url.rstrip("/")
+        proxied = f"{origin}/api/images/{self.key_for(url)}"
+        return f"{proxied}?w={width}" if width else proxied
+
+    def snap_width(self, width: Optional[int]) -> Optional[int]:
+        """El ancho fijo más chico que cubre el pedido (acota las variantes en disco)"""
+        if width is None:
+            return None
+        for preset in self.widths:
+            if preset >= width:
+                return preset
+        return self.widths[-1]
+
+    # Servir
+
+    async def get(self, key: str, width: Optional[int] = None) -> StoredImage:
+        """Imagen original o miniatura WebP del ancho fijo más cercano"""
+        url = self.url_from_key(key)
+        content_hash, content_type = await self.singleflight.do(f"source:{url}", lambda: self._source(url))
+        width = self.snap_width(width)
+        if width is None or not PIL_AVAILABLE:
+            current_hash, content_type, body = await self._read_or_refetch(url, content_hash, content_type)
+            return StoredImage(body, content_type, f'"{current_hash[:32]}"')
+        current_hash, body = await self.singleflight.do(
+            f"{content_hash}-{width}.webp", lambda: self._thumbnail(url, content_hash, content_type, width)
+        )
+        return StoredImage(body, "image/webp", f'"{current_hash[:32]}-{width}"')
+
+    async def _source(self, url: str) -> Tuple[str, str]:
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        known = await asyncio.to_thread(self.store.lookup, url_hash)
+        if known is not None:
+            return known[0], known[1]
+        body, content_type = await self._fetch(url)
+        return await self._store_source(url, body, content_type), content_type
+
+    async def _store_source(self, url: str, body: bytes, content_type: str) -> str:
+        """Guardar un original bajo su sha256 y apuntar la URL a él; devuelve el hash"""
+        content_hash = hashlib.sha256(body).hexdigest()
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        await asyncio.to_thread(self.store.write, content_hash, body, (url_hash, content_type))
+        return content_hash
+
+    async def _fetch(self, url: str) -> Tuple[bytes, str]:
+        self.fetches += 1
+        try:
+            response = await self.client.get(url)
+        except httpx.HTTPError as e:
+            raise ImageFetchError(f"{url}: {str(e)}")
+        if response.status_code == 404:
+            raise ImageNotFound(url)
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if response.status_code != 200 or not content_type.startswith("image/"):
+            raise ImageFetchError(f"{url}: status {response.status_code}, content-type {content_type!r}")
+        if len(response.content) > self.max_image_bytes:
+            raise ImageFetchError(f"{url}: {len(response.content)} bytes")
+        return response.content, content_type
+
+    async def _read_or_refetch(self, url: str, content_hash: str, content_type: str) -> Tuple[str, str, bytes]:
+        """(hash, content-type, cuerpo) del original.
+
+        Si fue desalojado se vuelve a bajar; upstream pudo haber cambiado la
+        imagen, así que se guarda bajo el hash de lo que llegó, no del viejo.
+        """
+        body = await asyncio.to_thread(self.store.read, content_hash)
+        if body is None:
+            body, content_type = await self._fetch(url)
+            content_hash = await self._store_source(url, body, content_type)
+        return content_hash, content_type, body
+
+    async def _thumbnail(self, url: str, content_hash: str, content_type: str, width: int) -> Tuple[str, bytes]:
+        body = await asyncio.to_thread(self.store.read, f"{content_hash}-{width}.webp")
+        if body is not None:
+            return content_hash, body
+        content_hash, _, original = await self._read_or_refetch(url, content_hash, content_type)
+        try:
+            body = await asyncio.to_thread(self._resize, original, width)
+        except (OSError, ValueError) as e:
+            raise ImageFetchError(f"{url}: cannot decode image ({str(e)})")
+        await asyncio.to_thread(self.store.write, f"{content_hash}-{width}.webp", body)
+        return content_hash, body
+
+    def _resize(self, original: bytes, width: int) -> bytes:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(original)) as image:
+            image.draft("RGB", (width, width))  # JPEG: decodificar ya reducido
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "WEBP", quality=self.webp_quality, method=4)
+            return output.getvalue()
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.store.snapshot(),
+            'upstream_fetches': self.fetches,
+            'thumbnails': PIL_AVAILABLE,
+            'singleflight': self.singleflight.snapshot(),
+        }
@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+from ..core.rate_limit import TokenBucket
+from .whatsapp_service import DeliveryResult, WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxMessage(NamedTuple):
+    id: int
+    recipient: str
+    body: str
+    attempts: int
+
+
+class NotificationOutbox:
+    """Cola durable (sqlite) de notificaciones pendientes de envío.
+
+    Los mensajes se reclaman con un "lease": al tomarlos se les corre
+    ``next_attempt_at`` hacia adelante, así un mensaje que quedó a medias por
+    un reinicio vuelve a estar disponible cuando vence el lease. Quien los
+    reclamó renueva el lease de los que aún no envió (``reserve``) para que
+    otro worker no los tome mientras el lote sigue en curso. Como en el
+    repositorio de órdenes, el acceso a sqlite va en un hilo
+    (``asyncio.to_thread``) para no bloquear el event loop.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (status, next_attempt_at);
+            """
+        )
+        self.wakeup = asyncio.Event()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _enqueue(self, recipient: str, body: str) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (recipient, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (recipient, body, now, now),
+            )
+        return cursor.lastrowid
+
+    async def enqueue(self, recipient: str, body: str) -> int:
+        """Encolar un mensaje; el worker lo envía en segundo plano"""
+        message_id = await asyncio.to_thread(self._enqueue, recipient, body)
+        self.wakeup.set()
+        return message_id
+
+    def _claim_due(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, recipient, body, attempts FROM outbox"
+                    " WHERE status = 'pending' AND next_attempt_at <= ?"
+                    " ORDER BY next_attempt_at LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(now + lease_seconds, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [OutboxMessage(*row) for row in rows]
+
+    async def claim_due(self, limit: int, lease_seconds: Optional[float] = None) -> List[OutboxMessage]:
+        """Tomar hasta ``limit`` mensajes vencidos, reservándolos durante el lease"""
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        return await asyncio.to_thread(self._claim_due, limit, lease_seconds)
+
+    def _reserve(self, message_ids: List[int], seconds: float):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE outbox SET next_attempt_at = ? WHERE id IN ({', '.join('?' * len(message_ids))})"
+                " AND status = 'pending'",
+                (time.time() + seconds, *message_ids),
+            )
+
+    async def reserve(self, message_ids: List[int], seconds: float):
+        """Renovar el lease de mensajes reclamados y aún pendientes; con 0 se liberan"""
+        if message_ids:
+            await asyncio.to_thread(self._reserve, message_ids, seconds)
+
+    def _mark_sent(self, message_id: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL WHERE id = ?",
+                (time.time(), message_id),
+            )
+
+    async def mark_sent(self, message_id: int):
+        await asyncio.to_thread(self._mark_sent, message_id)
+
+    def _schedule_retry(self, message_id: int, delay: float, error: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, message_id),
+            )
+
+    async def schedule_retry(self, message_id: int, delay: float, error: Optional[str]):
+        await asyncio.to_thread(self._schedule_retry, message_id, delay, error)
+
+    def _mark_failed(self, message_id: int, error: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, message_id),
+            )
+
+    async def mark_failed(self, message_id: int, error: Optional[str]):
+        await asyncio.to_thread(self._mark_failed, message_id, error)
+
+    def _seconds_until_next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    async def seconds_until_next_due(self) -> Optional[float]:
+        return await asyncio.to_thread(self._seconds_until_next_due)
+
+    def _depth(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = {'pending': 0, 'sent': 0, 'failed': 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    async def depth(self) -> Dict[str, int]:
+        """Cantidad de mensajes por estado"""
+        return await asyncio.to_thread(self._depth)
+
+
+class OutboxWorker:
+    """Envía los mensajes del outbox con reintentos, backoff exponencial y rate limit.
+
+    Cada envío tiene un tope de ``send_timeout`` segundos y, antes de cada
+    uno, se renueva el lease de lo que queda del lote: así el lease cubre
+    cualquier lote, por grande o lento que sea, y con varios workers ninguno
+    reclama un mensaje que otro todavía tiene en curso.
+    """
+
+    IDLE_POLL_SECONDS = 30.0
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        whatsapp: WhatsAppService,
+        rate_per_second: float = 10.0,
+        max_attempts: int = 6,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        batch_size: int = 20,
+        send_timeout: float = 30.0,
+    ):
+        self.outbox = outbox
+        self.whatsapp = whatsapp
+        self.limiter = TokenBucket(rate_per_second)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_size = batch_size
+        self.send_timeout = send_timeout
+        # Un envío más la espera del rate limit, con margen
+        self.lease_seconds = max(outbox.lease_seconds, 2 * (send_timeout + 1 / rate_per_second))
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._latencies = deque(maxlen=1000)
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, outbox: NotificationOutbox, whatsapp: WhatsAppService, settings) -> "OutboxWorker":
+        return cls(
+            outbox,
+            whatsapp,
+            rate_per_second=settings.OUTBOX_RATE_PER_SECOND,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            backoff_base=settings.OUTBOX_BACKOFF_BASE,
+            backoff_max=settings.OUTBOX_BACKOFF_MAX,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            send_timeout=settings.OUTBOX_SEND_TIMEOUT,
+        )
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def backoff(self, attempts: int) -> float:
+        """Espera antes del siguiente intento (exponencial con jitter)"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempts))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run_forever(self):
+        while True:
+            try:
+                processed = await self.process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {str(e)}")
+                processed = 0
+            if processed:
+                continue
+
+            wait = await self.outbox.seconds_until_next_due()
+            wait = self.IDLE_POLL_SECONDS if wait is None else min(wait, self.IDLE_POLL_SECONDS)
+            self.outbox.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.outbox.wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_due(self) -> int:
+        """Enviar un lote de mensajes vencidos; devuelve cuántos se procesaron"""
+        messages = await self.outbox.claim_due(self.batch_size, self.lease_seconds)
+        for index, message in enumerate(messages):
+            remaining = [pending.id for pending in messages[index:]]
+            try:
+                await self.outbox.reserve(remaining, self.lease_seconds)
+                await self.limiter.acquire()
+            except asyncio.CancelledError:
+                # Apagando: lo que no salió queda disponible en el acto
+                # shield: que la liberación termine aunque nos estén cancelando
+                await asyncio.shield(self.outbox.reserve(remaining, 0))
+                raise
+            result = await self.send(message)
+
+            if result.ok:
+                await self.outbox.mark_sent(message.id)
+                self.sent += 1
+            elif result.retryable and message.attempts + 1 < self.max_attempts:
+                await self.outbox.schedule_retry(message.id, self.backoff(message.attempts), result.error)
+                self.retried += 1
+            else:
+                await self.outbox.mark_failed(message.id, result.error)
+                self.failed += 1
+                logger.error(f"WhatsApp notification {message.id} failed permanently: {result.error}")
+        return len(messages)
+
+    async def send(self, message: OutboxMessage) -> DeliveryResult:
+        """Un envío acotado a ``send_timeout`` (incluye esperas del transporte, p.ej. un Retry-After)"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                self.whatsapp.send_message(message.recipient, message.body), timeout=self.send_timeout
+            )
+        except asyncio.TimeoutError:
+            result = DeliveryResult(ok=False, retryable=True, error=f"timed out after {self.send_timeout}s")
+        self._latencies.append(time.perf_counter() - started)
+        return result
+
+    async def snapshot(self) -> Dict:
+        """Profundidad de la cola y latencias de envío"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            'queue': await self.outbox.depth(),
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'send_latency_seconds': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': latencies[-1] if latencies else None,
+            },
+        }
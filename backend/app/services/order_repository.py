@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ..models.models import Order
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Devolver (created_at ISO, id) del último elemento de la página anterior"""
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        datetime.fromisoformat(created_at)
+        return created_at, order_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class OrderRepository:
+    """Interfaz de persistencia de órdenes.
+
+    ``list_orders`` pagina por cursor en orden (created_at, id) descendente;
+    el cursor es opaco para el cliente.
+    """
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def save(self, order: Order):
+        raise NotImplementedError
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        raise NotImplementedError
+
+    async def list_orders(
+        self,
+        customer_phone: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Order], Optional[str]]:
+        raise NotImplementedError
+
+
+class InMemoryOrderRepository(OrderRepository):
+    """Repositorio en memoria, para desarrollo y pruebas"""
+
+    def __init__(self):
+        self._orders: Dict[str, Order] = {}
+
+    async def save(self, order: Order):
+        self._orders[order.id] = order
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    async def list_orders(self, customer_phone=None, status=None, limit=20, cursor=None):
+        orders = sorted(
+            (
+                o for o in self._orders.values()
+                if (customer_phone is None or o.customer_phone == customer_phone)
+                and (status is None or o.status == status)
+            ),
+            key=lambda o: (o.created_at.isoformat(), o.id),
+            reverse=True,
+        )
+        if cursor:
+            after = decode_cursor(cursor)
+            orders = [o for o in orders if (o.created_at.isoformat(), o.id) < after]
+        page = orders[:limit]
+        next_cursor = encode_cursor(page[-1]) if len(orders) > limit else None
+        return page, next_cursor
+
+
+class SqliteOrderRepository(OrderRepository):
+    """Órdenes en sqlite con escrituras agrupadas (group commit).
+
+    Cada ``save`` encola la orden y espera; un único escritor junta lo que
+    llegue en ``flush_interval`` (hasta ``batch_size``) y lo confirma en una
+    sola transacción, así una ráfaga de pedidos paga un fsync por lote y no
+    uno por orden.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 0.005):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches_written = 0
+        self.orders_written = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS orders (
+                id TEXT PRIMARY KEY,
+                customer_phone TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_orders_customer_phone ON orders (customer_phone, created_at DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS ix_orders_status ON orders (status, created_at DESC, id DESC);
+            """
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.ensure_future(self._write_loop())
+
+    async def close(self):
+        if self._writer is not None:
+            # Vaciar lo pendiente antes de cerrar
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        with self._lock:
+            self._conn.close()
+
+    async def save(self, order: Order):
+        if self._writer is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((order, future))
+        await future
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Dar una ventana corta para que se sumen otras órdenes al lote
+            if self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await asyncio.to_thread(self._write_batch, [order for order, _ in batch])
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            except Exception as e:
+                logger.error(f"Error writing order batch: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, orders: List[Order]):
+        rows = [
+            (o.id, o.customer_phone, o.status, o.created_at.isoformat(), o.model_dump_json())
+            for o in orders
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO orders (id, customer_phone, status, created_at, payload) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        self.batches_written += 1
+        self.orders_written += len(rows)
+
+    def _get(self, order_id: str) -> Optional[Order]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return Order.model_validate_json(row[0]) if row else None
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        return await asyncio.to_thread(self._get, order_id)
+
+    def _list(self, customer_phone, status, limit, cursor) -> Tuple[List[Order], Optional[str]]:
+        clauses, params = [], []
+        if customer_phone is not None:
+            clauses.append("customer_phone = ?")
+            params.append(customer_phone)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, order_id = decode_cursor(cursor)
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, order_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT payload FROM orders {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+        orders = [Order.model_validate_json(row[0]) for row in rows[:limit]]
+        next_cursor = encode_cursor(orders[-1]) if len(rows) > limit else None
+        return orders, next_cursor
+
+    async def list_orders(self, customer_phone=None, status=None, limit=20, cursor=None):
+        return await asyncio.to_thread(self._list, customer_phone, status, limit, cursor)
+
+
+BACKENDS = {
+    'sqlite': lambda settings: SqliteOrderRepository(
+        settings.ORDER_STORE_PATH,
+        batch_size=settings.ORDER_WRITE_BATCH_SIZE,
+        flush_interval=settings.ORDER_WRITE_FLUSH_INTERVAL,
+    ),
+    'memory': lambda settings: InMemoryOrderRepository(),
+}
+
+
+def create_order_repository(settings) -> OrderRepository:
+    """Instanciar el backend configurado en ORDER_REPOSITORY_BACKEND"""
+    try:
+        factory = BACKENDS[settings.ORDER_REPOSITORY_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown order repository backend: {settings.ORDER_REPOSITORY_BACKEND}")
+    return factory(settings)
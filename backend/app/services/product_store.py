@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_COLUMNS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'stock', 'sku')
+
+
+class ProductStore:
+    """Índice local de productos (sqlite) alimentado por el crawler.
+
+    Guarda los productos, el orden de cada página del catálogo y las
+    categorías, además del progreso del crawler para poder reanudarlo.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT,
+                price REAL NOT NULL,
+                image_url TEXT,
+                category TEXT NOT NULL,
+                stock INTEGER NOT NULL DEFAULT 0,
+                sku TEXT,
+                updated_at REAL NOT NULL,
+                detail_fetched_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_products_category ON products (category);
+            CREATE INDEX IF NOT EXISTS ix_products_detail_fetched_at ON products (detail_fetched_at);
+            CREATE TABLE IF NOT EXISTS catalog_pages (
+                category TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                product_ids TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (category, page)
+            );
+            CREATE TABLE IF NOT EXISTS categories (
+                name TEXT PRIMARY KEY,
+                position INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Productos
+
+    def upsert_products(self, products: List[Dict], with_details: bool = False):
+        """Insertar/actualizar productos sin perder campos que la tarjeta del catálogo no trae"""
+        now = time.time()
+        rows = [
+            (
+                p['id'], p['name'], p.get('description'), float(p.get('price') or 0),
+                p.get('image_url'), p.get('category') or 'general', int(p.get('stock') or 0),
+                p.get('sku'), now, now if with_details else None,
+            )
+            for p in products if p.get('id')
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO products (id, name, description, price, image_url, category, stock, sku, updated_at, detail_fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name,
+                        description = COALESCE(excluded.description, products.description),
+                        price = excluded.price,
+                        image_url = COALESCE(excluded.image_url, products.image_url),
+                        category = CASE WHEN excluded.category != 'general' THEN excluded.category ELSE products.category END,
+                        stock = excluded.stock,
+                        sku = COALESCE(excluded.sku, products.sku),
+                        updated_at = excluded.updated_at,
+                        detail_fetched_at = COALESCE(excluded.detail_fetched_at, products.detail_fetched_at)
+                    """,
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_product(self, product_id: str, require_details: bool = True) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
+        if row is None or (require_details and row['detail_fetched_at'] is None):
+            return None
+        return self._to_product(row)
+
+    def products_missing_details(self, older_than: float, limit: int) -> List[str]:
+        """Ids de productos sin detalle o con detalle anterior a ``older_than``"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM products WHERE detail_fetched_at IS NULL OR detail_fetched_at < ? LIMIT ?",
+                (older_than, limit),
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def mark_details_fetched(self, product_ids: List[str]):
+        """Marcar como visitados productos cuyo detalle no se pudo obtener"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE products SET detail_fetched_at = ? WHERE id = ?",
+                [(now, product_id) for product_id in product_ids],
+            )
+
+    def iter_products(self, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """Recorrer todos los productos en lotes (para reconstruir índices)"""
+        last_id = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM products WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield [self._to_product(row) for row in rows]
+            last_id = rows[-1]['id']
+
+    def count_products(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    @staticmethod
+    def _to_product(row) -> Dict:
+        return {column: row[column] for column in PRODUCT_COLUMNS}
+
+    # Páginas del catálogo
+
+    def save_page(self, category: Optional[str], page: int, products: List[Dict]):
+        """Guardar una página del catálogo (productos + orden)"""
+        self.upsert_products(products)
+        ids = json.dumps([p['id'] for p in products if p.get('id')])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO catalog_pages (category, page, product_ids, fetched_at) VALUES (?, ?, ?, ?)",
+                (category or '', page, ids, time.time()),
+            )
+
+    def get_page(self, category: Optional[str], page: int) -> Optional[List[Dict]]:
+        """Leer una página tal como la vio el crawler (None si nunca se guardó)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT product_ids FROM catalog_pages WHERE category = ? AND page = ?",
+                (category or '', page),
+            ).fetchone()
+            if row is None:
+                return None
+            ids = json.loads(row['product_ids'])
+            if not ids:
+                return []
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT * FROM products WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        by_id = {row['id']: self._to_product(row) for row in rows}
+        products = [by_id[product_id] for product_id in ids if product_id in by_id]
+        # La página refleja la categoría que se pidió, como el scraping en vivo
+        for product in products:
+            product['category'] = category or 'general'
+        return products
+
+    def delete_pages_after(self, category: Optional[str], last_page: int):
+        """Borrar páginas que ya no existen upstream"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM catalog_pages WHERE category = ? AND page > ?",
+                (category or '', last_page),
+            )
+
+    # Categorías
+
+    def save_categories(self, categories: List[str]):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM categories")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO categories (name, position) VALUES (?, ?)",
+                    [(name, position) for position, name in enumerate(categories)],
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_categories(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM categories ORDER BY position").fetchall()
+        return [row['name'] for row in rows]
+
+    # Estado del crawler
+
+    def get_state(self, key: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM crawl_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row['value']) if row else default
+
+    def set_state(self, key: str, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_state (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
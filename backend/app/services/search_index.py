@@ -0,0 +1,203 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# unicode61 + remove_diacritics: "locion" encuentra "Loción", "esika" encuentra "ésika"
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+DOC_COLUMNS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'stock', 'sku')
+
+
+class SearchIndex:
+    """Índice invertido local (sqlite FTS5) sobre nombre, descripción, sku y categoría.
+
+    Se alimenta de forma incremental con los productos que el servicio va
+    scrapeando; las consultas combinan texto libre con filtros de categoría
+    y rango de precio, y devuelven los conteos de facetas.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT,
+                price REAL NOT NULL,
+                image_url TEXT,
+                category TEXT NOT NULL,
+                stock INTEGER NOT NULL DEFAULT 0,
+                sku TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_docs_category ON docs (category COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS ix_docs_price ON docs (price);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                name, description, sku, category,
+                content='docs', content_rowid='rowid',
+                tokenize='{TOKENIZER}'
+            );
+            CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                INSERT INTO docs_fts (rowid, name, description, sku, category)
+                VALUES (new.rowid, new.name, new.description, new.sku, new.category);
+            END;
+            CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, name, description, sku, category)
+                VALUES ('delete', old.rowid, old.name, old.description, old.sku, old.category);
+            END;
+            CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, name, description, sku, category)
+                VALUES ('delete', old.rowid, old.name, old.description, old.sku, old.category);
+                INSERT INTO docs_fts (rowid, name, description, sku, category)
+                VALUES (new.rowid, new.name, new.description, new.sku, new.category);
+            END;
+            """
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def index_products(self, products: Iterable[Dict]):
+        """Indexar (o reindexar) productos; los campos ausentes no pisan los ya indexados"""
+        now = time.time()
+        rows = [
+            (
+                p['id'], p['name'], p.get('description'), float(p.get('price') or 0),
+                p.get('image_url'), p.get('category') or 'general', int(p.get('stock') or 0),
+                p.get('sku'), now,
+            )
+            for p in products if p.get('id') and p.get('name')
+        ]
+        if not rows:
+            return
+        with self._lock:
+            # IMMEDIATE: con varios workers, esperar el lock de escritura en vez de fallar a mitad
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO docs (id, name, description, price, image_url, category, stock, sku, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name,
+                        description = COALESCE(excluded.description, docs.description),
+                        price = excluded.price,
+                        image_url = COALESCE(excluded.image_url, docs.image_url),
+                        category = CASE WHEN excluded.category != 'general' THEN excluded.category ELSE docs.category END,
+                        stock = excluded.stock,
+                        sku = COALESCE(excluded.sku, docs.sku),
+                        updated_at = excluded.updated_at
+                    WHERE docs.name IS NOT excluded.name
+                       OR docs.price IS NOT excluded.price
+                       OR (excluded.description IS NOT NULL AND docs.description IS NOT excluded.description)
+                       OR (excluded.sku IS NOT NULL AND docs.sku IS NOT excluded.sku)
+                       OR (excluded.category != 'general' AND docs.category IS NOT excluded.category)
+                       OR docs.image_url IS NOT excluded.image_url
+                       OR docs.stock IS NOT excluded.stock
+                    """,
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def remove_products(self, product_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in product_ids])
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        """Convertir texto libre en una consulta FTS5 segura (AND de prefijos)"""
+        tokens = re.findall(r'\w+', query, flags=re.UNICODE)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def _filters(
+        self,
+        match: Optional[str],
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+    ) -> Tuple[str, List]:
+        clauses, params = [], []
+        source = "docs"
+        if match:
+            source = "docs JOIN docs_fts ON docs_fts.rowid = docs.rowid"
+            clauses.append("docs_fts MATCH ?")
+            params.append(match)
+        if category:
+            clauses.append("docs.category = ? COLLATE NOCASE")
+            params.append(category)
+        if min_price is not None:
+            clauses.append("docs.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("docs.price <= ?")
+            params.append(max_price)
+        where = " AND ".join(clauses) if clauses else "1"
+        return f"FROM {source} WHERE {where}", params
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict:
+        """Buscar productos y calcular facetas de categoría y precio"""
+        # Sin términos útiles (p.ej. sólo signos) se navega por facetas
+        match = self._match_expression(query) if query else None
+
+        columns = ", ".join(f"docs.{column}" for column in DOC_COLUMNS)
+        filters, params = self._filters(match, category, min_price, max_price)
+        order = "bm25(docs_fts, 10.0, 1.0, 5.0, 2.0)" if match else "docs.name"
+        # Cada faceta ignora su propio filtro, para que el usuario vea las alternativas
+        category_filters, category_params = self._filters(match, None, min_price, max_price)
+        price_filters, price_params = self._filters(match, category, None, None)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {filters}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {columns} {filters} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            category_rows = self._conn.execute(
+                f"SELECT docs.category, COUNT(*) {category_filters} GROUP BY docs.category ORDER BY COUNT(*) DESC",
+                category_params,
+            ).fetchall()
+            price_row = self._conn.execute(
+                f"SELECT MIN(docs.price), MAX(docs.price) {price_filters}", price_params
+            ).fetchone()
+
+        return {
+            'items': [{column: row[column] for column in DOC_COLUMNS} for row in rows],
+            'total': total,
+            'facets': {
+                'categories': {row[0]: row[1] for row in category_rows},
+                'price': {'min': price_row[0], 'max': price_row[1]},
+            },
+        }
@@ -0,0 +1,460 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.http import create_async_client, create_async_transport
+from ..core.metrics import BELCORP_CHECK_AUTH, BELCORP_LOGINS
+from ..core.shared_state import get_shared_state
+from .html_parser import HTMLParser, get_parser
+from .session_state import SessionState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,es-US;q=0.8,es;q=0.7',
+    'Content-Type': 'application/x-www-form-urlencoded'
+}
+
+
+class UpstreamSession:
+    """Una cuenta de somosbelcorp.com: sus cookies, su estado de login y su carga"""
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        base_url: str,
+        parser: HTMLParser,
+        client: Optional[httpx.AsyncClient] = None,
+        idle_timeout: float = 20 * 60,
+        shared=None,
+        shared_login_wait: float = 30,
+    ):
+        self.username = username
+        self.password = password
+        self.base_url = base_url
+        self.parser = parser
+        self.client = client or create_async_client(follow_redirects=True)
+        self.client.headers.update(DEFAULT_HEADERS)
+        self.state = SessionState(idle_timeout=idle_timeout)
+        self.in_flight = 0
+        self.requests = 0
+        self.login_failures = 0
+        self.quarantined_until = 0.0
+        # Store compartido entre workers: un solo login por cuenta, los demás adoptan sus cookies
+        self.shared = shared
+        self.shared_login_wait = shared_login_wait
+        self._shared_stamp: Optional[str] = None
+        self.adopted_logins = 0
+
+    def is_quarantined(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < self.quarantined_until
+
+    async def check_auth(self) -> bool:
+        """Verificar contra /Inicio si la sesión está autenticada (sonda explícita)"""
+        try:
+            response = await self.client.get(f"{self.base_url}/Inicio")
+            authenticated = '.ASPXAUTH' in self.client.cookies and not self.is_login_required(response)
+        except Exception as e:
+            logger.error(f"Error checking authentication: {str(e)}")
+            BELCORP_CHECK_AUTH.labels('error').inc()
+            return False
+        BELCORP_CHECK_AUTH.labels('authenticated' if authenticated else 'expired').inc()
+        if authenticated:
+            self.state.mark_success()
+        else:
+            self.state.invalidate()
+        return authenticated
+
+    def is_login_required(self, response: httpx.Response) -> bool:
+        """Detectar una sesión vencida a partir de la respuesta real (401 o redirect a /Login)"""
+        if response.status_code == 401:
+            return True
+        if response.url.path.rstrip('/').endswith('/Login'):
+            return True
+        return any(
+            r.headers.get('location', '').split('?')[0].rstrip('/').endswith('/Login')
+            for r in response.history
+        )
+
+    def auth_cookie_expiry(self) -> Optional[float]:
+        """Obtener la expiración de la cookie .ASPXAUTH (None si es de sesión)"""
+        for cookie in self.client.cookies.jar:
+            if cookie.name == '.ASPXAUTH' and cookie.expires:
+                return float(cookie.expires)
+        return None
+
+    async def ensure_login(self, seen_generation: Optional[int] = None) -> bool:
+        """Login compartido entre todas las corrutinas (y workers) que usan esta sesión"""
+        login = self.login if self.shared is None else self._shared_login
+        if await self.state.ensure_login(login, seen_generation=seen_generation):
+            return True
+        logger.error(f"Failed to authenticate upstream account {self.username}")
+        return False
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[httpx.Response]:
+        """GET autenticado: login perezoso y un único reintento si la sesión venció"""
+        state = self.state
+        if state.needs_login() and not await self.ensure_login():
+            return None
+
+        generation = state.generation
+        response = await self.client.get(url, headers=headers)
+        if self.is_login_required(response):
+            state.invalidate()
+            if not await self.ensure_login(seen_generation=generation):
+                return None
+            response = await self.client.get(url, headers=headers)
+            if self.is_login_required(response):
+                state.invalidate()
+                logger.error(f"Session rejected after re-login: {url}")
+                return None
+
+        state.mark_success()
+        return response
+
+    async def login(self) -> bool:
+        """Login to Belcorp website"""
+        try:
+            # Get initial page to obtain session cookie
+            initial_response = await self.client.get(f"{self.base_url}/Login")
+            if initial_response.status_code != 200:
+                logger.error(f"Failed to get login page: {initial_response.status_code}")
+                BELCORP_LOGINS.labels('error').inc()
+                self.state.invalidate()
+                return False
+
+            # Extract CSRF token if needed
+            csrf_value = self.parser.parse_login_token(initial_response.text)
+
+            # Prepare login data
+            login_data = {
+                'returnUrl': '',
+                'UsuarioExterno.Proveedor': '',
+                'UsuarioExterno.IdAplicacion': '',
+                'UsuarioExterno.Login': '',
+                'UsuarioExterno.Nombres': '',
+                'UsuarioExterno.Apellidos': '',
+                'UsuarioExterno.FechaNacimiento': '',
+                'UsuarioExterno.Correo': '',
+                'UsuarioExterno.Genero': '',
+                'UsuarioExterno.Ubicacion': '',
+                'UsuarioExterno.LinkPerfil': '',
+                'UsuarioExterno.FotoPerfil': '',
+                'UsuarioExterno.Redireccionar': 'true',
+                'hdeCodigoISO': 'CO',
+                'PaisID': '4',
+                'CodigoISO': 'CO',
+                'CodigoUsuario': self.username,
+                'ClaveSecreta': self.password or '',
+                '__RequestVerificationToken': csrf_value
+            }
+
+            # Perform login
+            login_response = await self.client.post(
+                f"{self.base_url}/Login/Login",
+                data=login_data
+            )
+
+            # Check if login was successful (the redirect already lands on /Inicio)
+            if '.ASPXAUTH' not in self.client.cookies or self.is_login_required(login_response):
+                return self._login_failed()
+
+            BELCORP_LOGINS.labels('success').inc()
+            self.state.mark_authenticated(self.auth_cookie_expiry())
+            self.login_failures = 0
+            self.quarantined_until = 0.0
+            return True
+
+        except httpx.TransportError as e:
+            # Upstream caído o circuito abierto: no dice nada de las credenciales
+            logger.error(f"Login failed: {str(e)}")
+            BELCORP_LOGINS.labels('error').inc()
+            self.state.invalidate()
+            return False
+        except Exception as e:
+            logger.error(f"Login failed: {str(e)}")
+            return self._login_failed()
+
+    # Cookies compartidas entre workers
+
+    @property
+    def _shared_key(self) -> str:
+        return f"upstream_session:{self.username}"
+
+    def _adopt_shared(self) -> bool:
+        """Tomar las cookies que publicó otro worker, si no son las que ya tenemos"""
+        payload = self.shared.get(self._shared_key)
+        if payload is None:
+            return False
+        saved = json.loads(payload)
+        if saved['stamp'] == self._shared_stamp:
+            return False  # son las nuestras: si fallaron hay que volver a entrar
+        if saved['cookie_expires_at'] is not None and saved['cookie_expires_at'] <= time.time():
+            return False
+        self.client.cookies.clear()
+        for cookie in saved['cookies']:
+            self.client.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'])
+        self._shared_stamp = saved['stamp']
+        self.state.mark_authenticated(saved['cookie_expires_at'])
+        self.adopted_logins += 1
+        return True
+
+    def _publish_shared(self):
+        self._shared_stamp = uuid.uuid4().hex
+        cookies = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path}
+            for c in self.client.cookies.jar
+        ]
+        self.shared.set(self._shared_key, json.dumps({
+            'stamp': self._shared_stamp,
+            'cookies': cookies,
+            'cookie_expires_at': self.state.cookie_expires_at,
+        }))
+
+    async def _shared_login(self) -> bool:
+        """Login coordinado: un worker entra y publica las cookies, el resto las adopta"""
+        if self._adopt_shared():
+            return True
+        lock = f"{self._shared_key}:login"
+        locked = self.shared.set(lock, os.getpid(), ex=int(self.shared_login_wait), nx=True)
+        if not locked:
+            # Otro worker está entrando con esta cuenta: esperar sus cookies
+            deadline = time.monotonic() + self.shared_login_wait
+            while time.monotonic() < deadline and self.shared.get(lock) is not None:
+                await asyncio.sleep(0.1)
+                if self._adopt_shared():
+                    return True
+            if self._adopt_shared():
+                return True
+        try:
+            ok = await self.login()
+        finally:
+            if locked:
+                self.shared.delete(lock)
+        if ok:
+            self._publish_shared()
+        return ok
+
+    def _login_failed(self) -> bool:
+        BELCORP_LOGINS.labels('rejected').inc()
+        self.state.invalidate()
+        self.login_failures += 1
+        return False
+
+    def snapshot(self) -> Dict:
+        return {
+            'account': self.username,
+            'authenticated': self.state.authenticated,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'login_failures': self.login_failures,
+            'adopted_logins': self.adopted_logins,
+            'quarantined_for_seconds': max(0.0, self.quarantined_until - time.time()),
+        }
+
+
+class SessionPool:
+    """Pool de sesiones upstream autenticadas, una por cuenta configurada.
+
+    Cada request toma una sesión (round-robin o la menos ocupada), así la
+    carga se reparte entre cuentas en vez de pasar toda por una sola. Una
+    tarea de fondo mantiene las sesiones calientes y reintenta el login de
+    las que quedaron en cuarentena por un login fallido.
+    """
+
+    STRATEGIES = ('least_busy', 'round_robin')
+
+    def __init__(
+        self,
+        sessions: List[UpstreamSession],
+        strategy: str = 'least_busy',
+        keepalive_interval: float = 5 * 60,
+        quarantine_seconds: float = 10 * 60,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if not sessions:
+            raise ValueError("SessionPool needs at least one upstream account")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown session pool strategy: {strategy}")
+        self.sessions = sessions
+        self.strategy = strategy
+        self.keepalive_interval = keepalive_interval
+        self.quarantine_seconds = quarantine_seconds
+        self._transport = transport
+        self._cursor = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def accounts_from_settings(settings) -> List[Tuple[str, str]]:
+        """BELCORP_USERNAME/PASSWORD (si están) seguidas de BELCORP_ACCOUNTS"""
+        accounts = []
+        if settings.BELCORP_USERNAME and settings.BELCORP_PASSWORD:
+            accounts.append((settings.BELCORP_USERNAME, settings.BELCORP_PASSWORD))
+        for account in settings.BELCORP_ACCOUNTS:
+            credentials = (account['username'], account['password'])
+            if credentials not in accounts:
+                accounts.append(credentials)
+        return accounts
+
+    @classmethod
+    def from_settings(cls, settings=None, parser: Optional[HTMLParser] = None) -> "SessionPool":
+        """Una sesión por cuenta, todas sobre el mismo pool de conexiones"""
+        settings = settings or get_settings()
+        parser = parser or get_parser(settings.HTML_PARSER, lazy=True)
+        transport = create_async_transport(settings)
+        shared = get_shared_state(settings)
+        sessions = [
+            UpstreamSession(
+                username,
+                password,
+                settings.BELCORP_BASE_URL,
+                parser,
+                client=create_async_client(follow_redirects=True, transport=transport, settings=settings),
+                idle_timeout=settings.BELCORP_SESSION_IDLE_TIMEOUT,
+                shared=shared,
+                shared_login_wait=settings.SHARED_LOGIN_WAIT,
+            )
+            for username, password in cls.accounts_from_settings(settings)
+        ]
+        return cls(
+            sessions,
+            strategy=settings.SESSION_POOL_STRATEGY,
+            keepalive_interval=settings.SESSION_POOL_KEEPALIVE_INTERVAL,
+            quarantine_seconds=settings.SESSION_POOL_QUARANTINE_SECONDS,
+            transport=transport,
+        )
+
+    def start(self) -> Optional[asyncio.Task]:
+        if self.keepalive_interval and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._keep_warm_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def aclose(self):
+        """Detener el keep-alive y cerrar los clientes (y el transporte compartido)"""
+        await self.stop()
+        for session in self.sessions:
+            await session.client.aclose()
+        if self._transport is not None:
+            await self._transport.aclose()
+
+    @property
+    def base_url(self) -> str:
+        return self.sessions[0].base_url
+
+    def available(self) -> List[UpstreamSession]:
+        now = time.time()
+        return [session for session in self.sessions if not session.is_quarantined(now)]
+
+    def _pick(self, exclude: List[UpstreamSession]) -> Optional[UpstreamSession]:
+        candidates = [session for session in self.available() if session not in exclude]
+        if not candidates:
+            return None
+        offset = next(self._cursor) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        if self.strategy == 'round_robin':
+            return rotated[0]
+        # Empates entre las menos ocupadas: se reparten en rotación
+        return min(rotated, key=lambda session: session.in_flight)
+
+    @contextlib.asynccontextmanager
+    async def checkout(self, exclude: Optional[List[UpstreamSession]] = None) -> AsyncIterator[Optional[UpstreamSession]]:
+        """Tomar una sesión sana para un request (None si todas están en cuarentena)"""
+        session = self._pick(exclude or [])
+        if session is None:
+            yield None
+            return
+        session.in_flight += 1
+        session.requests += 1
+        try:
+            yield session
+        finally:
+            session.in_flight -= 1
+
+    def quarantine(self, session: UpstreamSession):
+        if session.is_quarantined():
+            return  # otra corrutina que esperaba el mismo login ya la apartó
+        session.quarantined_until = time.time() + self.quarantine_seconds
+        logger.warning(
+            f"Upstream account {session.username} quarantined for {self.quarantine_seconds}s "
+            f"after {session.login_failures} failed login(s)"
+        )
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[httpx.Response]:
+        """GET autenticado con alguna sesión del pool; si su login falla se prueba con otra"""
+        tried: List[UpstreamSession] = []
+        while True:
+            async with self.checkout(exclude=tried) as session:
+                if session is None:
+                    logger.error("No upstream session available")
+                    return None
+                failures = session.login_failures
+                response = await session.get(url, headers)
+                if response is not None or session.login_failures == failures:
+                    return response
+                self.quarantine(session)
+                tried.append(session)
+
+    async def login_all(self) -> bool:
+        """Hacer login en todas las sesiones; True si al menos una quedó autenticada"""
+        results = await asyncio.gather(*(self._warm(session) for session in self.sessions))
+        return any(results)
+
+    async def _warm(self, session: UpstreamSession) -> bool:
+        """Renovar una sesión: login si hace falta, si no una sonda a /Inicio"""
+        if session.is_quarantined():
+            return False
+        failures = session.login_failures
+        if session.state.needs_login():
+            ok = await session.ensure_login()
+        else:
+            ok = await session.check_auth() or await session.ensure_login()
+        if session.login_failures > failures:
+            self.quarantine(session)
+        return ok
+
+    async def keep_warm(self):
+        """Tocar las sesiones que van a vencer por inactividad antes del próximo ciclo"""
+        now = time.time()
+        stale = [
+            session for session in self.sessions
+            if session.state.last_success_at is None
+            or now - session.state.last_success_at >= session.state.idle_timeout - self.keepalive_interval
+        ]
+        await asyncio.gather(*(self._warm(session) for session in stale))
+
+    async def _keep_warm_forever(self):
+        while True:
+            try:
+                await self.keep_warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Session keep-alive error: {str(e)}")
+            await asyncio.sleep(self.keepalive_interval)
+
+    def snapshot(self) -> Dict:
+        return {
+            'strategy': self.strategy,
+            'sessions': [session.snapshot() for session in self.sessions],
+        }
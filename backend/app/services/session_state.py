@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState:
+    """Estado de autenticación de una sesión upstream.
+
+    Registra la expiración de la cookie .ASPXAUTH y el último acceso exitoso
+    para decidir sin ir a la red si hace falta hacer login, y comparte un
+    único login() en vuelo entre todas las corrutinas que lo necesiten.
+    """
+
+    def __init__(self, idle_timeout: float):
+        self.idle_timeout = idle_timeout
+        self.authenticated = False
+        self.cookie_expires_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        # Se incrementa en cada login exitoso; permite saber si otra
+        # corrutina ya renovó la sesión mientras esperábamos la respuesta
+        self.generation = 0
+        self._login_task: Optional[asyncio.Task] = None
+
+    def needs_login(self, now: Optional[float] = None) -> bool:
+        """Indicar si la sesión está (probablemente) vencida"""
+        if not self.authenticated:
+            return True
+        now = now if now is not None else time.time()
+        if self.cookie_expires_at is not None and now >= self.cookie_expires_at:
+            return True
+        if self.last_success_at is not None and now - self.last_success_at >= self.idle_timeout:
+            return True
+        return False
+
+    def mark_authenticated(self, cookie_expires_at: Optional[float] = None):
+        """Registrar un login exitoso"""
+        self.authenticated = True
+        self.cookie_expires_at = cookie_expires_at
+        self.last_success_at = time.time()
+        self.generation += 1
+
+    def mark_success(self):
+        """Registrar una respuesta autenticada (renueva la expiración deslizante)"""
+        self.last_success_at = time.time()
+
+    def invalidate(self):
+        """Marcar la sesión como vencida"""
+        self.authenticated = False
+
+    async def ensure_login(
+        self,
+        login: Callable[[], Awaitable[bool]],
+        seen_generation: Optional[int] = None,
+    ) -> bool:
+        """Hacer login una sola vez aunque lo pidan varias corrutinas a la vez.
+
+        Si ``seen_generation`` es anterior a la generación actual, otra
+        corrutina ya renovó la sesión y no hace falta volver a entrar.
+        """
+        if seen_generation is not None and seen_generation < self.generation and self.authenticated:
+            return True
+        if self._login_task is None or self._login_task.done():
+            self._login_task = asyncio.ensure_future(login())
+        try:
+            return await asyncio.shield(self._login_task)
+        except Exception as e:
+            logger.error(f"Login failed: {str(e)}")
+            return False
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.http import create_async_client, create_async_transport
+from .html_parser import HTMLParser, get_parser
+from .session_pool import UpstreamSession
+
+logger = logging.getLogger(__name__)
+
+# Sesión upstream del consultor que hizo el request en curso (la fija una dependencia de FastAPI)
+current_upstream_session: contextvars.ContextVar[Optional[UpstreamSession]] = contextvars.ContextVar(
+    "current_upstream_session", default=None
+)
+
+
+class UserSessionStore:
+    """Cookies de las sesiones upstream por usuario (sqlite), para sobrevivir a un reinicio.
+
+    Sólo se guardan cookies y tiempos, nunca la contraseña.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                subject TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                cookies TEXT NOT NULL,
+                cookie_expires_at REAL,
+                last_used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_user_sessions_last_used_at ON user_sessions (last_used_at);
+            """
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def save(self, subject: str, username: str, cookies: List[Dict], cookie_expires_at: Optional[float], last_used_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_sessions (subject, username, cookies, cookie_expires_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (subject, username, json.dumps(cookies), cookie_expires_at, last_used_at),
+            )
+
+    def load(self, subject: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT username, cookies, cookie_expires_at, last_used_at FROM user_sessions WHERE subject = ?",
+                (subject,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'username': row[0],
+            'cookies': json.loads(row[1]),
+            'cookie_expires_at': row[2],
+            'last_used_at': row[3],
+        }
+
+    def touch(self, last_used: Dict[str, float]):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE user_sessions SET last_used_at = ? WHERE subject = ?",
+                [(used, subject) for subject, used in last_used.items()],
+            )
+
+    def delete(self, subject: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM user_sessions WHERE subject = ?", (subject,))
+
+    def purge_idle(self, older_than: float) -> int:
+        """Borrar sesiones sin uso desde ``older_than`` (upstream ya las venció)"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM user_sessions WHERE last_used_at < ?", (older_than,))
+        return cursor.rowcount
+
+
+class UserSessionManager:
+    """Sesiones upstream por consultor, indexadas por el ``sub`` del JWT.
+
+    Mapa LRU acotado: al desalojar una sesión sus cookies quedan en el
+    store y se restauran en el próximo request del mismo usuario, igual que
+    después de un reinicio. Las sesiones inactivas más de ``idle_ttl`` se
+    descartan (upstream ya las habrá vencido).
+    """
+
+    def __init__(
+        self,
+        store: UserSessionStore,
+        base_url: str,
+        parser: HTMLParser,
+        max_sessions: int = 1000,
+        idle_ttl: float = 20 * 60,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.store = store
+        self.base_url = base_url
+        self.parser = parser
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._transport = transport
+        self._sessions: "OrderedDict[str, UpstreamSession]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # Generación de login que ya está persistida, para guardar sólo si cambió
+        self._saved_generation: Dict[str, int] = {}
+        self.restored = 0
+        self.evicted = 0
+        self.reaped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings=None, parser: Optional[HTMLParser] = None) -> "UserSessionManager":
+        settings = settings or get_settings()
+        return cls(
+            UserSessionStore(settings.USER_SESSION_STORE_PATH),
+            settings.BELCORP_BASE_URL,
+            parser or get_parser(settings.HTML_PARSER, lazy=True),
+            max_sessions=settings.USER_SESSIONS_MAX,
+            idle_ttl=settings.USER_SESSION_IDLE_TTL,
+            transport=create_async_transport(settings),
+        )
+
+    def _new_session(self, username: str, password: Optional[str]) -> UpstreamSession:
+        client = create_async_client(follow_redirects=True, transport=self._transport) if self._transport else None
+        return UpstreamSession(
+            username, password, self.base_url, self.parser, client=client, idle_timeout=self.idle_ttl
+        )
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._reap_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def aclose(self):
+        """Persistir las sesiones vivas y cerrar el transporte"""
+        await self.stop()
+        for subject in list(self._sessions):
+            self._persist(subject)
+        self._sessions.clear()
+        if self._transport is not None:
+            await self._transport.aclose()
+        self.store.close()
+
+    async def login(self, subject: str, username: str, password: str) -> Optional[UpstreamSession]:
+        """Login upstream con las credenciales del consultor (None si upstream las rechaza)"""
+        session = self._new_session(username, password)
+        if not await session.login():
+            return None
+        self._put(subject, session)
+        self._persist(subject)
+        return session
+
+    async def get(self, subject: str) -> Optional[UpstreamSession]:
+        """Sesión del usuario: en memoria, o restaurada desde las cookies guardadas"""
+        session = self._sessions.get(subject)
+        if session is None:
+            session = self._restore(subject)
+            if session is None:
+                return None
+            self._put(subject, session)
+        else:
+            self._sessions.move_to_end(subject)
+        self._last_used[subject] = time.time()
+        if self._saved_generation.get(subject) != session.state.generation:
+            # Hubo un re-login: persistir las cookies nuevas
+            self._persist(subject)
+        return session
+
+    def _restore(self, subject: str) -> Optional[UpstreamSession]:
+        saved = self.store.load(subject)
+        if saved is None:
+            return None
+        if time.time() - saved['last_used_at'] >= self.idle_ttl:
+            self.store.delete(subject)
+            return None
+        session = self._new_session(saved['username'], None)
+        for cookie in saved['cookies']:
+            session.client.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'])
+        session.state.mark_authenticated(saved['cookie_expires_at'])
+        session.state.last_success_at = saved['last_used_at']
+        self._saved_generation[subject] = session.state.generation
+        self.restored += 1
+        return session
+
+    def _put(self, subject: str, session: UpstreamSession):
+        self._sessions[subject] = session
+        self._sessions.move_to_end(subject)
+        self._last_used[subject] = time.time()
+        while len(self._sessions) > self.max_sessions:
+            evicted_subject, evicted_session = self._sessions.popitem(last=False)
+            # Queda en el store; se restaura si el usuario vuelve
+            self._persist(evicted_subject, session=evicted_session)
+            self._forget(evicted_subject)
+            self.evicted += 1
+
+    def _persist(self, subject: str, session: Optional[UpstreamSession] = None):
+        session = session or self._sessions.get(subject)
+        if session is None or not session.state.authenticated:
+            return
+        cookies = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path}
+            for c in session.client.cookies.jar
+        ]
+        self.store.save(
+            subject,
+            session.username,
+            cookies,
+            session.state.cookie_expires_at,
+            self._last_used.get(subject, time.time()),
+        )
+        self._saved_generation[subject] = session.state.generation
+
+    def _forget(self, subject: str):
+        self._sessions.pop(subject, None)
+        self._last_used.pop(subject, None)
+        self._saved_generation.pop(subject, None)
+
+    def reap_idle(self) -> int:
+        """Descartar sesiones inactivas (memoria y store)"""
+        cutoff = time.time() - self.idle_ttl
+        idle = [subject for subject, used in self._last_used.items() if used < cutoff]
+        for subject in idle:
+            self._forget(subject)
+        # Las sesiones vivas renuevan su last_used en el store antes de purgar
+        self.store.touch(self._last_used)
+        reaped = len(idle) + self.store.purge_idle(cutoff)
+        self.reaped += len(idle)
+        return reaped
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_ttl / 4))
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"User session reaper error: {str(e)}")
+
+    def snapshot(self) -> Dict:
+        return {
+            'active': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'restored': self.restored,
+            'evicted': self.evicted,
+            'reaped': self.reaped,
+        }
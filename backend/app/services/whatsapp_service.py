@@ -1,19 +1,42 @@
-import requests
+import httpx
 import logging
-from typing import List
-from ..models.models import Order, CartItem
+from typing import NamedTuple, Optional
+from ..models.models import Order
 from ..core.config import get_settings
+from ..core.http import build_timeout, create_async_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+
+class DeliveryResult(NamedTuple):
+    ok: bool
+    retryable: bool = False
+    error: Optional[str] = None
+
+
 class WhatsAppService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, base_url: Optional[str] = None):
         self.api_key = settings.WHATSAPP_API_KEY
         self.phone_number = settings.WHATSAPP_PHONE_NUMBER
-        self.base_url = "https://graph.facebook.com/v17.0"
+        self.base_url = base_url or settings.WHATSAPP_API_BASE_URL
+        # Un único cliente con pool para todos los envíos
+        self._owns_client = client is None
+        self.client = client or create_async_client(timeout=build_timeout(
+            connect=settings.WHATSAPP_CONNECT_TIMEOUT,
+            read=settings.WHATSAPP_READ_TIMEOUT,
+        ))
+
+    @property
+    def configured(self) -> bool:
+        """Hay credenciales de la Graph API; sin ellas no se puede enviar nada"""
+        return bool(self.api_key and self.phone_number)
 
-    def _format_order_message(self, order: Order) -> str:
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
+
+    def format_order_message(self, order: Order) -> str:
         """Formatear el mensaje de la orden para WhatsApp"""
         message = f"¡Nuevo pedido de {order.customer_name}!\n\n"
         message += "Productos:\n"
@@ -31,40 +54,44 @@ class WhatsAppService:
         
         return message
 
-    def send_order_notification(self, order: Order) -> bool:
-        """Enviar notificación de orden por WhatsApp"""
-        try:
-            if not self.api_key or not self.phone_number:
-                logger.error("WhatsApp credentials not configured")
-                return False
+    async def send_message(self, to: str, body: str) -> DeliveryResult:
+        """Enviar un mensaje de texto por la Graph API de WhatsApp"""
+        if not self.configured:
+            logger.error("WhatsApp credentials not configured")
+            return DeliveryResult(ok=False, error="not configured")
 
-            message = self._format_order_message(order)
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "messaging_product": "whatsapp",
-                "to": order.customer_phone,
-                "type": "text",
-                "text": {"body": message}
-            }
-            
-            response = requests.post(
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        data = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": body}
+        }
+
+        try:
+            response = await self.client.post(
                 f"{self.base_url}/{self.phone_number}/messages",
                 headers=headers,
                 json=data
             )
-            
-            if response.status_code == 200:
-                logger.info(f"WhatsApp notification sent successfully to {order.customer_phone}")
-                return True
-            else:
-                logger.error(f"Failed to send WhatsApp notification: {response.text}")
-                return False
+        except httpx.HTTPError as e:
+            logger.warning(f"Error sending WhatsApp message: {str(e)}")
+            return DeliveryResult(ok=False, retryable=True, error=str(e))
 
-        except Exception as e:
-            logger.error(f"Error sending WhatsApp notification: {str(e)}")
-            return False
+        if response.status_code == 200:
+            logger.info(f"WhatsApp notification sent successfully to {to}")
+            return DeliveryResult(ok=True)
+
+        # 429 y 5xx son transitorios; el resto (token inválido, número erróneo) no
+        retryable = response.status_code == 429 or response.status_code >= 500
+        logger.error(f"Failed to send WhatsApp notification: {response.text}")
+        return DeliveryResult(ok=False, retryable=retryable, error=f"HTTP {response.status_code}")
+
+    async def send_order_notification(self, order: Order) -> bool:
+        """Enviar notificación de orden por WhatsApp"""
+        result = await self.send_message(order.customer_phone, self.format_order_message(order))
+        return result.ok
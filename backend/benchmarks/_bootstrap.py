@@ -0,0 +1,29 @@
+"""Hace importable el paquete ``app`` desde los benchmarks.
+
+``backend/app.py`` (la API legada) tapa al paquete ``backend/app/`` cuando
+``backend`` está en ``sys.path``, así que registramos el paquete a mano.
+"""
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app_package():
+    """Registrar ``backend/app/`` como el paquete ``app``"""
+    module = sys.modules.get("app")
+    if module is not None and hasattr(module, "__path__"):
+        return module
+    spec = importlib.machinery.ModuleSpec("app", None, is_package=True)
+    spec.submodule_search_locations = [os.path.join(BACKEND_DIR, "app")]
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    return module
+
+
+load_app_package()
+
+# El stub local no necesita el rate limit por host pensado para somosbelcorp.com
+os.environ.setdefault("UPSTREAM_RATE_LIMIT", "100000")
@@ -0,0 +1,101 @@
+"""Micro-benchmark del costo de autenticación por request.
+
+Dos niveles:
+
+- ``verify``: µs por llamada a ``verify_token`` para cada backend JWT
+  instalado, sin caché (se verifica la firma cada vez) y con la caché de
+  tokens verificados caliente;
+- ``request``: µs por request a un endpoint trivial servido en proceso
+  (httpx + ASGITransport), sin auth y con ``get_current_user`` con y sin
+  caché. La diferencia con ``no_auth`` es el overhead real por request.
+
+Uso:
+    python benchmarks/bench_auth.py --iterations 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import _bootstrap  # noqa: F401
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.core import security
+from app.core.security import JWT_BACKENDS, VerifiedTokenCache, create_access_token, get_current_user, get_jwt_backend
+
+
+def use_backend(name, cache_size):
+    security.jwt_backend = get_jwt_backend(name)
+    security.token_cache = VerifiedTokenCache(cache_size)
+    return create_access_token({"sub": "bench@example.com"}, expires_delta=timedelta(hours=1))
+
+
+def bench_verify(iterations):
+    results = {}
+    for name in JWT_BACKENDS:
+        if get_jwt_backend(name).name != name:
+            continue  # no instalado
+        for label, cache_size in (("no_cache", 0), ("cached", 1024)):
+            token = use_backend(name, cache_size)
+            security.verify_token(token)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                security.verify_token(token)
+            results[f"{name}:{label}"] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+
+async def bench_requests(iterations, backend):
+    app = FastAPI()
+
+    @app.get("/no-auth")
+    async def no_auth():
+        return {"ok": True}
+
+    @app.get("/auth")
+    async def auth(current_user: str = Depends(get_current_user)):
+        return {"ok": True}
+
+    async def run(path, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get(path, headers=headers)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.text
+            return (time.perf_counter() - started) / iterations * 1e6
+
+    results = {"no_auth": await run("/no-auth")}
+    results["auth:no_cache"] = await run("/auth", use_backend(backend, 0))
+    results["auth:cached"] = await run("/auth", use_backend(backend, 1024))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--backend", default="auto", help="backend JWT para el benchmark de requests")
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+
+    report = {
+        "verify_us": bench_verify(args.iterations),
+        "request_us": asyncio.run(bench_requests(max(1, args.iterations // 5), args.backend)),
+    }
+    for section, results in report.items():
+        print(section)
+        for name, us in results.items():
+            print(f"  {name:<16} {us:10.1f} µs")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Prueba de carga de la API completa contra el HTML capturado de somosbelcorp.com.
+
+Levanta el stub local sirviendo las páginas de fixtures/ (login, /Catalogo,
+/Catalogo/Categoria/X, /Producto/{id}) con la latencia inyectada, arranca la
+app FastAPI con uvicorn en un proceso aparte y la ataca con clientes
+concurrentes.
+Por escenario reporta p50/p95/p99, throughput y llamadas al upstream por
+request:
+
+- ``products``: GET /api/products recorriendo categorías y páginas;
+- ``product``: GET /api/products/{id} sobre ``--distinct`` ids;
+- ``categories``: GET /api/categories;
+- ``orders``: POST /api/orders con dos ítems;
+- ``mixed``: los cuatro anteriores intercalados.
+
+Con ``--cold`` se apagan los cachés (catálogo y respuestas renderizadas)
+para medir el camino completo upstream -> parseo -> JSON en cada request.
+
+El resultado se guarda como JSON (``--output``); con ``--baseline`` se
+compara contra una corrida anterior y el proceso sale con código 1 si el
+p95 o el throughput de algún escenario empeoran más que ``--tolerance``.
+
+Uso:
+    python benchmarks/bench_load.py --requests 500 --concurrency 50 --latency 0.05 --output load.json
+    python benchmarks/bench_load.py --baseline load.json
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import _bootstrap  # noqa: F401
+
+import httpx
+
+from stub_upstream import FIXTURES_DIR, run_stub_server
+
+SCENARIOS = ("products", "product", "categories", "orders", "mixed")
+
+# Categorías del menú de fixtures/catalogo.html
+CATEGORIES = ("Maquillaje", "Fragancias", "Cuidado Personal", "Tratamiento Facial", "Accesorios")
+PAGES = 5
+
+
+def configure_environment(base_url, cold):
+    """Settings de la app para la corrida (antes de importarla)"""
+    os.environ.update(
+        BELCORP_BASE_URL=base_url,
+        BELCORP_USERNAME="bench",
+        BELCORP_PASSWORD="bench",
+        CRAWLER_ENABLED="false",
+        ORDER_REPOSITORY_BACKEND="sqlite",
+    )
+    os.environ.pop("CACHE_DISK_PATH", None)
+    if cold:
+        os.environ.update(
+            CACHE_TTL_CATALOG="0",
+            CACHE_TTL_PRODUCT="0",
+            CACHE_TTL_CATEGORIES="0",
+            CACHE_STALE_TTL="0",
+            CACHE_OUTAGE_TTL="0",
+            RENDERED_RESPONSE_CACHE_SIZE="0",
+        )
+
+
+def _serve(port, workers=1):
+    """Proceso hijo: importar la app y servirla con uvicorn.
+
+    Con varios workers uvicorn importa la app por nombre en cada proceso
+    (que vuelve a cargar este script, y con él ``_bootstrap``).
+    """
+    import uvicorn
+
+    logging.disable(logging.ERROR)
+    app = importlib.import_module("app.main").app if workers == 1 else "app.main:app"
+    uvicorn.run(app, host="127.0.0.1", port=port, workers=workers, log_level="warning", access_log=False)
+
+
+class AppServer:
+    """uvicorn en un proceso aparte, para no competir por el GIL con los clientes"""
+
+    def __init__(self, workers=1):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        # Un proceso daemon no puede lanzar los workers de uvicorn
+        self.process = multiprocessing.get_context("spawn").Process(
+            target=_serve, args=(self.port, workers), daemon=workers == 1
+        )
+
+    def __enter__(self):
+        self.process.start()
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{self.base_url}/").status_code < 500:
+                    return self
+            except httpx.TransportError:
+                pass
+            if not self.process.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.05)
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.join(timeout=10)
+
+
+def build_requests(scenario, distinct):
+    """Generador infinito de (método, path, params, json) para un escenario"""
+    product_ids = [f"{200087000 + i}" for i in range(distinct)]
+
+    def products():
+        for category, page in itertools.cycle(itertools.product(CATEGORIES, range(1, PAGES + 1))):
+            yield "GET", "/api/products", {"category": category, "page": page}, None
+
+    def product():
+        for product_id in itertools.cycle(product_ids):
+            yield "GET", f"/api/products/{product_id}", None, None
+
+    def categories():
+        while True:
+            yield "GET", "/api/categories", None, None
+
+    def orders():
+        for i in itertools.count():
+            items = [
+                {"product_id": product_ids[i % distinct], "quantity": 1, "price": "39.90"},
+                {"product_id": product_ids[(i + 1) % distinct], "quantity": 2, "price": "25.90"},
+            ]
+            order = {"customer_name": "Bench", "customer_phone": f"+5730000{i % 1000:04d}", "items": items}
+            yield "POST", "/api/orders", None, order
+
+    def mixed():
+        generators = [products(), product(), categories(), orders()]
+        for generator in itertools.cycle(generators):
+            yield next(generator)
+
+    return {"products": products, "product": product, "categories": categories, "orders": orders, "mixed": mixed}[scenario]()
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, headers, scenario, total, concurrency, distinct, stub):
+    requests = build_requests(scenario, distinct)
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, path, params, body = next(requests)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body, headers=headers)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    upstream_before = sum(stub.requests.values())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    upstream_calls = sum(stub.requests.values()) - upstream_before
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+        "upstream_calls_per_request": round(upstream_calls / total, 3),
+    }
+
+
+async def drive(base_url, args, stub):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        response = await client.post("/api/token", data={"username": "bench@example.com", "password": "bench"})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        results = {}
+        for scenario in args.scenarios:
+            if args.warmup:
+                await run_scenario(client, headers, scenario, args.warmup, args.concurrency, args.distinct, stub)
+            results[scenario] = await run_scenario(
+                client, headers, scenario, args.requests, args.concurrency, args.distinct, stub
+            )
+        return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, tolerance):
+    """Regresiones de p95 y throughput contra una corrida anterior"""
+    regressions = []
+    for scenario, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        p95, old_p95 = result["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        rps, old_rps = result["throughput_rps"], previous["throughput_rps"]
+        print(f"  {scenario:<11} p95 {old_p95:8.2f} -> {p95:8.2f} ms   rps {old_rps:8.1f} -> {rps:8.1f}")
+        if old_p95 and p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {old_p95} -> {p95} ms")
+        if old_rps and rps < old_rps * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {old_rps} -> {rps} rps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests medidos por escenario")
+    parser.add_argument("--warmup", type=int, default=50, help="requests previos no medidos por escenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia inyectada por petición upstream (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="jitter uniforme sumado a la latencia (s)")
+    parser.add_argument("--distinct", type=int, default=200, help="ids de producto distintos")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--cold", action="store_true", help="sin cachés: cada request llega al upstream")
+    parser.add_argument("--synthetic", action="store_true", help="HTML sintético en vez del capturado")
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    fixtures_dir = None if args.synthetic else FIXTURES_DIR
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    # La app monta static/ y guarda sus sqlite en data/ relativos al cwd
+    os.makedirs(os.path.join(workdir, "static"))
+    os.chdir(workdir)
+
+    with run_stub_server(args.latency, jitter=args.jitter, fixtures_dir=fixtures_dir) as (upstream_url, stub):
+        configure_environment(upstream_url, args.cold)
+        with AppServer() as server:
+            scenarios = asyncio.run(drive(server.base_url, args, stub))
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "distinct": args.distinct,
+            "cold": args.cold,
+            "fixtures": fixtures_dir is not None,
+        },
+        "scenarios": scenarios,
+    }
+    for name, result in scenarios.items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:<11} {result['throughput_rps']:8.1f} rps  p50 {latency['p50']:8.2f}  p95 {latency['p95']:8.2f}"
+            f"  p99 {latency['p99']:8.2f} ms  upstream/req {result['upstream_calls_per_request']:.2f}"
+            f"  errors {result['errors']}"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was run with a different configuration")
+        print(f"vs {args.baseline} ({baseline.get('revision')})")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
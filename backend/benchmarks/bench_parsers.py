@@ -0,0 +1,117 @@
+"""Micro-benchmark de parseo sobre los HTML guardados en fixtures/.
+
+Para cada backend disponible (y para el árbol BeautifulSoup completo que se
+usaba antes, ``bs4-full``) mide ms por página y memoria pico. Cada backend
+corre en un subproceso propio para que el pico de RSS no se contamine:
+``peak_rss_kb`` es el aumento de RSS máximo durante el parseo y
+``peak_py_kb`` el pico de tracemalloc (sólo memoria del allocator de Python;
+lxml y selectolax reservan casi todo en C).
+
+Uso:
+    python benchmarks/bench_parsers.py --iterations 50
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import _bootstrap  # noqa: F401
+
+from app.services.html_parser import SoupParser, available_backends, get_parser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (fixture, método, argumentos extra)
+CASES = [
+    ("catalogo.html", "parse_catalog", (None,)),
+    ("catalogo_categoria.html", "parse_catalog", ("Maquillaje",)),
+    ("catalogo.html", "parse_categories", ()),
+    ("producto.html", "parse_product", ("200087432",)),
+    ("login.html", "parse_login_token", ()),
+]
+
+
+class FullSoupParser(SoupParser):
+    """El camino anterior: árbol BeautifulSoup completo, sin SoupStrainer"""
+
+    name = "bs4-full"
+
+    def __init__(self):
+        super().__init__()
+        self._catalog_only = self._categories_only = self._product_only = self._token_only = None
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def make_parser(backend):
+    if backend == "bs4-full":
+        return FullSoupParser()
+    return get_parser(backend)
+
+
+def run_backend(backend, iterations):
+    parser = make_parser(backend)
+    pages = {name: load_fixture(name) for name, _, _ in CASES}
+    results = {}
+    for fixture, method, args in CASES:
+        parse = getattr(parser, method)
+        html = pages[fixture]
+        parse(html, *args)  # calentamiento
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        parse(html, *args)
+        _, peak_py = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parse(html, *args)
+        elapsed = time.perf_counter() - started
+        results[f"{method}:{fixture}"] = {
+            "ms_per_page": elapsed / iterations * 1000,
+            "peak_py_kb": peak_py / 1024,
+            "peak_rss_kb": rss_after - rss_before,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--backend", help="medir sólo este backend en el proceso actual")
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.iterations)))
+        return
+
+    report = {}
+    for backend in ["bs4-full"] + available_backends():
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--backend", backend, "--iterations", str(args.iterations)]
+        )
+        report[backend] = json.loads(output)
+
+    for case in report["bs4-full"]:
+        print(f"\n{case}")
+        for backend, results in report.items():
+            r = results[case]
+            print(f"  {backend:<11} {r['ms_per_page']:8.2f} ms/page  {r['peak_py_kb']:9.0f} KiB py  {r['peak_rss_kb']:7d} KiB rss")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Micro-benchmark de serialización de páginas de productos.
+
+Compara, para cada tamaño de página, el ms por página de:
+
+- ``response_model``: lo que hacía FastAPI con ``response_model=List[Product]``
+  (validar con pydantic, volcar a tipos JSON y ``json.dumps`` de JSONResponse);
+- ``pydantic_dump_json``: validar y volcar a bytes directamente con pydantic;
+- ``fast_path``: ``dump_products`` (sin validación, orjson si está instalado);
+- ``cached_bytes``: servir el cuerpo ya renderizado desde ``RenderedResponseCache``.
+
+Antes de medir comprueba que ``fast_path`` produce exactamente los mismos
+bytes que pydantic.
+
+Uso:
+    python benchmarks/bench_serialization.py --sizes 10 24 100 500 --iterations 200
+"""
+import argparse
+import json
+import random
+import time
+
+import _bootstrap  # noqa: F401
+
+from app.core.http_cache import RenderedResponseCache
+from app.core.serialization import dump_products, orjson, product_list_adapter
+
+
+def make_products(count):
+    rng = random.Random(count)
+    return [
+        {
+            'id': f"{200000000 + i}",
+            'name': f"Colonia Ésika número {i}",
+            'description': "Fragancia floral con notas cítricas" if i % 2 else None,
+            'price': round(rng.uniform(5, 250), 2),
+            'image_url': f"https://example.com/img/{i}.jpg",
+            'category': "Fragancias",
+            'stock': 100,
+            'sku': f"SKU{i:06d}" if i % 3 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def response_model_path(products):
+    content = product_list_adapter.dump_python(product_list_adapter.validate_python(products), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def pydantic_dump_json(products):
+    return product_list_adapter.dump_json(product_list_adapter.validate_python(products))
+
+
+def timed(fn, iterations):
+    fn()  # calentamiento
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 24, 50, 100, 200, 500])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    report = {}
+    for size in args.sizes:
+        products = make_products(size)
+        assert dump_products(products) == pydantic_dump_json(products), "fast path differs from pydantic"
+
+        rendered = RenderedResponseCache(max_entries=16)
+        rendered.put("products::1", dump_products(products), ttl=3600)
+
+        report[size] = {
+            "response_model": timed(lambda: response_model_path(products), args.iterations),
+            "pydantic_dump_json": timed(lambda: pydantic_dump_json(products), args.iterations),
+            "fast_path": timed(lambda: dump_products(products), args.iterations),
+            "cached_bytes": timed(lambda: rendered.get("products::1").body, args.iterations),
+        }
+
+    print(f"{'size':>6} " + " ".join(f"{name:>20}" for name in next(iter(report.values()))))
+    for size, results in report.items():
+        print(f"{size:>6} " + " ".join(f"{ms:17.4f} ms" for ms in results.values()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
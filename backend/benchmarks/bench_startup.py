@@ -0,0 +1,187 @@
+"""Arranque en frío de la API: tiempo de import y tiempo hasta el primer 200.
+
+Cada corrida es un proceso nuevo (como un spin-up en Render) contra el stub
+con el HTML capturado y latencia inyectada:
+
+- ``import_s``: importar ``app.main`` (proceso aparte, sin servir);
+- ``healthz_s``: desde que se lanza uvicorn hasta el primer 200 de /healthz;
+- ``ready_s``: hasta el primer 200 de /readyz (incluye el warm-up si está activo);
+- ``first_products_s``: hasta el primer 200 de GET /api/products (token incluido);
+- ``first_products_ms``: latencia de ese primer request, el que paga el usuario.
+
+Se mide con y sin ``WARMUP_ENABLED`` y se reporta la mediana de ``--runs``
+corridas. Con ``--importtime`` lista además los módulos que más tardan en
+importarse (``python -X importtime``).
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5 --latency 0.2
+    python benchmarks/bench_startup.py --importtime
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import _bootstrap  # noqa: F401
+
+import httpx
+
+from bench_load import configure_environment, git_revision
+from stub_upstream import FIXTURES_DIR, run_stub_server
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = f"""
+import sys, time
+sys.path.insert(0, {BENCHMARKS_DIR!r})
+started = time.perf_counter()
+import _bootstrap, app.main
+print(time.perf_counter() - started)
+"""
+
+SERVE_SNIPPET = f"""
+import sys
+sys.path.insert(0, {BENCHMARKS_DIR!r})
+import _bootstrap, uvicorn
+uvicorn.run("app.main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning", access_log=False)
+"""
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_200(client, path, deadline):
+    """Instante (monotonic) del primer 200, sondeando cada 5 ms"""
+    while time.monotonic() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return time.monotonic()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not return 200 in time")
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_serve(timeout):
+    """Lanzar uvicorn y medir /healthz, /readyz y el primer /api/products"""
+    port = free_port()
+    launched = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVE_SNIPPET, str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = launched + timeout
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            healthz = wait_for_200(client, "/healthz", deadline)
+            ready = wait_for_200(client, "/readyz", deadline)
+            token = client.post("/api/token", data={"username": "bench@example.com", "password": "bench"})
+            token.raise_for_status()
+            headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+            started = time.monotonic()
+            response = client.get("/api/products", params={"page": 1}, headers=headers)
+            response.raise_for_status()
+            finished = time.monotonic()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {
+        "healthz_s": healthz - launched,
+        "ready_s": ready - launched,
+        "first_products_s": finished - launched,
+        "first_products_ms": (finished - started) * 1000,
+    }
+
+
+def run_mode(warmup, args, upstream_url):
+    runs = []
+    for _ in range(args.runs):
+        # sqlite vacíos en cada corrida: nada del arranque anterior
+        workdir = tempfile.mkdtemp(prefix="bench-startup-")
+        os.makedirs(os.path.join(workdir, "static"))
+        os.chdir(workdir)
+        configure_environment(upstream_url, cold=False)
+        os.environ["WARMUP_ENABLED"] = "true" if warmup else "false"
+        result = {"import_s": measure_import()}
+        result.update(measure_serve(args.timeout))
+        runs.append(result)
+    return {key: round(statistics.median(run[key] for run in runs), 4) for key in runs[0]}
+
+
+def print_importtime(limit):
+    """Módulos de la app y lo que cada uno importa directamente, por tiempo acumulado"""
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    os.makedirs(os.path.join(workdir, "static"))
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+        capture_output=True, text=True, check=True, cwd=workdir,
+    )
+    lines = [line for line in output.stderr.splitlines() if line.startswith("import time:") and "cumulative" not in line]
+    rows = []
+    parents = {}
+    # -X importtime escribe cada módulo después de sus dependencias: al revés, el padre aparece antes
+    for line in reversed(lines):
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        parents[depth] = name
+        parent = parents.get(depth - 1, "") if depth else ""
+        if name.startswith("app.") or parent.startswith("app."):
+            rows.append((int(cumulative) / 1000, name, parent))
+    for cumulative_ms, name, parent in sorted(rows, reverse=True)[:limit]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}" + (f"  (from {parent})" if parent else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="procesos nuevos por modo")
+    parser.add_argument("--latency", type=float, default=0.2, help="latencia inyectada por petición upstream (s)")
+    parser.add_argument("--timeout", type=float, default=60, help="tope por arranque (s)")
+    parser.add_argument("--importtime", action="store_true", help="listar los imports más lentos")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    if args.importtime:
+        print("slowest imports (cumulative):")
+        print_importtime(args.top)
+
+    modes = {}
+    with run_stub_server(args.latency, fixtures_dir=FIXTURES_DIR) as (upstream_url, _):
+        for warmup in (False, True):
+            modes["warmup" if warmup else "no_warmup"] = run_mode(warmup, args, upstream_url)
+
+    for mode, result in modes.items():
+        print(
+            f"{mode:<10} import {result['import_s']:6.3f}s  healthz {result['healthz_s']:6.3f}s"
+            f"  ready {result['ready_s']:6.3f}s  first /api/products {result['first_products_s']:6.3f}s"
+            f" ({result['first_products_ms']:.1f} ms)"
+        )
+
+    if output:
+        report = {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "config": {"runs": args.runs, "latency": args.latency},
+            "modes": modes,
+        }
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
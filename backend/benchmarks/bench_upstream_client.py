@@ -0,0 +1,82 @@
+"""Throughput concurrente: requests.Session bloqueante vs httpx.AsyncClient.
+
+Simula handlers ``async def`` de FastAPI que llaman al catálogo contra el
+stub local. La variante "blocking" reproduce el código anterior
+(requests.Session dentro de la corrutina, bloqueando el event loop); la
+variante "async" usa BelcorpService sobre el pool de httpx.
+
+Uso:
+    python benchmarks/bench_upstream_client.py --requests 200 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import _bootstrap  # noqa: F401
+import requests
+
+from app.services.belcorp_service import BelcorpService
+from stub_upstream import run_stub_server
+
+
+class BlockingCatalogClient:
+    """Reproducción del camino anterior basado en requests.Session"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.parser = BelcorpService("bench", "bench", base_url=base_url)
+
+    def login(self):
+        self.session.get(f"{self.base_url}/Login")
+        self.session.post(f"{self.base_url}/Login/Login", data={"CodigoUsuario": "bench"})
+
+    async def get_catalog(self, category, page):
+        self.session.get(f"{self.base_url}/Inicio")
+        response = self.session.get(f"{self.base_url}/Catalogo/Categoria/{category}?pagina={page}")
+        return self.parser._parse_catalog(response.text, category)
+
+
+async def _drive(fetch, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await fetch("Maquillaje", i % 5 + 1)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - started
+
+
+async def run(total, concurrency, latency):
+    results = {}
+    with run_stub_server(latency=latency) as (base_url, _):
+        blocking = BlockingCatalogClient(base_url)
+        blocking.login()
+        elapsed = await _drive(blocking.get_catalog, total, concurrency)
+        results["blocking_requests"] = {"seconds": elapsed, "req_per_s": total / elapsed}
+
+        service = BelcorpService("bench", "bench", base_url=base_url)
+        await service.login()
+        elapsed = await _drive(service.get_catalog, total, concurrency)
+        await service.aclose()
+        results["async_httpx"] = {"seconds": elapsed, "req_per_s": total / elapsed}
+
+    results["speedup"] = results["async_httpx"]["req_per_s"] / results["blocking_requests"]["req_per_s"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia inyectada por petición (s)")
+    args = parser.parse_args()
+    results = asyncio.run(run(args.requests, args.concurrency, args.latency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Throughput de la API según la cantidad de workers de uvicorn.
+
+Para cada N de ``--workers`` levanta la app con N procesos (con N > 1
+comparten cookies upstream, caché de catálogo y rate limit por
+``SHARED_STATE_URL``, sqlite local por defecto), la ataca con un escenario de
+bench_load contra el stub con el HTML capturado y reporta throughput, p95,
+llamadas al upstream por request, logins upstream y la aceleración respecto
+del primer N. Con el estado compartido los logins y las llamadas al
+upstream no deberían crecer con N.
+
+Cada corrida arranca con los sqlite vacíos. El cliente de carga también
+consume CPU: para ver el escalado hay que darle núcleos propios (p.ej.
+``taskset``) o correrlo desde otra máquina.
+
+Uso:
+    python benchmarks/bench_workers.py --workers 1 2 4 --scenario products --requests 2000 --concurrency 64
+    python benchmarks/bench_workers.py --workers 1 4 --shared-state redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import _bootstrap  # noqa: F401
+
+from bench_load import SCENARIOS, AppServer, configure_environment, drive, git_revision
+from stub_upstream import FIXTURES_DIR, run_stub_server
+
+if __name__ == "__mp_main__":
+    # Los workers de uvicorn vuelven a importar este script: sin logs por request
+    logging.disable(logging.ERROR)
+
+
+def run_workers(workers, args, upstream_url, stub):
+    """Una corrida con ``workers`` procesos, en un directorio de trabajo limpio"""
+    workdir = tempfile.mkdtemp(prefix=f"bench-workers-{workers}-")
+    # La app monta static/ y guarda sus sqlite en data/ relativos al cwd
+    os.makedirs(os.path.join(workdir, "static"))
+    os.chdir(workdir)
+    configure_environment(upstream_url, args.cold)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if args.shared_state:
+        os.environ["SHARED_STATE_URL"] = args.shared_state
+
+    logins_before = stub.requests["/Login/Login"]
+    with AppServer(workers=workers) as server:
+        # Que todos los workers terminen de arrancar antes de medir
+        time.sleep(args.startup_wait)
+        result = asyncio.run(drive(server.base_url, args, stub))[args.scenarios[0]]
+    result["upstream_logins"] = stub.requests["/Login/Login"] - logins_before
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--scenario", choices=SCENARIOS, default="products")
+    parser.add_argument("--requests", type=int, default=1000, help="requests medidos por corrida")
+    parser.add_argument("--warmup", type=int, default=100, help="requests previos no medidos")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia inyectada por petición upstream (s)")
+    parser.add_argument("--distinct", type=int, default=200, help="ids de producto distintos")
+    parser.add_argument("--cold", action="store_true", help="sin cachés: cada request llega al upstream")
+    parser.add_argument("--shared-state", help="SHARED_STATE_URL (por defecto sqlite local)")
+    parser.add_argument("--startup-wait", type=float, default=2.0, help="segundos para que arranquen los workers")
+    parser.add_argument("--output", help="guardar el resultado JSON en este fichero")
+    args = parser.parse_args()
+    args.scenarios = [args.scenario]
+    output = os.path.abspath(args.output) if args.output else None
+
+    runs = {}
+    with run_stub_server(args.latency, fixtures_dir=FIXTURES_DIR) as (upstream_url, stub):
+        for workers in args.workers:
+            runs[workers] = run_workers(workers, args, upstream_url, stub)
+
+    base = runs[args.workers[0]]["throughput_rps"]
+    for workers, result in runs.items():
+        result["speedup"] = round(result["throughput_rps"] / base, 2) if base else None
+        latency = result["latency_ms"]
+        print(
+            f"workers {workers:<3} {result['throughput_rps']:8.1f} rps  x{result['speedup']:<5}"
+            f" p50 {latency['p50']:8.2f}  p95 {latency['p95']:8.2f} ms"
+            f"  upstream/req {result['upstream_calls_per_request']:.2f}"
+            f"  logins {result['upstream_logins']}  errors {result['errors']}"
+        )
+
+    if output:
+        report = {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "config": {
+                "scenario": args.scenario,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "concurrency": args.concurrency,
+                "latency": args.latency,
+                "cold": args.cold,
+                "shared_state": args.shared_state or "sqlite",
+            },
+            "workers": runs,
+        }
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
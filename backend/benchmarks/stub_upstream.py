@@ -0,0 +1,265 @@
+"""Servidor local que imita somosbelcorp.com para los benchmarks.
+
+Sirve /Login, /Login/Login, /Inicio, /Catalogo, /Catalogo/Categoria/<c> y
+/Producto/<id> con una latencia configurable y cuenta las peticiones por ruta.
+Por defecto genera HTML sintético; con ``fixtures_dir`` reproduce las páginas
+reales capturadas en benchmarks/fixtures/.
+"""
+import contextlib
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CATEGORIES = ["Maquillaje", "Fragancias", "Cuidado Personal", "Tratamiento Facial", "Accesorios"]
+PRODUCTS_PER_PAGE = 24
+PAGES_PER_CATEGORY = 5
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Página capturada que se sirve para cada ruta en modo fixtures
+FIXTURE_PAGES = {
+    "login": "login.html",
+    "inicio": "inicio.html",
+    "catalog": "catalogo.html",
+    "category": "catalogo_categoria.html",
+    "product": "producto.html",
+}
+
+
+def render_catalog(category, page):
+    """Generar el HTML de una página del catálogo"""
+    items = []
+    count = PRODUCTS_PER_PAGE if page <= PAGES_PER_CATEGORY else 0
+    for i in range(count):
+        product_id = f"{(category or 'general')[:3].upper()}{page:02d}{i:03d}"
+        items.append(
+            f'<div class="producto" data-id="{product_id}">'
+            f'<img src="https://cdn.example.com/img/{product_id}.jpg" alt="">'
+            f'<h3 class="nombre">Producto {product_id}</h3>'
+            f'<span class="precio">$ {10 + i},{page}0</span>'
+            f'</div>'
+        )
+    menu = "".join(f'<li><a href="/Catalogo/Categoria/{c}">{c}</a></li>' for c in CATEGORIES)
+    return (
+        "<html><head><title>Catálogo</title></head><body>"
+        f'<ul class="menu-categorias">{menu}</ul>'
+        f'<div class="listado">{"".join(items)}</div>'
+        "</body></html>"
+    )
+
+
+def render_product(product_id):
+    """Generar el HTML de la página de un producto"""
+    return (
+        "<html><body>"
+        f'<h1 class="nombre-producto">Producto {product_id}</h1>'
+        f'<div class="descripcion-producto">Descripción de {product_id}</div>'
+        f'<span class="precio-producto">$ 25,90</span>'
+        f'<img class="imagen-producto" src="https://cdn.example.com/img/{product_id}.jpg">'
+        f'<span class="sku-producto">SKU-{product_id}</span>'
+        "</body></html>"
+    )
+
+
+class StubUpstream:
+    """Estado compartido del servidor stub"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, fixtures_dir: Optional[str] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.fixtures = None
+        if fixtures_dir:
+            self.fixtures = {}
+            for name, filename in FIXTURE_PAGES.items():
+                with open(os.path.join(fixtures_dir, filename), encoding="utf-8") as f:
+                    self.fixtures[name] = f.read()
+        self.requests = Counter()
+        self.sessions = set()
+        # .ASPXAUTH -> cuenta, para ver cómo se reparte la carga entre cuentas
+        self.accounts = {}
+        self.account_requests = Counter()
+        # Cuentas cuyo login se rechaza (credenciales inválidas)
+        self.rejected_accounts = set()
+        # Contraseña de cada cuenta; las que no figuran aceptan cualquiera no vacía
+        self.passwords = {}
+        # Inyección de fallos: si se fija, todas las respuestas usan este status
+        self.fail_status = None
+        self.retry_after = None
+        # Si se activa, las páginas llevan ETag y se responde 304 a If-None-Match
+        self.etags = False
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Latencia inyectada: fija más un jitter uniforme"""
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def page(self, name, synthetic):
+        """HTML capturado si estamos en modo fixtures, si no el sintético"""
+        if self.fixtures is not None:
+            return self.fixtures[name]
+        return synthetic()
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] += 1
+
+    def count_account(self, account):
+        with self._lock:
+            self.account_requests[account] += 1
+
+    def route(self, handler):
+        path = urlsplit(handler.path).path
+        if path.startswith("/Catalogo"):
+            return "catalog"
+        if path.startswith("/Producto/"):
+            return "product"
+        return path
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _authenticated(self):
+            cookie = self.headers.get("Cookie", "")
+            for part in cookie.split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == ".ASPXAUTH" and value in state.sessions:
+                    state.count_account(state.accounts.get(value))
+                    return True
+            return False
+
+        def _send(self, status, body="", headers=None):
+            data = body.encode("utf-8")
+            if state.etags and status == 200 and self.command == "GET":
+                etag = '"' + hashlib.md5(data).hexdigest() + '"'
+                headers = dict(headers or {}, ETag=etag)
+                if self.headers.get("If-None-Match") == etag:
+                    status, data = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _redirect(self, location, headers=None):
+            headers = dict(headers or {})
+            headers["Location"] = location
+            self._send(302, "", headers)
+
+        def _inject_failure(self):
+            if state.fail_status is None:
+                return False
+            headers = {"Retry-After": str(state.retry_after)} if state.retry_after is not None else None
+            self._send(state.fail_status, "unavailable", headers)
+            return True
+
+        def do_GET(self):
+            state.count(state.route(self))
+            state.delay()
+            if self._inject_failure():
+                return
+            url = urlsplit(self.path)
+            path = url.path
+            if path == "/Login":
+                return self._send(200, state.page(
+                    "login", lambda: '<form><input name="__RequestVerificationToken" value="tok"></form>'
+                ))
+            if not self._authenticated():
+                return self._redirect("/Login")
+            if path == "/Inicio":
+                return self._send(200, state.page("inicio", lambda: "<html><body>Inicio</body></html>"))
+            if path.startswith("/Catalogo"):
+                category = None
+                if path.startswith("/Catalogo/Categoria/"):
+                    category = path[len("/Catalogo/Categoria/"):]
+                page = int(parse_qs(url.query).get("pagina", ["1"])[0])
+                return self._send(200, state.page(
+                    "category" if category else "catalog", lambda: render_catalog(category, page)
+                ))
+            if path.startswith("/Producto/"):
+                product_id = path[len("/Producto/"):]
+                return self._send(200, state.page("product", lambda: render_product(product_id)))
+            return self._send(404, "not found")
+
+        def do_POST(self):
+            state.count(state.route(self))
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            state.delay()
+            if self._inject_failure():
+                return
+            if urlsplit(self.path).path == "/Login/Login":
+                account = form.get("CodigoUsuario", [""])[0]
+                password = form.get("ClaveSecreta", [""])[0]
+                if (
+                    account in state.rejected_accounts
+                    or not password
+                    or state.passwords.get(account, password) != password
+                ):
+                    return self._redirect("/Login?error=1")
+                token = uuid.uuid4().hex
+                state.sessions.add(token)
+                state.accounts[token] = account
+                return self._redirect(
+                    "/Inicio",
+                    {"Set-Cookie": f".ASPXAUTH={token}; Path=/; HttpOnly"},
+                )
+            return self._send(404, "not found")
+
+    return Handler
+
+
+@contextlib.contextmanager
+def run_stub_server(
+    latency: float = 0.0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    jitter: float = 0.0,
+    fixtures_dir: Optional[str] = None,
+):
+    """Levantar el stub en un hilo y devolver (base_url, estado)"""
+    state = StubUpstream(latency=latency, jitter=jitter, fixtures_dir=fixtures_dir)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fixtures", action="store_true", help="servir el HTML capturado en fixtures/")
+    args = parser.parse_args()
+    fixtures_dir = FIXTURES_DIR if args.fixtures else None
+    with run_stub_server(args.latency, port=args.port, jitter=args.jitter, fixtures_dir=fixtures_dir) as (base_url, _):
+        print(f"Stub upstream listening on {base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
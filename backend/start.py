@@ -1,7 +1,48 @@
+"""Entrypoint de producción: sirve ``app.main:app`` con ``WEB_CONCURRENCY`` workers.
+
+Con más de un worker el estado se comparte por ``SHARED_STATE_URL`` (sqlite
+local por defecto). Para probar el modo multi-worker en local:
+
+    cd backend
+    WEB_CONCURRENCY=2 SHARED_STATE_URL=sqlite:///data/shared_state.sqlite3 PORT=8000 python start.py
+    curl http://127.0.0.1:8000/healthz
+
+tests/test_start.py hace lo mismo de forma automática.
+"""
+import importlib.machinery
+import importlib.util
 import os
+import sys
+
 import uvicorn
-from main import app
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_app_package():
+    """Registrar ``backend/app/`` como el paquete ``app``.
+
+    ``backend/app.py`` (la API legada) tapa al paquete cuando ``backend`` está
+    en ``sys.path``; mismo arreglo que ``benchmarks/_bootstrap.py``.
+    """
+    module = sys.modules.get("app")
+    if module is not None and hasattr(module, "__path__"):
+        return module
+    spec = importlib.machinery.ModuleSpec("app", None, is_package=True)
+    spec.submodule_search_locations = [os.path.join(BACKEND_DIR, "app")]
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    return module
+
+
+# A nivel de módulo: cada worker de uvicorn vuelve a importar este script
+load_app_package()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # WEB_CONCURRENCY > 1: several worker processes sharing state through SHARED_STATE_URL
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # app.main mounts ./static and keeps its sqlite files under ./data
+    os.makedirs("static", exist_ok=True)
+    # Workers import the app by name in each process
+    uvicorn.run("app.main:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# start.py registra backend/app/ como el paquete ``app`` (backend/app.py lo tapa)
+import start  # noqa: E402,F401
+# Sin rate limit por host contra el stub local
+import _bootstrap  # noqa: E402,F401
+
+from stub_upstream import run_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """Stub de somosbelcorp.com con HTML sintético: (base_url, estado)"""
+    with run_stub_server() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def fresh_resilience(monkeypatch):
+    """Breakers y rate limits por host nuevos en cada test"""
+    from app.core import resilience
+    monkeypatch.setattr(resilience, "_resilience", None)
+
+
+@pytest.fixture
+def api_settings():
+    """Ajustes extra de app.main para ``api``; un test los cambia con parametrize("api_settings", ...)"""
+    return {}
+
+
+@pytest.fixture
+def api(stub, api_settings, tmp_path, monkeypatch):
+    """La API (app.main) contra el stub, con sus sqlite en un directorio propio: (client, main, estado del stub)"""
+    from fastapi.testclient import TestClient
+
+    # app.main monta ./static al importarse y guarda sus sqlite en ./data
+    (tmp_path / "static").mkdir()
+    monkeypatch.chdir(tmp_path)
+    import app.main as main
+
+    base_url, state = stub
+    for name, value in {
+        "BELCORP_USERNAME": "service",
+        "BELCORP_PASSWORD": "secret",
+        "BELCORP_BASE_URL": base_url,
+        "CRAWLER_ENABLED": False,
+        **api_settings,
+    }.items():
+        monkeypatch.setattr(main.settings, name, value)
+    main.rendered_responses.clear()
+    with TestClient(main.app) as client:
+        yield client, main, state
+
+
+def auth_headers(subject: str = "consultora@example.com"):
+    from app.core.security import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': subject})}"}
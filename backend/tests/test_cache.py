@@ -0,0 +1,109 @@
+import asyncio
+
+from app.services.cache import CacheEntry, CacheStats, SqliteCacheTier, TieredCache
+
+
+class Loader:
+    """Loader de prueba que devuelve ``values`` en orden y cuenta las llamadas"""
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.values.pop(0)
+
+
+def test_fresh_value_is_served_without_loading():
+    async def scenario():
+        cache = TieredCache(stale_ttl=10)
+        loader = Loader(["a"], ["b"])
+        assert await cache.get_or_load("k", loader, ttl=60) == ["a"]
+        assert await cache.get_or_load("k", loader, ttl=60) == ["a"]
+        assert loader.calls == 1
+        assert cache.stats.hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_value_is_served_and_revalidated_in_background():
+    async def scenario():
+        cache = TieredCache(stale_ttl=10)
+        loader = Loader(["new"])
+        cache.set("k", ["old"], ttl=-1)  # vencido, pero dentro de stale_ttl
+
+        assert await cache.get_or_load("k", loader, ttl=60) == ["old"]
+        assert cache.stats.stale_hits == 1
+        # Un segundo pedido durante la recarga no lanza otra
+        assert await cache.get_or_load("k", loader, ttl=60) == ["old"]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert loader.calls == 1
+        assert cache.stats.refreshes == 1
+        assert cache.get("k") == ["new"]
+
+    asyncio.run(scenario())
+
+
+def test_failed_reload_serves_last_known_value_during_outage():
+    async def scenario():
+        cache = TieredCache(stale_ttl=0, outage_ttl=60)
+        cache.set("k", ["old"], ttl=-1)  # fuera de la ventana stale
+
+        assert await cache.get_or_load("k", Loader([]), ttl=60) == ["old"]
+        assert cache.stats.outage_hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_empty_results_are_not_cached():
+    async def scenario():
+        cache = TieredCache()
+        loader = Loader([], ["a"])
+        assert await cache.get_or_load("k", loader, ttl=60) == []
+        assert await cache.get_or_load("k", loader, ttl=60) == ["a"]
+        assert loader.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = TieredCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats.evictions == 1
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TieredCache(disk_path=path)
+    cache.set("k", {"id": "P1"}, ttl=60)
+    cache.close()
+
+    restarted = TieredCache(disk_path=path)
+    assert restarted.get("k") == {"id": "P1"}
+    assert restarted.stats.disk_hits == 1
+    assert len(restarted.memory) == 1
+
+
+def test_sqlite_tier_prunes_expired_then_soonest_to_expire(tmp_path):
+    stats = CacheStats()
+    tier = SqliteCacheTier(str(tmp_path / "cache.sqlite3"), max_entries=3, stats=stats)
+    tier.PRUNE_EVERY = 5
+    tier.set("expired", CacheEntry("x", 0, 1))
+    for number in range(4):
+        tier.set(f"k{number}", CacheEntry(number, 1e12 + number, 1e12 + number))
+
+    count = tier._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    assert count == 3
+    assert tier.get("expired", 2) is None
+    assert tier.get("k0", 2) is None
+    assert tier.get("k3", 2).value == 3
+    assert stats.evictions == 1
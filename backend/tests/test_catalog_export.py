@@ -0,0 +1,98 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+
+from app.services.catalog_export import ExportCursor, export_catalog
+from conftest import auth_headers
+
+PAGES = {
+    page: [
+        {"id": f"P{page}{i}", "name": f"Producto {page}{i}", "price": 10.0 + i, "category": "general"}
+        for i in range(3)
+    ]
+    for page in range(1, 4)
+}
+
+
+class FakeCatalog:
+    """Catálogo en memoria de tres páginas de tres productos; registra qué páginas se pidieron"""
+
+    def __init__(self):
+        self.fetched = []
+
+    async def __call__(self, page: int):
+        self.fetched.append(page)
+        await asyncio.sleep(0)
+        return PAGES.get(page, [])
+
+
+def export_lines(cursor: ExportCursor, export_format="ndjson", catalog=None):
+    async def scenario():
+        chunks = [
+            chunk async for chunk in export_catalog(
+                catalog or FakeCatalog(), export_format, cursor, concurrency=2, max_pages=10
+            )
+        ]
+        return b"".join(chunks).decode().splitlines()
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("value,expected", [(None, (1, 0)), ("", (1, 0)), ("3", (3, 0)), ("2.5", (2, 5))])
+def test_cursor_parse(value, expected):
+    assert ExportCursor.parse(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0.1", "1.-1", "a.b", "2.x"])
+def test_invalid_cursor(value):
+    with pytest.raises(ValueError):
+        ExportCursor.parse(value)
+
+
+def test_resuming_from_any_cursor_yields_exactly_the_rest():
+    full = [json.loads(line) for line in export_lines(ExportCursor(1, 0))]
+    assert [record["id"] for record in full] == [p["id"] for page in PAGES.values() for p in page]
+    # Cursor de la última línea de una página: la siguiente arranca en la página que sigue
+    assert full[2]["cursor"] == "1.3"
+
+    for index, record in enumerate(full):
+        resumed = [json.loads(line) for line in export_lines(ExportCursor.parse(record["cursor"]))]
+        assert resumed == full[index + 1:]
+
+
+def test_csv_resume_keeps_the_header():
+    full = list(csv.DictReader(io.StringIO("\n".join(export_lines(ExportCursor(1, 0), "csv")))))
+    resumed = list(csv.DictReader(io.StringIO("\n".join(export_lines(ExportCursor.parse(full[4]["cursor"]), "csv")))))
+
+    assert [row["id"] for row in resumed] == [row["id"] for row in full[5:]]
+
+
+def test_pages_are_fetched_ahead_only_up_to_concurrency():
+    catalog = FakeCatalog()
+
+    async def scenario():
+        body = export_catalog(catalog, "ndjson", ExportCursor(1, 0), concurrency=2, max_pages=10)
+        await body.__anext__()
+        fetched_after_first_page = list(catalog.fetched)
+        await body.aclose()
+        return fetched_after_first_page
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_export_endpoint_resumes_from_cursor(api):
+    client, _, _ = api
+    headers = auth_headers()
+
+    full = client.get("/api/products/export?category=Maquillaje", headers=headers)
+    assert full.status_code == 200
+    assert full.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in full.text.splitlines()]
+    middle = records[len(records) // 2]
+
+    resumed = client.get(f"/api/products/export?category=Maquillaje&cursor={middle['cursor']}", headers=headers)
+    assert [json.loads(line) for line in resumed.text.splitlines()] == records[len(records) // 2 + 1:]
+    assert client.get("/api/products/export?cursor=0.0", headers=headers).status_code == 400
@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+
+import stub_upstream
+from app.services.belcorp_service import BelcorpService
+from app.services.change_detection import PageValidators, diff_products
+
+
+def product(product_id, price, name=None):
+    return {"id": product_id, "name": name or f"Producto {product_id}", "price": price}
+
+
+def test_diff_classifies_added_removed_repriced_and_updated():
+    previous = [product("A", 10), product("B", 20), product("C", 30)]
+    current = [product("A", 10), product("B", 25), product("C", 30, "Nuevo nombre"), product("D", 40)]
+
+    diff = diff_products("catalog", "/Catalogo", previous, current)
+
+    assert [p["id"] for p in diff.added] == ["D"]
+    assert [p["id"] for p in diff.repriced] == ["B"]
+    assert [p["id"] for p in diff.updated] == ["C"]
+    assert diff.removed == []
+    assert [p["id"] for p in diff.changed_products] == ["D", "B", "C"]
+    assert diff_products("catalog", "/Catalogo", previous, previous[:2]).removed == ["C"]
+    assert not diff_products("catalog", "/Catalogo", previous, list(reversed(previous)))
+
+
+def test_validators_send_conditional_headers_and_are_bounded():
+    validators = PageValidators(max_entries=2)
+    response = httpx.Response(200, headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    for url in ("/a", "/b", "/c"):
+        validators.put(url, response, "digest", [])
+
+    assert validators.get("/a") is None
+    assert len(validators) == 2
+    assert validators.conditional_headers(validators.get("/c")) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert validators.conditional_headers(None) == {}
+
+    disabled = PageValidators(max_entries=0)
+    disabled.put("/a", response, "digest", [])
+    assert len(disabled) == 0
+
+
+def fetch_twice(base_url, between=None):
+    """Dos descargas de la misma página; devuelve (resultados, validadores, diffs avisados)"""
+
+    async def scenario():
+        service = BelcorpService(username="u", password="p", base_url=base_url)
+        diffs = []
+        service.change_listeners.append(diffs.append)
+        try:
+            first = await service.get_catalog(page=1)
+            if between:
+                between()
+            second = await service.get_catalog(page=1)
+        finally:
+            await service.aclose()
+        return (first, second), service.validators.snapshot(), diffs
+
+    return asyncio.run(scenario())
+
+
+def test_not_modified_page_reuses_the_parsed_result(stub):
+    base_url, state = stub
+    state.etags = True
+
+    (first, second), validators, diffs = fetch_twice(base_url)
+
+    assert first and second == first
+    assert (validators["new"], validators["not_modified"], validators["changed"]) == (1, 1, 0)
+    assert diffs == []
+
+
+def test_identical_body_without_validators_is_not_parsed_again(stub):
+    base_url, state = stub
+    (first, second), validators, diffs = fetch_twice(base_url)
+
+    assert second == first
+    assert (validators["new"], validators["unchanged"], validators["changed"]) == (1, 1, 0)
+    assert diffs == []
+
+
+def test_changed_page_reports_only_what_changed(stub, monkeypatch):
+    base_url, state = stub
+    state.etags = True
+    page = stub_upstream.render_catalog(None, 1)
+    first_item = page.index('<div class="producto"')
+    second_item = page.index('<div class="producto"', first_item + 1)
+    third_item = page.index('<div class="producto"', second_item + 1)
+    # El primero cambia de precio y el segundo desaparece
+    changed = page[:first_item] + page[first_item:second_item].replace("$ 10,10", "$ 99,10") + page[third_item:]
+
+    def reprice_and_drop_one():
+        monkeypatch.setattr(stub_upstream, "render_catalog", lambda category, number: changed)
+
+    (first, second), validators, diffs = fetch_twice(base_url, reprice_and_drop_one)
+
+    assert validators["changed"] == 1
+    [diff] = diffs
+    assert [p["id"] for p in diff.repriced] == [first[0]["id"]]
+    assert diff.removed == [first[1]["id"]]
+    assert diff.added == diff.updated == []
+    assert len(second) == len(first) - 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.core.resilience import get_resilience
+from app.services.belcorp_service import BelcorpService, UpstreamFetchError
+from app.services.crawler import CatalogCrawler
+from app.services.product_store import ProductStore
+from stub_upstream import CATEGORIES, PAGES_PER_CATEGORY
+
+
+def make_crawler(base_url, tmp_path):
+    service = BelcorpService(username="crawler", password="secret", base_url=base_url)
+    store = ProductStore(str(tmp_path / "products.sqlite3"))
+    crawler = CatalogCrawler(service, store, interval=3600, concurrency=2, delay=0, max_pages=10, fetch_details=False)
+    return crawler, service, store
+
+
+def test_get_catalog_strict_distinguishes_failure_from_empty_page(stub):
+    base_url, state = stub
+
+    async def scenario():
+        service = BelcorpService(username="u", password="p", base_url=base_url)
+        try:
+            assert await service.get_catalog(page=PAGES_PER_CATEGORY + 1, strict=True) == []
+            state.fail_status = 503
+            assert await service.get_catalog(page=1) == []
+            with pytest.raises(UpstreamFetchError):
+                await service.get_catalog(page=1, strict=True)
+        finally:
+            await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_crawl_stores_every_page_and_stops_at_first_empty_one(stub, tmp_path):
+    base_url, _ = stub
+
+    async def scenario():
+        crawler, service, store = make_crawler(base_url, tmp_path)
+        try:
+            await crawler.crawl_once()
+        finally:
+            await service.aclose()
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.get_categories() == CATEGORIES
+    for category in [None] + CATEGORIES:
+        assert len(store.get_page(category, PAGES_PER_CATEGORY)) == 24
+        assert store.get_page(category, PAGES_PER_CATEGORY + 1) is None
+    assert store.get_state("run")["finished_at"] is not None
+
+
+def test_upstream_outage_keeps_stored_catalog_and_resumes(stub, tmp_path):
+    base_url, state = stub
+
+    async def scenario():
+        crawler, service, store = make_crawler(base_url, tmp_path)
+        try:
+            await crawler.crawl_once()
+            # Pasada siguiente con el upstream caído
+            store.set_state("run", {"started_at": 0, "finished_at": None})
+            store.set_state("progress", {})
+            state.fail_status = 503
+            with pytest.raises(UpstreamFetchError):
+                await crawler.crawl_once()
+
+            assert len(store.get_page(None, 1)) == 24
+            assert len(store.get_page("Maquillaje", PAGES_PER_CATEGORY)) == 24
+            # Sin progreso guardado para las categorías: se retoman desde la página 1
+            assert not any(entry["done"] for entry in store.get_state("progress").values())
+            assert store.get_state("run")["finished_at"] is None
+
+            # Vuelve el upstream: la pasada abierta se retoma y termina
+            state.fail_status = None
+            get_resilience()._hosts.clear()
+            await crawler.crawl_once()
+            assert store.get_state("run")["finished_at"] is not None
+            assert all(entry["done"] for entry in store.get_state("progress").values())
+        finally:
+            await service.aclose()
+
+    asyncio.run(scenario())
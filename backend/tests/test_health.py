@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+WARM_UP = {"WARMUP_ENABLED": True, "WARMUP_CATALOG_PAGES": 2, "WARMUP_TIMEOUT": 30}
+
+
+@pytest.fixture
+def slow_upstream(stub):
+    """Upstream lento: el warm-up tarda lo suficiente para ver /readyz antes de que termine"""
+    stub[1].latency = 0.2
+    return stub
+
+
+def wait_until_ready(client, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/readyz")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.05)
+    raise AssertionError("/readyz never reported ready")
+
+
+def test_ready_right_away_without_warm_up(api):
+    client, _, _ = api
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert response.json()["warm_up"]["enabled"] is False
+
+
+@pytest.mark.parametrize("api_settings", [WARM_UP])
+def test_not_ready_until_warm_up_finishes(slow_upstream, api):
+    client, _, state = api
+
+    warming = client.get("/readyz")
+    assert warming.status_code == 503
+    assert warming.json()["status"] == "warming_up"
+    # Liveness no depende del warm-up
+    assert client.get("/healthz").status_code == 200
+
+    ready = wait_until_ready(client).json()
+    assert ready["status"] == "ready"
+    assert ready["warm_up"]["ok"] is True
+    assert ready["warm_up"]["seconds"] > 0
+    assert state.requests["/Login/Login"] >= 1
+    # Categorías (portada del catálogo) y las dos primeras páginas
+    assert state.requests["catalog"] >= 2
+
+
+@pytest.mark.parametrize("api_settings", [{**WARM_UP, "WARMUP_TIMEOUT": 0.1}])
+def test_ready_after_warm_up_timeout_even_if_upstream_is_slow(slow_upstream, api):
+    client, _, _ = api
+
+    ready = wait_until_ready(client, timeout=5).json()
+    assert ready["warm_up"]["done"] is True
+    assert ready["warm_up"]["ok"] is False
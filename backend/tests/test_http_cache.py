@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import auth_headers
+
+
+@pytest.mark.parametrize("path", ["/api/products?category=Maquillaje&page=1", "/api/products/P1", "/api/categories"])
+def test_catalog_endpoint_answers_304_to_matching_if_none_match(api, path):
+    client, main, state = api
+    headers = auth_headers()
+
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("private, max-age=")
+
+    upstream_requests = sum(state.requests.values())
+    revalidated = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    # Revalidar no vuelve a scrapear: sale del caché de respuestas renderizadas
+    assert sum(state.requests.values()) == upstream_requests
+
+
+def test_stale_or_weak_etags(api):
+    client, main, _ = api
+    headers = auth_headers()
+    etag = client.get("/api/categories", headers=headers).headers["etag"]
+
+    assert client.get("/api/categories", headers={**headers, "If-None-Match": '"other"'}).status_code == 200
+    assert client.get("/api/categories", headers={**headers, "If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/api/categories", headers={**headers, "If-None-Match": "*"}).status_code == 304
+
+
+def test_changed_product_gets_a_new_etag(api):
+    client, main, _ = api
+    headers = auth_headers()
+    etag = client.get("/api/products/P1", headers=headers).headers["etag"]
+
+    # Un cambio detectado upstream descarta la respuesta renderizada
+    main.rendered_responses.discard("product:P1")
+    main.product_store.upsert_products([{
+        "id": "P1", "name": "Producto P1 (nuevo)", "description": "", "price": 30.0,
+        "image_url": None, "category": "general", "stock": 1, "sku": None,
+    }], with_details=True)
+
+    response = client.get("/api/products/P1", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["name"] == "Producto P1 (nuevo)"
+
+
+def test_large_listing_is_compressed(api):
+    client, _, _ = api
+    response = client.get("/api/products?page=1", headers={**auth_headers(), "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") in ("gzip", "br")
@@ -0,0 +1,125 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+
+from app.services import image_cache
+from app.services.image_cache import ImageProxy, ImageStore
+from conftest import auth_headers
+
+IMAGE_URL = "https://cdn.example.com/img/P1.jpg"
+
+
+def make_image(color: str, size=(800, 600)) -> bytes:
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, "JPEG")
+    return output.getvalue()
+
+
+class FakeCDN:
+    """CDN de imágenes en memoria: sirve ``body`` y cuenta las descargas"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.downloads = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.downloads += 1
+        return httpx.Response(200, content=self.body, headers={"Content-Type": "image/jpeg"})
+
+
+def make_proxy(tmp_path, cdn: FakeCDN, **options) -> ImageProxy:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(cdn))
+    return ImageProxy(ImageStore(str(tmp_path / "images"), 10 * 1024 * 1024), "secret", client=client, **options)
+
+
+def test_proxied_urls_are_absolute_without_a_configured_base_url(api):
+    client, main, _ = api
+    assert main.settings.IMAGE_PROXY_BASE_URL == ""
+
+    products = client.get("/api/products?page=1", headers=auth_headers()).json()
+    product = client.get("/api/products/P1", headers=auth_headers()).json()
+
+    assert products[0]["image_url"].startswith("http://testserver/api/images/")
+    assert products[0]["image_url"].endswith("?w=320")
+    assert product["image_url"].startswith("http://testserver/api/images/")
+
+
+def test_configured_base_url_wins_and_cached_bodies_are_per_origin(api, monkeypatch):
+    client, main, _ = api
+    other_host = {**auth_headers(), "Host": "evil.example"}
+
+    spoofed = client.get("/api/products/P1", headers=other_host).json()
+    honest = client.get("/api/products/P1", headers=auth_headers()).json()
+    # El cuerpo renderizado para un Host no se le sirve a otro
+    assert spoofed["image_url"].startswith("http://evil.example/api/images/")
+    assert honest["image_url"].startswith("http://testserver/api/images/")
+
+    monkeypatch.setattr(main.settings, "IMAGE_PROXY_BASE_URL", "https://api.example.com/")
+    main.rendered_responses.discard("product:P1")
+    product = client.get("/api/products/P1", headers=other_host).json()
+    assert product["image_url"].startswith("https://api.example.com/api/images/")
+
+
+def test_original_is_downloaded_once(tmp_path):
+    cdn = FakeCDN(make_image("red"))
+    proxy = make_proxy(tmp_path, cdn)
+    key = proxy.key_for(IMAGE_URL)
+
+    async def scenario():
+        images = await asyncio.gather(*(proxy.get(key) for _ in range(5)))
+        await proxy.aclose()
+        return images
+
+    images = asyncio.run(scenario())
+    assert cdn.downloads == 1
+    assert {image.body for image in images} == {cdn.body}
+    assert images[0].content_type == "image/jpeg"
+
+
+def test_evicted_original_is_stored_under_the_hash_of_what_was_refetched(tmp_path):
+    cdn = FakeCDN(make_image("red"))
+    proxy = make_proxy(tmp_path, cdn)
+    key = proxy.key_for(IMAGE_URL)
+
+    async def scenario():
+        old = await proxy.get(key)
+        # Se desaloja el original y upstream cambia la imagen detrás de la misma URL
+        proxy.store.max_bytes, limit = 0, proxy.store.max_bytes
+        proxy.store.write("filler", b"x")
+        proxy.store.max_bytes = limit
+        cdn.body = make_image("blue")
+        new = await proxy.get(key)
+        again = await proxy.get(key)
+        await proxy.aclose()
+        return old, new, again
+
+    old, new, again = asyncio.run(scenario())
+    assert new.body == cdn.body
+    assert new.etag != old.etag
+    # La URL apunta ahora al contenido nuevo: no se vuelve a bajar ni se mezcla con el viejo
+    assert again.body == cdn.body and again.etag == new.etag
+    assert cdn.downloads == 2
+
+
+@pytest.mark.skipif(not image_cache.PIL_AVAILABLE, reason="Pillow no está instalado")
+def test_thumbnail_is_snapped_to_a_fixed_width(tmp_path):
+    from PIL import Image
+
+    cdn = FakeCDN(make_image("red"))
+    proxy = make_proxy(tmp_path, cdn, widths=(160, 320))
+    key = proxy.key_for(IMAGE_URL)
+
+    async def scenario():
+        thumbnail = await proxy.get(key, 200)
+        await proxy.aclose()
+        return thumbnail
+
+    thumbnail = asyncio.run(scenario())
+    assert thumbnail.content_type == "image/webp"
+    assert thumbnail.etag.endswith('-320"')
+    with Image.open(io.BytesIO(thumbnail.body)) as image:
+        assert image.size == (320, 240)
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+
+from conftest import auth_headers
+
+
+def test_metrics_need_the_metrics_token(api, monkeypatch):
+    client, main, _ = api
+    monkeypatch.setattr(main.settings, "METRICS_TOKEN", "scraper-token")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+    # Un JWT de la API no sirve para /metrics
+    assert client.get("/metrics", headers=auth_headers()).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer scraper-token"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_metrics_without_token_only_answer_localhost(api):
+    client, main, _ = api
+
+    async def scrape(host):
+        transport = httpx.ASGITransport(app=main.app, client=(host, 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as local:
+            return (await local.get("/metrics")).status_code
+
+    assert client.get("/metrics").status_code == 401
+    assert asyncio.run(scrape("203.0.113.7")) == 401
+    assert asyncio.run(scrape("127.0.0.1")) == 200
@@ -0,0 +1,178 @@
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+
+from app.services.notification_outbox import NotificationOutbox, OutboxWorker
+from app.services.whatsapp_service import WhatsAppService
+
+
+class FakeGraphAPI:
+    """Graph API de WhatsApp en memoria: responde con los status de ``responses`` en orden"""
+
+    def __init__(self, *responses, delay: float = 0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.sent = Counter()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        status = self.responses.pop(0) if self.responses else 200
+        if status == 200:
+            self.sent[json.loads(request.content)["text"]["body"]] += 1
+        return httpx.Response(status, json={})
+
+
+def make_whatsapp(graph: FakeGraphAPI) -> WhatsAppService:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(graph))
+    whatsapp = WhatsAppService(client=client, base_url="http://graph.test/v17.0")
+    whatsapp.api_key = "test-token"
+    whatsapp.phone_number = "100200300"
+    return whatsapp
+
+
+def make_worker(outbox, graph, **options) -> OutboxWorker:
+    options.setdefault("rate_per_second", 1000)
+    options.setdefault("backoff_base", 0.01)
+    return OutboxWorker(outbox, make_whatsapp(graph), **options)
+
+
+def status_of(outbox: NotificationOutbox, message_id: int):
+    return outbox._conn.execute(
+        "SELECT status, attempts, last_error FROM outbox WHERE id = ?", (message_id,)
+    ).fetchone()
+
+
+def test_sends_due_message(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        graph = FakeGraphAPI(200)
+        worker = make_worker(outbox, graph)
+        message_id = await outbox.enqueue("51999888777", "hola")
+
+        assert await worker.process_due() == 1
+        assert graph.sent == {"hola": 1}
+        assert status_of(outbox, message_id) == ("sent", 1, None)
+        assert await outbox.depth() == {"pending": 0, "sent": 1, "failed": 0}
+
+    asyncio.run(scenario())
+
+
+def test_retryable_error_is_retried_after_backoff(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        graph = FakeGraphAPI(503, 429, 200)
+        worker = make_worker(outbox, graph, backoff_base=0.05)
+        message_id = await outbox.enqueue("51999888777", "hola")
+
+        await worker.process_due()
+        assert status_of(outbox, message_id) == ("pending", 1, "HTTP 503")
+        # Todavía en backoff: no se vuelve a reclamar
+        assert await worker.process_due() == 0
+        assert 0 < await outbox.seconds_until_next_due() <= 0.1
+
+        for _ in range(2):
+            await asyncio.sleep(await outbox.seconds_until_next_due())
+            await worker.process_due()
+
+        assert status_of(outbox, message_id) == ("sent", 3, None)
+        assert (worker.sent, worker.retried, worker.failed) == (1, 2, 0)
+
+    asyncio.run(scenario())
+
+
+def test_backoff_grows_exponentially_up_to_cap(tmp_path):
+    outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+    worker = make_worker(outbox, FakeGraphAPI(), backoff_base=2.0, backoff_max=10.0)
+
+    assert 1.0 <= worker.backoff(0) <= 2.0
+    assert 4.0 <= worker.backoff(2) <= 8.0
+    assert 5.0 <= worker.backoff(10) <= 10.0
+
+
+def test_non_retryable_error_goes_to_dead_letter(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        worker = make_worker(outbox, FakeGraphAPI(400))
+        message_id = await outbox.enqueue("51999888777", "hola")
+
+        await worker.process_due()
+        assert status_of(outbox, message_id) == ("failed", 1, "HTTP 400")
+        assert await outbox.seconds_until_next_due() is None
+
+    asyncio.run(scenario())
+
+
+def test_retryable_error_goes_to_dead_letter_after_max_attempts(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        worker = make_worker(outbox, FakeGraphAPI(503, 503, 503), max_attempts=3)
+        message_id = await outbox.enqueue("51999888777", "hola")
+
+        while (await outbox.depth())["pending"]:
+            await asyncio.sleep(await outbox.seconds_until_next_due())
+            await worker.process_due()
+
+        assert status_of(outbox, message_id) == ("failed", 3, "HTTP 503")
+        assert (worker.retried, worker.failed) == (2, 1)
+
+    asyncio.run(scenario())
+
+
+def test_send_is_capped_by_send_timeout(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        worker = make_worker(outbox, FakeGraphAPI(delay=1.0), send_timeout=0.05)
+        message_id = await outbox.enqueue("51999888777", "hola")
+
+        await worker.process_due()
+        assert status_of(outbox, message_id) == ("pending", 1, "timed out after 0.05s")
+
+    asyncio.run(scenario())
+
+
+def test_batch_longer_than_lease_is_not_sent_twice_by_another_worker(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "outbox.sqlite3")
+        # Cada envío tarda 0.1 s; un lote de 6 dura más que el lease base de 0.2 s
+        graph = FakeGraphAPI(delay=0.1)
+        workers = [
+            make_worker(NotificationOutbox(path, lease_seconds=0.2), graph, batch_size=6, send_timeout=0.15)
+            for _ in range(2)
+        ]
+        for number in range(6):
+            await workers[0].outbox.enqueue("51999888777", f"pedido {number}")
+
+        async def drain(worker):
+            while (await worker.outbox.depth())["pending"]:
+                if not await worker.process_due():
+                    await asyncio.sleep(0.02)
+
+        await asyncio.wait_for(asyncio.gather(*(drain(worker) for worker in workers)), timeout=10)
+        assert graph.sent == {f"pedido {number}": 1 for number in range(6)}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_batch_releases_unsent_messages(tmp_path):
+    async def scenario():
+        outbox = NotificationOutbox(str(tmp_path / "outbox.sqlite3"))
+        worker = make_worker(outbox, FakeGraphAPI(), rate_per_second=1)
+        for number in range(3):
+            await outbox.enqueue("51999888777", f"pedido {number}")
+
+        task = asyncio.ensure_future(worker.process_due())
+        # El primero sale con el token inicial; el segundo espera al rate limit
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        assert (await outbox.depth())["sent"] == 1
+        assert len(await outbox.claim_due(10)) == 2
+
+    asyncio.run(scenario())
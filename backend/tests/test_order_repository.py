@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.models import CartItem, Order
+from app.services.order_repository import InMemoryOrderRepository, SqliteOrderRepository
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_order(number: int, phone: str = "51999888777", status: str = "pending") -> Order:
+    return Order(
+        id=f"order-{number:03d}",
+        created_at=START + timedelta(minutes=number // 2),  # de a pares con el mismo created_at
+        total=10,
+        status=status,
+        customer_name="Ana",
+        customer_phone=phone,
+        items=[CartItem(product_id="P1", quantity=1, price=10)],
+    )
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repository(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteOrderRepository(str(tmp_path / "orders.sqlite3"), flush_interval=0.01)
+    return InMemoryOrderRepository()
+
+
+async def all_pages(repository, **filters):
+    pages, cursor = [], None
+    while True:
+        orders, cursor = await repository.list_orders(cursor=cursor, **filters)
+        pages.append([order.id for order in orders])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pagination_walks_every_order_once_newest_first(repository):
+    async def scenario():
+        await repository.start()
+        await asyncio.gather(*(repository.save(make_order(number)) for number in range(25)))
+        pages = await all_pages(repository, limit=10)
+        await repository.close()
+        return pages
+
+    pages = asyncio.run(scenario())
+    assert [len(page) for page in pages] == [10, 10, 5]
+    # (created_at, id) descendente, también entre órdenes con el mismo created_at
+    assert sum(pages, []) == [f"order-{number:03d}" for number in reversed(range(25))]
+
+
+def test_filters_apply_across_pages(repository):
+    async def scenario():
+        await repository.start()
+        for number in range(12):
+            phone = "51999888777" if number % 3 else "51911122233"
+            status = "pending" if number % 2 else "delivered"
+            await repository.save(make_order(number, phone=phone, status=status))
+        by_phone = await all_pages(repository, customer_phone="51911122233", limit=2)
+        by_status = await all_pages(repository, status="delivered", limit=4)
+        await repository.close()
+        return by_phone, by_status
+
+    by_phone, by_status = asyncio.run(scenario())
+    assert sum(by_phone, []) == ["order-009", "order-006", "order-003", "order-000"]
+    assert sum(by_status, []) == [f"order-{number:03d}" for number in (10, 8, 6, 4, 2, 0)]
+
+
+def test_invalid_cursor_is_rejected(repository):
+    with pytest.raises(ValueError):
+        asyncio.run(repository.list_orders(cursor="not-a-cursor"))
+
+
+def test_concurrent_saves_are_group_committed(tmp_path):
+    path = str(tmp_path / "orders.sqlite3")
+
+    async def scenario():
+        repository = SqliteOrderRepository(path, batch_size=50, flush_interval=0.02)
+        await repository.start()
+        await asyncio.gather(*(repository.save(make_order(number)) for number in range(120)))
+        await repository.close()
+        return repository
+
+    repository = asyncio.run(scenario())
+    assert repository.orders_written == 120
+    # 120 órdenes juntas entran en lotes de a lo sumo 50: 3 commits, no 120
+    assert repository.batches_written == 3
+
+    async def reopen():
+        reopened = SqliteOrderRepository(path)
+        try:
+            return await reopened.get("order-042"), len(sum(await all_pages(reopened, limit=100), []))
+        finally:
+            await reopened.close()
+
+    order, count = asyncio.run(reopen())
+    assert order == make_order(42)
+    assert count == 120
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+
+import pytest
+from fastapi import Response
+
+from app.models.models import CartItem, OrderCreate
+from app.services.order_repository import InMemoryOrderRepository
+
+
+class FakeBelcorpService:
+    async def get_products_bulk(self, product_ids):
+        return {product_id: {"id": product_id} for product_id in product_ids}
+
+
+class RecordingOutbox:
+    def __init__(self):
+        self.messages = []
+
+    async def enqueue(self, recipient, body):
+        self.messages.append((recipient, body))
+        return len(self.messages)
+
+
+class BrokenOutbox:
+    async def enqueue(self, recipient, body):
+        raise OSError("disk I/O error")
+
+
+ORDER = OrderCreate(
+    customer_name="Ana",
+    customer_phone="51999888777",
+    items=[CartItem(product_id="P1", quantity=2, price=10)],
+)
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """app.main con upstream, repositorio y outbox de prueba"""
+    # app.main monta ./static al importarse
+    (tmp_path / "static").mkdir()
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module("app.main")
+    whatsapp = main.WhatsAppService(client=object())
+    whatsapp.api_key, whatsapp.phone_number = "test-token", "100200300"
+    monkeypatch.setattr(main, "belcorp_service", FakeBelcorpService())
+    monkeypatch.setattr(main, "order_repository", InMemoryOrderRepository())
+    monkeypatch.setattr(main, "notification_outbox", RecordingOutbox())
+    monkeypatch.setattr(main, "whatsapp_service", whatsapp)
+    monkeypatch.setattr(main, "idempotency_store", main.IdempotencyStore(100, 60))
+    return main
+
+
+def test_order_queues_whatsapp_notification(main):
+    order = asyncio.run(main.create_order(ORDER, Response(), "ana", None))
+
+    assert order.total == 20
+    assert main.notification_outbox.messages == [
+        ("51999888777", main.whatsapp_service.format_order_message(order))
+    ]
+
+
+def test_no_notification_queued_without_whatsapp_credentials(main):
+    main.whatsapp_service.api_key = None
+
+    order = asyncio.run(main.create_order(ORDER, Response(), "ana", None))
+
+    assert asyncio.run(main.order_repository.get(order.id)) == order
+    assert main.notification_outbox.messages == []
+
+
+def test_order_saved_when_notification_cannot_be_queued(main, monkeypatch):
+    monkeypatch.setattr(main, "notification_outbox", BrokenOutbox())
+
+    async def scenario():
+        first_response, retry_response = Response(), Response()
+        first = await main.create_order(ORDER, first_response, "ana", "key-1")
+        retry = await main.create_order(ORDER, retry_response, "ana", "key-1")
+        orders, _ = await main.order_repository.list_orders()
+        return first, retry, retry_response, orders
+
+    first, retry, retry_response, orders = asyncio.run(scenario())
+
+    assert retry.id == first.id
+    assert retry_response.headers["Idempotent-Replayed"] == "true"
+    assert [order.id for order in orders] == [first.id]
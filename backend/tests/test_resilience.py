@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+
+from app.core.config import Settings
+from app.core.resilience import CircuitBreaker, Resilience, ResilientTransport
+
+
+def make_transport(handler):
+    settings = Settings(
+        BREAKER_FAILURE_THRESHOLD=1,
+        BREAKER_RECOVERY_TIMEOUT=0,
+        BREAKER_HALF_OPEN_MAX_CALLS=1,
+        UPSTREAM_RATE_LIMIT=100,
+        WEB_CONCURRENCY=1,
+        SHARED_STATE_URL="",
+    )
+    resilience = Resilience(settings)
+    return ResilientTransport(httpx.MockTransport(handler), resilience), resilience
+
+
+def test_cancel_while_waiting_for_rate_limit_returns_half_open_probe():
+    async def scenario():
+        transport, resilience = make_transport(lambda request: httpx.Response(200))
+        guard = resilience.for_host("upstream.test")
+        guard.breaker.record_failure()
+        assert guard.breaker.state == CircuitBreaker.OPEN
+        # El probe queda esperando turno en el token bucket
+        guard.limiter.pause(60)
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            probe = asyncio.ensure_future(client.get("http://upstream.test/"))
+            await asyncio.sleep(0.05)
+            assert guard.breaker.state == CircuitBreaker.HALF_OPEN
+            probe.cancel()
+            try:
+                await probe
+            except asyncio.CancelledError:
+                pass
+
+            # El cupo de prueba volvió: el siguiente request sale y cierra el circuito
+            guard.limiter._paused_until = 0.0
+            response = await client.get("http://upstream.test/")
+
+        assert response.status_code == 200
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_server_error_during_half_open_probe_reopens_circuit():
+    async def scenario():
+        transport, resilience = make_transport(lambda request: httpx.Response(503))
+        guard = resilience.for_host("upstream.test")
+        guard.breaker.record_failure()
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("http://upstream.test/")
+
+        assert response.status_code == 503
+        assert guard.breaker.state == CircuitBreaker.OPEN
+
+    asyncio.run(scenario())
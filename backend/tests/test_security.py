@@ -0,0 +1,26 @@
+from app.core.security import JWT_BACKENDS, LazyJWTBackend, get_jwt_backend
+
+
+def test_auto_prefers_pyjwt():
+    assert get_jwt_backend('auto').name == 'pyjwt'
+    assert LazyJWTBackend('auto').name == 'pyjwt'
+
+
+def test_backends_are_interchangeable():
+    key = "k" * 32
+    for name in JWT_BACKENDS:
+        token = get_jwt_backend(name).encode({'sub': 'ana'}, key, 'HS256')
+        for other in JWT_BACKENDS:
+            assert get_jwt_backend(other).decode(token, key, ['HS256']) == {'sub': 'ana'}
+
+
+def test_token_requires_the_upstream_password(api):
+    client, _, state = api
+    state.passwords["ana"] = "correcta"
+
+    rejected = client.post("/api/token", data={"username": "ana", "password": "otra"})
+    accepted = client.post("/api/token", data={"username": "ana", "password": "correcta"})
+
+    assert rejected.status_code == 401
+    assert accepted.status_code == 200
+    assert accepted.json()["token_type"] == "bearer"
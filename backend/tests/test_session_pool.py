@@ -0,0 +1,111 @@
+import asyncio
+
+import httpx
+
+from app.services.html_parser import get_parser
+from app.services.session_pool import SessionPool, UpstreamSession
+
+
+def make_pool(base_url, accounts, **options) -> SessionPool:
+    parser = get_parser()
+    sessions = [
+        UpstreamSession(account, "secret", base_url, parser, client=httpx.AsyncClient(follow_redirects=True))
+        for account in accounts
+    ]
+    options.setdefault("keepalive_interval", 0)
+    return SessionPool(sessions, **options)
+
+
+def test_load_is_spread_across_accounts(stub):
+    base_url, state = stub
+
+    async def scenario():
+        pool = make_pool(base_url, ["ana", "bea", "carla"], strategy="round_robin")
+        for _ in range(9):
+            assert (await pool.get(f"{base_url}/Inicio")).status_code == 200
+        await pool.aclose()
+
+    asyncio.run(scenario())
+    # Tres GET cada una, más la redirección a /Inicio de su login
+    assert state.account_requests == {"ana": 3 + 1, "bea": 3 + 1, "carla": 3 + 1}
+
+
+def test_rejected_account_is_quarantined_and_request_rotates(stub):
+    base_url, state = stub
+    state.rejected_accounts.add("ana")
+
+    async def scenario():
+        pool = make_pool(base_url, ["ana", "bea"], strategy="round_robin")
+        for _ in range(4):
+            assert (await pool.get(f"{base_url}/Inicio")).status_code == 200
+        snapshot = {session["account"]: session for session in pool.snapshot()["sessions"]}
+        await pool.aclose()
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    assert state.account_requests == {"bea": 4 + 1}
+    # Un solo login fallido: en cuarentena ya no se le vuelve a pedir nada
+    assert snapshot["ana"]["login_failures"] == 1
+    assert snapshot["ana"]["quarantined_for_seconds"] > 0
+    assert snapshot["bea"]["quarantined_for_seconds"] == 0
+
+
+def test_no_session_when_every_account_is_quarantined(stub):
+    base_url, state = stub
+    state.rejected_accounts.update({"ana", "bea"})
+
+    async def scenario():
+        pool = make_pool(base_url, ["ana", "bea"])
+        response = await pool.get(f"{base_url}/Inicio")
+        available = pool.available()
+        await pool.aclose()
+        return response, available
+
+    response, available = asyncio.run(scenario())
+    assert response is None
+    assert available == []
+    assert state.requests["/Login/Login"] == 2
+
+
+def test_quarantined_account_comes_back_after_quarantine(stub):
+    base_url, state = stub
+    state.rejected_accounts.add("ana")
+
+    async def scenario():
+        pool = make_pool(base_url, ["ana", "bea"], quarantine_seconds=0.2)
+        assert not await pool._warm(pool.sessions[0])
+        assert pool.available() == pool.sessions[1:]
+
+        # Mientras dura la cuarentena no se reintenta el login
+        await pool.keep_warm()
+        assert pool.sessions[0].login_failures == 1
+
+        state.rejected_accounts.clear()
+        await asyncio.sleep(0.25)
+        await pool.keep_warm()
+        ana = pool.sessions[0]
+        await pool.aclose()
+        return ana
+
+    ana = asyncio.run(scenario())
+    assert ana.state.authenticated
+    assert (ana.login_failures, ana.quarantined_until) == (0, 0.0)
+
+
+def test_expired_session_logs_in_again_without_quarantine(stub):
+    base_url, state = stub
+
+    async def scenario():
+        pool = make_pool(base_url, ["ana"])
+        assert (await pool.get(f"{base_url}/Inicio")).status_code == 200
+        # El upstream olvida la sesión: el siguiente GET redirige a /Login
+        state.sessions.clear()
+        response = await pool.get(f"{base_url}/Inicio")
+        available = pool.available()
+        await pool.aclose()
+        return response, available
+
+    response, available = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert len(available) == 1
+    assert state.requests["/Login/Login"] == 2
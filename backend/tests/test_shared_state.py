@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from app.core.rate_limit import SharedAdaptiveTokenBucket
+from app.core.shared_state import Lease, SqliteRedis
+
+
+def make_lease(shared, owner: str, ttl: float = 60) -> Lease:
+    lease = Lease(shared, "crawler", ttl)
+    lease.owner = owner.encode()
+    return lease
+
+
+def test_set_nx_and_incr_keep_redis_semantics(tmp_path):
+    shared = SqliteRedis(str(tmp_path / "shared.sqlite3"))
+
+    assert shared.set("lock", "a", ex=60, nx=True)
+    assert shared.set("lock", "b", ex=60, nx=True) is None
+    assert shared.get("lock") == b"a"
+
+    assert shared.incr("hits") == 1
+    assert shared.expire("hits", 60)
+    assert shared.incr("hits", 2) == 3
+    assert shared.expire_if_value("lock", "b", 60) is False
+    assert shared.delete_if_value("lock", "a") is True
+    assert shared.get("lock") is None
+
+
+def test_lease_is_exclusive_and_renewable(tmp_path):
+    shared = SqliteRedis(str(tmp_path / "shared.sqlite3"))
+    first, second = make_lease(shared, "worker-1"), make_lease(shared, "worker-2")
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.acquire()  # renovación
+
+    first.release()
+    assert second.acquire()
+
+
+def test_expired_owner_cannot_renew_or_release_the_new_owners_lease(tmp_path):
+    shared = SqliteRedis(str(tmp_path / "shared.sqlite3"))
+    first, second = make_lease(shared, "worker-1", ttl=1), make_lease(shared, "worker-2")
+
+    assert first.acquire()
+    time.sleep(1.1)
+    assert second.acquire()
+
+    # El worker que se quedó colgado vuelve: ni renueva ni borra la lease ajena
+    assert not first.acquire()
+    first.release()
+    assert shared.get(second.key) == b"worker-2"
+
+
+class RacingStore(SqliteRedis):
+    """Tras cada GET corre ``after_get``: simula que otro worker actúa entre dos operaciones"""
+
+    after_get = None
+
+    def get(self, name):
+        value = super().get(name)
+        if self.after_get is not None:
+            hook, self.after_get = self.after_get, None
+            hook()
+        return value
+
+
+def test_renewal_never_extends_a_lease_taken_meanwhile(tmp_path):
+    shared = RacingStore(str(tmp_path / "shared.sqlite3"))
+    first, second = make_lease(shared, "worker-1"), make_lease(shared, "worker-2")
+    assert first.acquire()
+
+    def lease_expires_and_second_takes_it():
+        shared.delete(first.key)
+        assert second.acquire()
+
+    shared.after_get = lease_expires_and_second_takes_it
+    renewed = first.acquire()
+    # Quién la tiene justo después de renovar (si acquire no leyó, el otro worker actúa recién ahora)
+    holder = shared.get(first.key)
+
+    assert renewed and holder == first.owner
+    assert not first.acquire() and shared.get(first.key) == b"worker-2"
+
+
+def test_shared_bucket_limits_all_workers_together(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    workers = [SharedAdaptiveTokenBucket(SqliteRedis(path), "upstream.test", rate=5, min_rate=1) for _ in range(2)]
+
+    async def scenario():
+        # Alinear con el comienzo de una ventana de un segundo
+        await asyncio.sleep(int(time.time()) + 1 - time.time())
+        started = time.time()
+        granted = []
+
+        async def take(worker):
+            await worker.acquire()
+            granted.append(time.time() - started)
+
+        await asyncio.gather(*(take(workers[n % 2]) for n in range(8)))
+        return sorted(granted)
+
+    granted = asyncio.run(scenario())
+    assert all(at < 0.5 for at in granted[:5])
+    assert all(at >= 0.9 for at in granted[5:])
+
+
+def test_throttle_and_pause_reach_the_other_workers(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    first, second = (SharedAdaptiveTokenBucket(SqliteRedis(path), "upstream.test", rate=8, min_rate=1) for _ in range(2))
+
+    async def scenario():
+        first.on_throttle(retry_after=0.3)
+        await first.flush()
+        started = time.monotonic()
+        await second.acquire()
+        return time.monotonic() - started
+
+    waited = asyncio.run(scenario())
+    assert waited >= 0.25
+    assert second.rate == 4
+
+
+class SlowStore(SqliteRedis):
+    """Store que tarda en responder, como un Redis lejano o un sqlite con el lock tomado"""
+
+    def incr(self, name, amount=1):
+        time.sleep(0.3)
+        return super().incr(name, amount)
+
+    def set(self, *args, **kwargs):
+        time.sleep(0.3)
+        return super().set(*args, **kwargs)
+
+
+def test_slow_store_does_not_block_the_event_loop(tmp_path):
+    bucket = SharedAdaptiveTokenBucket(SlowStore(str(tmp_path / "shared.sqlite3")), "upstream.test", rate=8, min_rate=1)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        await bucket.acquire()
+        bucket.on_throttle()
+        blocked = time.monotonic() - started
+        await bucket.flush()
+        task.cancel()
+        return ticks, blocked
+
+    ticks, blocked = asyncio.run(scenario())
+    assert ticks >= 15
+    # acquire espera su vuelta al store; on_throttle vuelve en el acto
+    assert blocked < 0.45
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight, normalize_url
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return ["P1"]
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        assert results == [["P1"]] * 5
+        assert calls == 1
+        assert flight.snapshot() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+        # Terminada la ejecución, la clave se libera y la siguiente llamada vuelve a cargar
+        await flight.do("k", fetch)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_error_is_propagated_to_every_waiter_and_key_released():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.snapshot()["in_flight"] == 0
+
+        async def ok():
+            return "ok"
+
+        assert await flight.do("k", ok) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        assert await asyncio.gather(flight.do("a", lambda: fetch(1)), flight.do("b", lambda: fetch(2))) == [1, 2]
+        assert flight.executions == 2
+
+    asyncio.run(scenario())
+
+
+def test_normalize_url_orders_query_and_lowercases_host():
+    assert normalize_url("HTTPS://Example.COM/catalogo/?page=2&cat=1") == "https://example.com/catalogo?cat=1&page=2"
+    assert normalize_url("https://example.com") == "https://example.com/"
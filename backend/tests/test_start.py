@@ -0,0 +1,49 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from conftest import BACKEND_DIR
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def test_start_serves_two_workers_with_shared_state(tmp_path):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY="2",
+        SHARED_STATE_URL=f"sqlite:///{tmp_path / 'shared_state.sqlite3'}",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "start.py")],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        status = None
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                status = httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code
+            except httpx.TransportError:
+                status = None
+            if status == 200:
+                break
+            time.sleep(0.1)
+        assert status == 200
+        # Los dos workers terminan de arrancar aunque el primero ya atienda
+        time.sleep(2)
+    finally:
+        process.terminate()
+        _, stderr = process.communicate(timeout=30)
+
+    assert stderr.count("Started server process") == 2, stderr
+    assert (tmp_path / "shared_state.sqlite3").exists()